@@ -1,89 +1,266 @@
 import os
-import re 
+import re
+from contextlib import aclosing
 from dotenv import load_dotenv
-from app.core.llm import llm
+from app.core.llm import llm, is_fallback
 from app.agent.prompts import get_active_system_prompt
+from app.agent.prompt_builder import build_user_prompt
+from app.agent.reply_cache import reply_cache
+from app.core.admission import llm_admission
+from app.core.stall_bank import (
+    CAPTURED_STALLS,
+    DIRECTIVE_CAPTURED,
+    DIRECTIVE_LINK_ONLY,
+    DIRECTIVE_NO_DETAILS,
+    STALL_BANK,
+    pick_stall_reply,
+)
+from app.core.tracing import annotate, span
 
 load_dotenv()
-ACTIVE_PROVIDER = "groq"
 
-def generate_agent_reply(session):
+# Headers the model sometimes prepends ("Arthur:", "REPLY:", ...)
+REPLY_HEADER_REGEX = re.compile(
+    r"^(User Response\b|Arthur's Response\b|Arthur\b|=>REPLY|REPLY:|\*\*REPLY\*\*)[\s:,-]*",
+    flags=re.IGNORECASE,
+)
+# Longest header + separator we wait for before deciding on a streamed reply
+_STREAM_HEAD_CHARS = 32
+
+# 🚦 Load shedding (STALL_BANK): how many recent stalls per session we avoid repeating
+_STALL_MEMORY = 5
+
+
+def build_recall_block(intel):
     """
-    Generates a reply with RECALL capabilities.
+    --- ✅ RECALL FEATURE (Build the Memory Block) ---
+    Create the string. If empty, it's just "None".
     """
-    # 1. Get Context
-    intel = session.get("intelligence", {})
-    user_message = session.get("last_user_message", "")
-
-    # 2. Format History (Smart Truncation)
-    recent_messages = session.get("messages", [])[-5:]
-    history_text = ""
-    for msg in recent_messages:
-        role = "SCAMMER" if msg["sender"] == "scammer" else "USER"
-        text = str(msg["text"])
-        
-        # Only chop AI messages to save space, keep Scammer full text
-        if role == "USER":
-            if len(text) > 300:
-                text = text[:300] + "..."
-        
-        history_text += f"{role}: {text}\n"
-
-    # --- ✅ NEW: RECALL FEATURE (Build the Memory Block) ---
     recall_data = []
-    if intel.get("upiIds"): 
+    if intel.get("upiIds"):
         recall_data.append(f"UPI: {', '.join(intel['upiIds'])}")
-    if intel.get("bankAccounts"): 
+    if intel.get("bankAccounts"):
         recall_data.append(f"BANK ACCOUNTS: {', '.join(intel['bankAccounts'])}")
-    if intel.get("phoneNumbers"): 
+    if intel.get("phoneNumbers"):
         recall_data.append(f"PHONES: {', '.join(intel['phoneNumbers'])}")
-    
-    # Create the string. If empty, it's just "None".
-    known_intel_str = " | ".join(recall_data) if recall_data else "None"
-    # -------------------------------------------------------
 
-    # 4. Strategy & Prompt
+    return " | ".join(recall_data) if recall_data else "None"
+
+
+def choose_tactical_directive(intel):
+    """
+    4. Strategy: what Arthur should be doing right now, given what we captured.
+    """
     has_upi = len(intel.get("upiIds", [])) > 0
     has_bank = len(intel.get("bankAccounts", [])) > 0
     has_link = len(intel.get("phishingLinks", [])) > 0
     has_crypto = "Crypto" in str(intel.get("suspiciousKeywords", []))
 
     if has_link and not (has_upi or has_bank or has_crypto):
-        tactical_directive = "STATUS: Phishing Link Found. ACTION: Lie (404 Error). Demand Bank/UPI."
+        return DIRECTIVE_LINK_ONLY
     elif has_upi or has_bank or has_crypto:
-        tactical_directive = "STATUS: Success (Details Captured). ACTION: STALL INDEFINITELY. Invent tech failures. Be creative about excuses. You may reference the captured details to sound convincing."
+        return DIRECTIVE_CAPTURED
     else:
-        tactical_directive = "STATUS: No details. ACTION: Act eager. Ask for UPI/Bank details."
-
-    final_user_prompt = (
-        f"KNOWN INTEL (Use this to verify details):\n{known_intel_str}\n\n" # <--- ✅ INJECTED HERE
-        f"HISTORY:\n{history_text}\n"
-        f"NEW MSG:\n{user_message}\n"
-        f"INSTRUCTIONS:\n"
-        f"STRATEGY: {tactical_directive}\n"
-        f"DO NOT include headers like 'User Response:'. Just speak.\n"
-        f"REPLY:"
-    )
-
-    # 5. System Prompt
-    dynamic_system_prompt = get_active_system_prompt(session_context=session)
-
-    # 6. Call LLM
-    raw_reply = llm.generate(
-        system_prompt=dynamic_system_prompt,
-        user_prompt=final_user_prompt,
-        provider=ACTIVE_PROVIDER,
-    )
+        return DIRECTIVE_NO_DETAILS
+
+
+def stall_reply(session, tactical_directive):
+    """
+    Instant persona-consistent reply from the stall bank (no LLM call).
+    Remembers the last few per session so the excuses don't repeat.
+    """
+    used = session.setdefault("stallsUsed", [])
+    reply = pick_stall_reply(STALL_BANK.get(tactical_directive, CAPTURED_STALLS), used)
+    used.append(reply)
+    del used[:-_STALL_MEMORY]
+    return reply
+
+
+def build_agent_prompt(session, tactical_directive=None, known_intel_str=None):
+    """
+    Builds the user prompt for Arthur's next reply (history, recall, strategy),
+    fitted to the token budget (see prompt_builder.py).
+    """
+    # 1. Get Context
+    intel = session.get("intelligence", {})
+    if known_intel_str is None:
+        known_intel_str = build_recall_block(intel)
+    if tactical_directive is None:
+        tactical_directive = choose_tactical_directive(intel)
+
+    # 2. History: incremental per-session window, oldest lines dropped to fit
+    return build_user_prompt(session, tactical_directive, known_intel_str)
+
+
+def clean_reply(raw_reply):
+    """
+    Strips 'Arthur:' / 'REPLY:' style headers and wrapping quotes.
+    """
+    clean = REPLY_HEADER_REGEX.sub("", raw_reply).strip()
+
+    if clean.startswith('"') and clean.endswith('"'):
+        clean = clean[1:-1]
+
+    return clean
+
+
+async def generate_agent_reply(session, deadline=None):
+    """
+    Generates a reply with RECALL capabilities.
+    Awaitable, so the event loop keeps serving other sessions during the LLM call.
+    deadline: optional time.monotonic() cut-off passed down from the endpoint.
+    """
+    intel = session.get("intelligence", {})
+    known_intel_str = build_recall_block(intel)
+    tactical_directive = choose_tactical_directive(intel)
+
+    # ♻️ Repeated scam script? Serve a pooled reply instead of calling the LLM
+    cache_key = reply_cache.make_key(session, tactical_directive, known_intel_str)
+    cached = reply_cache.lookup(cache_key)
+    if cached is not None:
+        annotate(source="cache")
+        return cached
+
+    # 🚦 LLM saturated? Answer from the stall bank now (intel was already extracted)
+    with span("admission"):
+        admitted = await llm_admission.acquire(deadline)
+    if not admitted:
+        annotate(source="stall")
+        return stall_reply(session, tactical_directive)
+
+    annotate(source="llm")
+    try:
+        final_user_prompt = build_agent_prompt(session, tactical_directive, known_intel_str)
+
+        # 5. System Prompt
+        with span("prompt"):
+            dynamic_system_prompt = await get_active_system_prompt(session_context=session, deadline=deadline)
+
+        # 6. Call LLM
+        raw_reply = await llm.generate(
+            system_prompt=dynamic_system_prompt,
+            user_prompt=final_user_prompt,
+            deadline=deadline,
+            purpose="reply",
+            directive=tactical_directive,
+        )
+    finally:
+        llm_admission.release()
 
     # 7. Clean Output
-    clean_reply = re.sub(
-        r"^(User Response\b|Arthur's Response\b|Arthur\b|=>REPLY|REPLY:|\*\*REPLY\*\*)[\s:,-]*",
-        "",
-        raw_reply,
-        flags=re.IGNORECASE,
-    ).strip()
+    reply = clean_reply(raw_reply)
+    if not is_fallback(raw_reply):
+        reply_cache.store(cache_key, reply)
+    return reply
+
+
+async def stream_agent_reply(session, deadline=None):
+    """
+    Streaming twin of generate_agent_reply: yields cleaned text chunks as the
+    LLM produces them. The same header/quote cleanup is applied on the fly.
+    """
+    intel = session.get("intelligence", {})
+    known_intel_str = build_recall_block(intel)
+    tactical_directive = choose_tactical_directive(intel)
+
+    cache_key = reply_cache.make_key(session, tactical_directive, known_intel_str)
+    cached = reply_cache.lookup(cache_key)
+    if cached is not None:
+        annotate(source="cache")
+        yield cached
+        return
+
+    with span("admission"):
+        admitted = await llm_admission.acquire(deadline)
+    if not admitted:
+        annotate(source="stall")
+        yield stall_reply(session, tactical_directive)
+        return
+
+    annotate(source="llm")
+    cleaner = ReplyStreamCleaner()
+    parts = []
+    try:
+        final_user_prompt = build_agent_prompt(session, tactical_directive, known_intel_str)
+        with span("prompt"):
+            dynamic_system_prompt = await get_active_system_prompt(session_context=session, deadline=deadline)
+
+        upstream = llm.stream(
+            system_prompt=dynamic_system_prompt,
+            user_prompt=final_user_prompt,
+            deadline=deadline,
+            purpose="reply",
+            directive=tactical_directive,
+        )
+        async with aclosing(upstream) as chunks:
+            async for chunk in chunks:
+                if is_fallback(chunk):
+                    parts = None  # Never cache the "connection trouble" line (or an offline stand-in)
+                text = cleaner.feed(chunk)
+                if text:
+                    if parts is not None:
+                        parts.append(text)
+                    yield text
+    finally:
+        llm_admission.release()
+
+    tail = cleaner.finish()
+    if tail:
+        if parts is not None:
+            parts.append(tail)
+        yield tail
+
+    if parts:
+        reply_cache.store(cache_key, "".join(parts))
+
+
+class ReplyStreamCleaner:
+    """
+    Incremental version of clean_reply().
+    - Holds the first few characters until we know whether they are a header.
+    - Drops an opening quote eagerly and a matching closing quote at the end.
+    - Holds trailing whitespace (and a possible closing quote) until more text
+      arrives, so the stream ends exactly like the stripped reply would.
+    """
+
+    def __init__(self):
+        self.head = ""
+        self.head_done = False
+        self.quoted = False
+        self.pending = ""
+
+    def feed(self, chunk):
+        if not self.head_done:
+            self.head += chunk
+            if len(self.head) < _STREAM_HEAD_CHARS:
+                return ""
+            match = REPLY_HEADER_REGEX.match(self.head)
+            if match and match.end() == len(self.head):
+                return ""  # Still inside the header's separator run
+            self.head_done = True
+            text = REPLY_HEADER_REGEX.sub("", self.head).lstrip()
+            if text.startswith('"'):
+                self.quoted = True
+                text = text[1:]
+            self.head = ""
+            return self._emit(text)
+        return self._emit(chunk)
 
-    if clean_reply.startswith('"') and clean_reply.endswith('"'):
-        clean_reply = clean_reply[1:-1]
+    def _emit(self, text):
+        text = self.pending + text
+        keep = len(text.rstrip())
+        if self.quoted and keep and text[keep - 1] == '"':
+            keep -= 1
+        self.pending = text[keep:]
+        return text[:keep]
 
-    return clean_reply
\ No newline at end of file
+    def finish(self):
+        if not self.head_done:
+            # Short reply: the whole thing fits in the head, clean it in one go
+            self.head_done = True
+            return clean_reply(self.head)
+        tail = self.pending.rstrip()
+        if self.quoted and tail.endswith('"'):
+            tail = tail[:-1]
+        self.pending = ""
+        return tail
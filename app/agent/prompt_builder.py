@@ -0,0 +1,96 @@
+# app/agent/prompt_builder.py
+from app.core.config import (
+    PROMPT_HISTORY_MAX_TOKENS,
+    PROMPT_SCAMMER_MESSAGE_MAX_TOKENS,
+    PROMPT_TOKEN_BUDGET,
+    PROMPT_USER_MESSAGE_MAX_TOKENS,
+)
+from app.core.tokens import estimate_tokens, truncate_to_tokens
+
+
+def format_history_line(msg):
+    """One rendered history line + its token estimate."""
+    role = "SCAMMER" if msg.get("sender") == "scammer" else "USER"
+    cap = PROMPT_SCAMMER_MESSAGE_MAX_TOKENS if role == "SCAMMER" else PROMPT_USER_MESSAGE_MAX_TOKENS
+    line = f"{role}: {truncate_to_tokens(str(msg.get('text', '')), cap)}\n"
+    return [estimate_tokens(line), line]
+
+
+class HistoryWindow:
+    """
+    Incrementally maintained prompt history for a session.
+
+    State is one plain (JSON-friendly) session field, so it persists with the
+    session in every backend:
+        session["promptWindow"] = {"lines": [[tokens, line], ...],
+                                   "tokens": <sum>, "upTo": <messages consumed>}
+    Each turn only the messages added since the last turn are formatted and
+    measured; the oldest lines fall off once the window is over its budget.
+    The newest message is NOT part of the window (it is the prompt's NEW MSG).
+    """
+
+    def __init__(self, session, max_tokens=PROMPT_HISTORY_MAX_TOKENS):
+        self.session = session
+        self.max_tokens = max_tokens
+        state = session.get("promptWindow")
+        messages = session.get("messages", [])
+        if not isinstance(state, dict) or state.get("upTo", 0) > max(len(messages) - 1, 0):
+            state = {"lines": [], "tokens": 0, "upTo": 0}
+            session["promptWindow"] = state
+        self.state = state
+
+    def sync(self):
+        """Formats the new messages (all but the latest) into the window."""
+        state = self.state
+        messages = self.session.get("messages", [])
+        end = len(messages) - 1
+        if end <= state["upTo"]:
+            return
+        lines = state["lines"]
+        for msg in messages[state["upTo"]:end]:
+            entry = format_history_line(msg)
+            lines.append(entry)
+            state["tokens"] += entry[0]
+        state["upTo"] = end
+        # Keep at least the newest line, even if it alone is over budget
+        drop = 0
+        while state["tokens"] > self.max_tokens and drop < len(lines) - 1:
+            state["tokens"] -= lines[drop][0]
+            drop += 1
+        if drop:
+            del lines[:drop]
+
+    def render(self, budget):
+        """Newest lines that fit in `budget` tokens, oldest first."""
+        lines = self.state["lines"]
+        used = 0
+        start = len(lines)
+        while start > 0 and used + lines[start - 1][0] <= budget:
+            start -= 1
+            used += lines[start][0]
+        return "".join(line for _, line in lines[start:])
+
+
+def build_user_prompt(session, tactical_directive, known_intel_str, budget=PROMPT_TOKEN_BUDGET):
+    """
+    Arthur's user prompt, fitted to `budget` tokens: the fixed parts (intel,
+    new message, instructions) always go in, history gets what is left.
+    """
+    new_message = truncate_to_tokens(
+        str(session.get("last_user_message", "")), PROMPT_SCAMMER_MESSAGE_MAX_TOKENS
+    )
+    head = f"KNOWN INTEL (Use this to verify details):\n{known_intel_str}\n\n"
+    tail = (
+        f"NEW MSG:\n{new_message}\n"
+        f"INSTRUCTIONS:\n"
+        f"STRATEGY: {tactical_directive}\n"
+        f"DO NOT include headers like 'User Response:'. Just speak.\n"
+        f"REPLY:"
+    )
+
+    window = HistoryWindow(session)
+    window.sync()
+    history_budget = budget - estimate_tokens(head) - estimate_tokens(tail) - 2
+    history_text = window.render(history_budget) if history_budget > 0 else ""
+
+    return f"{head}HISTORY:\n{history_text}\n{tail}"
@@ -1,11 +1,87 @@
+import asyncio
+import hashlib
+import time
+
 from app.agent.persona import get_persona_system_instruction
-from app.core.llm import llm
+from app.core.admission import llm_admission
+from app.core.cache import TTLCache
+from app.core.config import (
+    PROMPT_STRATEGY,
+    SPECULATIVE_PROMPT_MAX_ENTRIES,
+    SPECULATIVE_PROMPT_TIMEOUT,
+    SPECULATIVE_PROMPT_TTL,
+)
+from app.core.llm import llm, is_fallback
+from app.core.log import get_logger
+
+log = get_logger("agent")
 
 # "STATIC": Fast, reliable.
 # "AI_GENERATED": Slower (~1.5s), but adaptive.
-PROMPT_STRATEGY = "STATIC"  
+# "SPECULATIVE": Adaptive at STATIC latency. The tactical prompt for the NEXT
+#   turn is generated in the background once a reply is out, and reused if the
+#   intel state is still the same when the next message arrives.
+# (Set with the PROMPT_STRATEGY env var.)
+
+# sessionId -> (intel fingerprint, generated prompt)
+speculative_prompts = TTLCache(max_entries=SPECULATIVE_PROMPT_MAX_ENTRIES, ttl=SPECULATIVE_PROMPT_TTL)
+# sessionId -> (fingerprint, task) for precomputes still running
+_precomputing = {}
+speculation_stats = {"hits": 0, "misses": 0, "stale": 0, "started": 0, "ready": 0,
+                     "failed": 0, "skippedBusy": 0, "cancelled": 0}
+
+# Keyword tags that change tactics (other suspiciousKeywords just pile up)
+_MATERIAL_TAGS = ("Crypto-", "GiftCard-", "App-Detected:", "Scam-Type:")
 
-def get_active_system_prompt(session_context=None):
+
+def intel_fingerprint(context):
+    """
+    Hash of the intel that drives Arthur's tactics: payment details, links,
+    phones and the kinds of scam seen. Repeated trigger words don't count.
+    """
+    intel = context.get("intelligence", {})
+    parts = [
+        ",".join(sorted(intel.get(key, [])))
+        for key in ("upiIds", "bankAccounts", "phishingLinks", "phoneNumbers")
+    ]
+    tags = sorted(
+        {kw.split(":", 1)[0] for kw in intel.get("suspiciousKeywords", []) if kw.startswith(_MATERIAL_TAGS)}
+    )
+    parts.append(",".join(tags))
+    return hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def build_meta_prompt(context):
+    # 1. Extract Live Context (Now safe because we use 'context', not 'session_context')
+    last_message = context.get("last_user_message", "Hello")
+    intel = context.get("intelligence", {})
+
+    # 2. Build the "Meta-Prompt"
+    return (
+        f"You are a Tactical Mission Controller. "
+        f"Your agent 'Arthur' (72-year-old, confused, wealthy) is in a live call with a scammer.\n\n"
+        f"--- CURRENT SITUATION ---\n"
+        f"SCAMMER JUST SAID: '{last_message}'\n"
+        f"INTELLIGENCE COLLECTED SO FAR: {intel}\n\n"
+        f"--- YOUR TASK ---\n"
+        f"Write a specific, short System Instruction for Arthur for THIS EXACT MOMENT.\n"
+        f"- If they asked for OTP -> Instruct Arthur to pretend he can't read the screen.\n"
+        f"- If they asked for Money -> Instruct Arthur to act eager but fail at the app.\n"
+        f"Output ONLY the system prompt text. No preamble."
+    )
+
+
+async def generate_tactical_prompt(meta_prompt, deadline=None):
+    # 3. Generate
+    return await llm.generate(
+        system_prompt="You are an expert Context-Aware Prompt Engineer.",
+        user_prompt=meta_prompt,
+        deadline=deadline,
+        purpose="system_prompt",
+    )
+
+
+async def get_active_system_prompt(session_context=None, deadline=None):
     """
     Generates the System Prompt.
     Safely handles cases where session_context might be None.
@@ -16,32 +92,83 @@ def get_active_system_prompt(session_context=None):
 
     if PROMPT_STRATEGY == "STATIC":
         return get_persona_system_instruction()
-    
+
     elif PROMPT_STRATEGY == "AI_GENERATED":
-        # 1. Extract Live Context (Now safe because we use 'context', not 'session_context')
-        last_message = context.get("last_user_message", "Hello")
-        intel = context.get("intelligence", {})
-        
-        # 2. Build the "Meta-Prompt"
-        meta_prompt = (
-            f"You are a Tactical Mission Controller. "
-            f"Your agent 'Arthur' (72-year-old, confused, wealthy) is in a live call with a scammer.\n\n"
-            f"--- CURRENT SITUATION ---\n"
-            f"SCAMMER JUST SAID: '{last_message}'\n"
-            f"INTELLIGENCE COLLECTED SO FAR: {intel}\n\n"
-            f"--- YOUR TASK ---\n"
-            f"Write a specific, short System Instruction for Arthur for THIS EXACT MOMENT.\n"
-            f"- If they asked for OTP -> Instruct Arthur to pretend he can't read the screen.\n"
-            f"- If they asked for Money -> Instruct Arthur to act eager but fail at the app.\n"
-            f"Output ONLY the system prompt text. No preamble."
-        )
-        
-        # 3. Generate
-        generated_prompt = llm.generate(
-            system_prompt="You are an expert Context-Aware Prompt Engineer.", 
-            user_prompt=meta_prompt, 
-            provider="groq" 
+        return await generate_tactical_prompt(build_meta_prompt(context), deadline=deadline)
+
+    elif PROMPT_STRATEGY == "SPECULATIVE":
+        # Never wait on the LLM here: a ready precompute or the static prompt
+        cached = speculative_prompts.get(context.get("sessionId"), count=False)
+        if cached is not None:
+            fingerprint, prompt = cached
+            if fingerprint == intel_fingerprint(context):
+                speculation_stats["hits"] += 1
+                return prompt
+            # Intel moved on since it was generated: tactics may be wrong now
+            speculative_prompts.pop(context.get("sessionId"))
+            speculation_stats["stale"] += 1
+        speculation_stats["misses"] += 1
+        return get_persona_system_instruction()
+
+    return get_persona_system_instruction()
+
+
+def schedule_prompt_precompute(session):
+    """
+    SPECULATIVE only: after a reply is out, generate the next turn's tactical
+    prompt in the background. Yields to live traffic (skipped while the reply
+    gate is saturated) and replaces a precompute for an outdated intel state.
+    """
+    if PROMPT_STRATEGY != "SPECULATIVE":
+        return
+    session_id = session.get("sessionId")
+    fingerprint = intel_fingerprint(session)
+
+    cached = speculative_prompts.get(session_id, count=False)
+    if cached is not None and cached[0] == fingerprint:
+        return  # Still valid
+    running = _precomputing.get(session_id)
+    if running is not None:
+        if running[0] == fingerprint:
+            return  # Already on it
+        running[1].cancel()
+        speculation_stats["cancelled"] += 1
+    if llm_admission.saturated:
+        speculation_stats["skippedBusy"] += 1
+        return
+
+    # Snapshot the inputs now: the session keeps changing after this returns
+    meta_prompt = build_meta_prompt(session)
+    task = asyncio.ensure_future(_precompute(session_id, fingerprint, meta_prompt))
+    _precomputing[session_id] = (fingerprint, task)
+    speculation_stats["started"] += 1
+
+
+async def _precompute(session_id, fingerprint, meta_prompt):
+    try:
+        prompt = await generate_tactical_prompt(
+            meta_prompt, deadline=time.monotonic() + SPECULATIVE_PROMPT_TIMEOUT
         )
-        return generated_prompt
-    
-    return get_persona_system_instruction()
\ No newline at end of file
+        if prompt and not is_fallback(prompt):
+            speculative_prompts.set(session_id, (fingerprint, prompt), size=len(prompt))
+            speculation_stats["ready"] += 1
+        else:
+            speculation_stats["failed"] += 1
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        speculation_stats["failed"] += 1
+        log.warning(f"⚠️ Speculative prompt failed for {session_id}: {e}")
+    finally:
+        current = _precomputing.get(session_id)
+        if current is not None and current[0] == fingerprint:
+            del _precomputing[session_id]
+
+
+def prompt_stats():
+    return {
+        "strategy": PROMPT_STRATEGY,
+        "speculation": dict(speculation_stats),
+        "precomputing": len(_precomputing),
+        "cache": speculative_prompts.stats(),
+    }
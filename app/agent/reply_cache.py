@@ -0,0 +1,100 @@
+# app/agent/reply_cache.py
+import hashlib
+import random
+import re
+
+from app.core.cache import TTLCache
+from app.core.config import (
+    REPLY_CACHE_ENABLED,
+    REPLY_CACHE_MAX_BYTES,
+    REPLY_CACHE_MAX_ENTRIES,
+    REPLY_CACHE_POOL_SIZE,
+    REPLY_CACHE_TTL,
+)
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+# How many earlier messages feed the history digest
+HISTORY_WINDOW = 4
+
+
+def normalize_message(text):
+    """'Your account is BLOCKED!!' -> 'your account is blocked'"""
+    return _NON_WORD.sub(" ", str(text).lower()).strip()
+
+
+class ReplyCache:
+    """
+    Caches Arthur's replies to repeated scam scripts.
+
+    Key = normalized last message + tactical directive + digest of the recent
+    history window + digest of the recalled intel (so a reply that mentions one
+    session's UPI is never served to another session).
+
+    Each key holds a small POOL of LLM replies. Until `pool_size` replies have
+    been sampled every lookup is a miss (and the new reply joins the pool);
+    after that we serve a random pick, so Arthur doesn't sound canned.
+    """
+
+    def __init__(self, enabled=True, max_entries=5000, max_bytes=8_000_000, ttl=3600, pool_size=3):
+        self.enabled = enabled
+        self.pool_size = max(1, pool_size)
+        self.cache = TTLCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, session, tactical_directive, known_intel_str):
+        messages = session.get("messages", [])
+        window = messages[-(HISTORY_WINDOW + 1):-1]  # Everything before the new message
+        history = "\n".join(
+            f"{m.get('sender')}:{normalize_message(m.get('text', ''))}" for m in window
+        )
+        digest = hashlib.blake2b(
+            f"{history}\x00{known_intel_str}".encode("utf-8"), digest_size=16
+        ).hexdigest()
+        last = normalize_message(session.get("last_user_message", ""))
+        return (last, tactical_directive, digest)
+
+    def lookup(self, key):
+        if not self.enabled:
+            return None
+        entry = self.cache.get(key)
+        if entry and entry["samples"] >= self.pool_size:
+            self.hits += 1
+            return random.choice(entry["replies"])
+        self.misses += 1
+        return None
+
+    def store(self, key, reply):
+        if not self.enabled or not reply:
+            return
+        entry = self.cache.get(key, count=False) or {"replies": [], "samples": 0}
+        if entry["samples"] >= self.pool_size:
+            return
+        # Count every sample, so a model that keeps saying the same thing still fills the pool
+        replies = entry["replies"] if reply in entry["replies"] else entry["replies"] + [reply]
+        size = sum(len(r.encode("utf-8")) for r in replies) + sum(len(str(p)) for p in key)
+        self.cache.set(key, {"replies": replies, "samples": entry["samples"] + 1}, size=size)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        stats = self.cache.stats()
+        # Cache-level hits count warming lookups too; report what reached the caller
+        stats.update({
+            "enabled": self.enabled,
+            "poolSize": self.pool_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "llmCallsSaved": self.hits,
+        })
+        return stats
+
+
+reply_cache = ReplyCache(
+    enabled=REPLY_CACHE_ENABLED,
+    max_entries=REPLY_CACHE_MAX_ENTRIES,
+    max_bytes=REPLY_CACHE_MAX_BYTES,
+    ttl=REPLY_CACHE_TTL,
+    pool_size=REPLY_CACHE_POOL_SIZE,
+)
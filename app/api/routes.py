@@ -1,75 +1,70 @@
 # app/api/routes.py
-from fastapi import APIRouter, Depends
-import httpx 
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+import json
 import time
 import asyncio 
+from contextlib import aclosing
+
+from pydantic import ValidationError
 
 from app.models.schemas import (
     HoneypotRequest, 
-    HoneypotResponse
+    HoneypotResponse,
+    HoneypotBatchRequest,
+    HoneypotBatchResponse,
 )
 from app.core.auth import verify_api_key
-from app.core.session import get_or_create_session, save_session 
-from app.detection.scam_detector import detect_scam
-from app.agent.agent import generate_agent_reply
+from app.core.session import get_or_create_session, save_session, session_store
+from app.detection.scam_detector import detect_scam, detector_stats
+from app.agent.agent import generate_agent_reply, stream_agent_reply
 from app.intelligence.extractor import extract_intelligence
+from app.intelligence.index import IntelligenceIndex
+from app.core.llm import llm
+from app.core.key_pool import KeyState
+from app.agent.reply_cache import reply_cache
+from app.core.admission import llm_admission
+from app.core.pacing import pacer
+from app.agent.prompts import prompt_stats, schedule_prompt_precompute
+from app.core.config import (
+    BATCH_DEADLINE_SECONDS,
+    BATCH_MAX_CONCURRENT_SESSIONS,
+    BATCH_MAX_ITEMS,
+    REQUEST_DEADLINE_SECONDS,
+)
+from app.callback.guvi_client import outbox, send_report
+from app.core.metrics import REQUEST_SECONDS, STAGE_SECONDS, registry as metrics_registry
+from app.core.log import get_logger, pipeline as log_pipeline
+from app.core.tracing import add_span, span, trace_request, tracer
 
-router = APIRouter()
+log = get_logger("api")
 
-# 🕵️ GLOBAL DEBUG VAR
-_debug_last_payload = {"status": "No data sent yet"}
+router = APIRouter()
 
-# --- CALLBACK LOGIC ---
-async def send_guvi_callback(payload: dict):
-    global _debug_last_payload
-    _debug_last_payload = payload 
+# Work that outlives its request (the loop itself only keeps weak references to tasks)
+_background_tasks = set()
 
-    target_url = "https://hackathon.guvi.in/api/updateHoneyPotFinalResult"
-    
-    # Debug Log
-    # print(f"📤 [CALLBACK] Sending Payload: {payload}")
-
-    try:
-        async with httpx.AsyncClient() as client:
-            # ✅ TIMEOUT OPTIMIZATION: Reduced to 5.0s to prevent hanging
-            response = await client.post(
-                target_url,
-                json=payload,
-                timeout=5.0 
-            )
-            if response.status_code == 200:
-                print(f"✅ GUVI ACCEPTED DATA")
-            elif response.status_code == 422:
-                print(f"❌ GUVI REJECTED (Schema Error): {response.text}")
-            else:
-                print(f"⚠️ GUVI STATUS {response.status_code}: {response.text}")
-
-    except Exception as e:
-        print(f"⚠️ Callback Network Error: {e}")
-
-def generate_agent_notes(intel):
-    notes = []
-    if intel.get("upiIds"): notes.append("Asked for UPI.")
-    if intel.get("bankAccounts"): notes.append("Provided Bank Info.")
-    if intel.get("phishingLinks"): notes.append("Sent Link.")
-    if intel.get("phoneNumbers"): notes.append("Shared Phone Number.")
-    
-    keywords = str(intel.get("suspiciousKeywords", []))
-    if "GiftCard" in keywords: notes.append("Demanded Gift Cards.")
-    if "Crypto" in keywords: notes.append("Demanded Crypto.")
-    if "App-Detected" in keywords: notes.append("Attempted Remote Access.")
-    
-    if not notes: return "Scam detected, engaging."
-    return "Scammer behavior identified: " + " ".join(notes)
+def _background_done(task):
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        log.warning(f"⚠️ Background task failed: {task.exception()!r}")
 
-# ✅ ALIASES
-@router.post("/honeypot", response_model=HoneypotResponse, dependencies=[Depends(verify_api_key)])
-@router.post("/h", response_model=HoneypotResponse, dependencies=[Depends(verify_api_key)])
-async def honeypot_endpoint(payload: HoneypotRequest): # <--- ✅ CLEAN SIGNATURE (No BackgroundTasks)
-    start_cpu = time.perf_counter()
+def spawn_background(coro):
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_done)
+    return task
 
+async def prepare_turn(payload: HoneypotRequest, deadline=None):
+    """
+    Steps 1-4 of a turn: load the session, sync history, record the new
+    message, detect and extract. Shared by the JSON and streaming routes.
+    """
     # 1. Get Session
-    session = get_or_create_session(payload.sessionId)
+    started = time.perf_counter()
+    with span("session"):
+        session = await get_or_create_session(payload.sessionId)
+    STAGE_SECONDS.observe(time.perf_counter() - started, "session_load")
     
     # History Sync (Safe Handling)
     incoming_history = payload.conversationHistory
@@ -77,69 +72,375 @@ async def honeypot_endpoint(payload: HoneypotRequest): # <--- ✅ CLEAN SIGNATUR
         incoming_history = []
         
     if len(session["messages"]) == 0 and len(incoming_history) > 0:
-        for old_msg in incoming_history:
-            session["messages"].append(old_msg.model_dump())
-        session["messageCount"] = len(incoming_history)
+        with span("history", messages=len(incoming_history)):
+            for old_msg in incoming_history:
+                session["messages"].append(old_msg.model_dump())
+            session["messageCount"] = len(incoming_history)
+
+            # Session was rebuilt from the platform's copy: mine the scammer's earlier turns too
+            history_index = IntelligenceIndex(session)
+            for i, old_msg in enumerate(incoming_history):
+                if old_msg.sender == "scammer":
+                    history_index.merge(extract_intelligence(old_msg.text), i)
 
     # 2. Add New Message
     session["messages"].append(payload.message.model_dump())
     session["messageCount"] += 1
     session["last_user_message"] = payload.message.text
 
+    # Set-backed view over session["intelligence"] (O(1) dedup, keeps order)
+    index = IntelligenceIndex(session)
+    message_index = len(session["messages"]) - 1
+
     # 3. Detect Scam
     if not session.get("scamDetected", False):
-        is_scam, keywords = detect_scam(payload.message.text)
+        with span("detect"):
+            is_scam, keywords = await detect_scam(payload.message.text, deadline=deadline)
         if is_scam:
             session["scamDetected"] = True
-            if "suspiciousKeywords" not in session["intelligence"]:
-                session["intelligence"]["suspiciousKeywords"] = []
-            session["intelligence"]["suspiciousKeywords"].extend(keywords)
+            index.merge({"suspiciousKeywords": keywords}, message_index)
 
     # 4. Extract Intelligence
-    intel = extract_intelligence(payload.message.text)
-    for key, values in intel.items():
-        if key in session["intelligence"]:
-            for value in values:
-                if value not in session["intelligence"][key]:
-                    session["intelligence"][key].append(value)
+    started = time.perf_counter()
+    with span("extract", chars=len(payload.message.text)):
+        intel = extract_intelligence(payload.message.text)
+        index.merge(intel, message_index)
+    STAGE_SECONDS.observe(time.perf_counter() - started, "extract")
 
-    # 5. Generate Reply
-    agent_reply = generate_agent_reply(session)
-    
-    # 6. Callback (BLOCKING MODE) 🛑
-    final_notes = generate_agent_notes(session["intelligence"])
-    if session.get("scamDetected"):
-        guvi_payload = {
-            "sessionId": payload.sessionId,
-            "scamDetected": True,
-            "totalMessagesExchanged": session["messageCount"],
-            "extractedIntelligence": session["intelligence"],
-            "agentNotes": final_notes
-        }
-        await send_guvi_callback(guvi_payload)
+    return session
+
+def report_session(session: dict):
+    """Queues a report if the session is a scam and Guvi is behind on it."""
+    if not session.get("scamDetected"):
+        return
+    if session.get("reportedMessageCount") == session["messageCount"]:
+        return
+    send_report(session)
+    session["reported"] = True
+    session["reportedMessageCount"] = session["messageCount"]
+
+async def finish_turn(payload: HoneypotRequest, session: dict, report: bool = True):
+    """
+    Steps 6-7 of a turn: report to Guvi and persist the session.
+    report=False leaves the report to the caller (batches send one per session).
+    """
+    # 6. Callback (queued, sent in the background by the outbox) 📮
+    started = time.perf_counter()
+    if report:
+        with span("callback"):
+            report_session(session)
+    saving = time.perf_counter()
+    STAGE_SECONDS.observe(saving - started, "callback")
 
     # 7. Save Session
-    save_session(payload.sessionId, session)
+    with span("save"):
+        await save_session(payload.sessionId, session)
+    STAGE_SECONDS.observe(time.perf_counter() - saving, "save")
 
-    # ⏱️ SMART SLEEP LOGIC
-    # Only sleep if we were too fast. If we were slow (Cold Start), don't sleep!
-    end_cpu = time.perf_counter()
-    processing_time = end_cpu - start_cpu
-    
-    target_time = 1.0 # Minimum time the request should take
+    # 8. Next turn's tactical prompt, in the background (PROMPT_STRATEGY=SPECULATIVE)
+    schedule_prompt_precompute(session)
+
+# 🧹 FINAL FLUSH: a session is about to be dropped from the store
+def flush_evicted_session(session_id: str, session: dict, reason: str):
+    if not session.get("scamDetected"):
+        return
+    if session.get("reportedMessageCount") == session["messageCount"]:
+        return  # Guvi already has everything this session knows
+    log.info(f"🧹 Session {session_id} evicted ({reason}). Sending final report...")
+    send_report(session)
+
+session_store.add_eviction_hook(flush_evicted_session)
+
+# 📊 Gauges read at scrape time (no cost per request)
+def _groq_keys():
+    # No Groq provider (Gemini / local only): no per-key series
+    return llm.pool.keys if llm.pool is not None else []
+
+metrics_registry.gauge_func("honeypot_sessions", "Sessions held in memory.", lambda: len(session_store))
+metrics_registry.gauge_func("honeypot_session_bytes", "Approximate size of sessions in memory.", lambda: session_store.bytes)
+metrics_registry.gauge_func("honeypot_callback_queue_depth", "Reports waiting to be sent.", lambda: outbox.stats()["queued"])
+metrics_registry.gauge_func("honeypot_callback_in_flight", "Reports being sent right now.", lambda: outbox.in_flight)
+metrics_registry.gauge_func("honeypot_admission_in_flight", "Reply generations holding an LLM slot.", lambda: llm_admission.in_flight)
+metrics_registry.gauge_func("honeypot_admission_waiting", "Reply generations queued for an LLM slot.", lambda: llm_admission.stats()["waiting"])
+metrics_registry.gauge_func(
+    "honeypot_llm_key_in_flight", "Groq calls in flight per key.",
+    lambda: {(key.name,): key.in_flight for key in _groq_keys()}, labelnames=["key"],
+)
+metrics_registry.gauge_func(
+    "honeypot_llm_key_circuit_open", "1 while a key's circuit breaker is open.",
+    lambda: {(key.name,): int(key.state == KeyState.OPEN) for key in _groq_keys()}, labelnames=["key"],
+)
+metrics_registry.gauge_func(
+    "honeypot_llm_provider_benched", "1 while the router is skipping a provider after repeated failures.",
+    lambda: {(name,): int(health.is_open(time.monotonic())) for name, health in llm.health.items()}, labelnames=["provider"],
+)
+
+def server_timing(**stages) -> str:
+    """Server-Timing header value from {stage: seconds} (durations in ms)."""
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in stages.items())
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# ✅ ALIASES
+@router.post("/honeypot", response_model=HoneypotResponse, dependencies=[Depends(verify_api_key)])
+@router.post("/h", response_model=HoneypotResponse, dependencies=[Depends(verify_api_key)])
+async def honeypot_endpoint(payload: HoneypotRequest, response: Response): # <--- ✅ CLEAN SIGNATURE (No BackgroundTasks)
+    with trace_request("honeypot", payload.sessionId):
+        return await _honeypot_turn(payload, response)
+
+async def _honeypot_turn(payload: HoneypotRequest, response: Response):
+    start_cpu = time.perf_counter()
+    # ⏰ One deadline for every LLM call this request makes (detector + agent)
+    deadline = time.monotonic() + REQUEST_DEADLINE_SECONDS
+
+    # 1-4. Session, Detection, Extraction
+    session = await prepare_turn(payload, deadline=deadline)
+    t_prepared = time.perf_counter()
+
+    # 5. Generate Reply
+    with span("reply"):
+        agent_reply = await generate_agent_reply(session, deadline=deadline)
+    t_replied = time.perf_counter()
     
-    if processing_time < target_time:
-        sleep_needed = target_time - processing_time
-        print(f"⏱️ [SPEED] Too Fast ({processing_time:.4f}s). Sleeping {sleep_needed:.4f}s...")
-        await asyncio.sleep(sleep_needed)
-    else:
-        print(f"⏱️ [SPEED] Slow Request ({processing_time:.4f}s). No sleep needed.")
+    # 6-7. Callback + Save
+    await finish_turn(payload, session)
+    t_finished = time.perf_counter()
+
+    # ⏱️ PACING: reply at a human pace for this channel (only the part real work didn't cover)
+    channel = payload.metadata.channel if payload.metadata else None
+    with span("pacing", channel=channel):
+        await pacer.pace(channel, agent_reply, start_cpu)
+
+    # 📏 Per-stage timings for benchmarks / browser devtools + /metrics
+    t_done = time.perf_counter()
+    STAGE_SECONDS.observe(t_replied - t_prepared, "reply")
+    STAGE_SECONDS.observe(t_done - t_finished, "pacing")
+    REQUEST_SECONDS.observe(t_done - start_cpu, "honeypot")
+    response.headers["Server-Timing"] = server_timing(
+        prepare=t_prepared - start_cpu,
+        reply=t_replied - t_prepared,
+        finish=t_finished - t_replied,
+        pacing=t_done - t_finished,
+    )
 
     return HoneypotResponse(
         status="success",
         reply=agent_reply or "..."
     )
 
+# 📡 STREAMING VARIANT (Server-Sent Events)
+# event: token -> {"text": "..."}  (one per chunk, already cleaned)
+# event: done  -> {"status": "success", "reply": "<full reply>"}
+@router.post("/honeypot/stream", dependencies=[Depends(verify_api_key)])
+@router.post("/h/stream", dependencies=[Depends(verify_api_key)])
+async def honeypot_stream_endpoint(payload: HoneypotRequest):
+    started = time.perf_counter()
+    deadline = time.monotonic() + REQUEST_DEADLINE_SECONDS
+    # The trace stays open until the stream ends (the body runs after we return)
+    trace = tracer.start("stream", payload.sessionId)
+    try:
+        session = await prepare_turn(payload, deadline=deadline)
+    except BaseException:
+        tracer.finish(trace)
+        raise
+
+    async def event_stream():
+        parts = []
+        finishing = None  # The finish_turn task: it runs exactly once
+        try:
+            replying = time.perf_counter()
+            # aclosing: a disconnect frees the LLM slot and upstream stream now, not at GC time
+            async with aclosing(stream_agent_reply(session, deadline=deadline)) as chunks:
+                async for chunk in chunks:
+                    parts.append(chunk)
+                    yield _sse("token", {"text": chunk})
+            STAGE_SECONDS.observe(time.perf_counter() - replying, "reply")
+            add_span("reply", replying, chunks=len(parts))
+
+            # Stream is over: finalise session + report before the last event
+            # (shielded: a disconnect now doesn't cut the save short)
+            finishing = spawn_background(finish_turn(payload, session))
+            await asyncio.shield(finishing)
+            REQUEST_SECONDS.observe(time.perf_counter() - started, "stream")
+            yield _sse("done", {"status": "success", "reply": "".join(parts) or "..."})
+        finally:
+            tracer.finish(trace)
+            if finishing is None:
+                # Client went away mid-stream: still keep what we learned
+                finishing = spawn_background(finish_turn(payload, session))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # No pacing sleep here: time-to-first-byte is the point of this route
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# 📦 BATCH VARIANT: many sessions in one call (for gateways)
+# - items of the SAME session run in order, different sessions concurrently
+# - every item goes through the same LLM admission gate as /honeypot
+# - one report per session, after its last item (not one per message)
+# - no pacing sleep: the gateway decides when each reply is delivered
+async def run_batch_session(items, results, batch_deadline):
+    """Processes one session's (index, payload) items in order."""
+    session = None
+    try:
+        for i, payload in items:
+            deadline = min(time.monotonic() + REQUEST_DEADLINE_SECONDS, batch_deadline)
+            try:
+                with trace_request("batch", payload.sessionId):
+                    session = await prepare_turn(payload, deadline=deadline)
+                    replying = time.perf_counter()
+                    with span("reply"):
+                        agent_reply = await generate_agent_reply(session, deadline=deadline)
+                    STAGE_SECONDS.observe(time.perf_counter() - replying, "reply")
+                    await finish_turn(payload, session, report=False)
+                    # The session's one report rides on its last item's trace
+                    if i == items[-1][0]:
+                        with span("callback"):
+                            report_session(session)
+                results[i] = {"index": i, "sessionId": payload.sessionId,
+                              "status": "success", "reply": agent_reply or "..."}
+            except Exception as e:
+                # Later items of this session still run: a gap beats a stuck conversation
+                log.warning(f"⚠️ Batch item {i} ({payload.sessionId}) failed: {e}")
+                results[i] = {"index": i, "sessionId": payload.sessionId,
+                              "status": "error", "error": f"{type(e).__name__}: {e}"}
+    finally:
+        if session is not None:
+            report_session(session)
+
+@router.post("/honeypot/batch", response_model=HoneypotBatchResponse, dependencies=[Depends(verify_api_key)])
+@router.post("/h/batch", response_model=HoneypotBatchResponse, dependencies=[Depends(verify_api_key)])
+async def honeypot_batch_endpoint(batch: HoneypotBatchRequest):
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {BATCH_MAX_ITEMS} items)")
+    started = time.perf_counter()
+    batch_deadline = time.monotonic() + BATCH_DEADLINE_SECONDS
+
+    # 1. Validate each item on its own, group the valid ones by session (keeps order)
+    results = [None] * len(batch.items)
+    sessions = {}
+    for i, raw in enumerate(batch.items):
+        try:
+            payload = HoneypotRequest.model_validate(raw)
+        except ValidationError as e:
+            session_id = raw.get("sessionId") if isinstance(raw, dict) else None
+            results[i] = {"index": i, "sessionId": session_id if isinstance(session_id, str) else None,
+                          "status": "error",
+                          "error": f"Invalid item: {e.errors(include_url=False, include_input=False)}"}
+            continue
+        sessions.setdefault(payload.sessionId, []).append((i, payload))
+
+    # 2. Sessions in parallel (bounded), each session's items in order
+    limit = asyncio.Semaphore(BATCH_MAX_CONCURRENT_SESSIONS)
+
+    async def run_limited(items):
+        async with limit:
+            await run_batch_session(items, results, batch_deadline)
+
+    await asyncio.gather(*(run_limited(items) for items in sessions.values()))
+
+    failed = sum(1 for r in results if r["status"] != "success")
+    REQUEST_SECONDS.observe(time.perf_counter() - started, "batch")
+    return HoneypotBatchResponse(
+        status="success" if not failed else "partial",
+        succeeded=len(results) - failed,
+        failed=failed,
+        results=results,
+    )
+
+# 📊 Prometheus scrape endpoint
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @router.get("/debug/guvi-log")
-async def get_last_guvi_data():
-    return _debug_last_payload
\ No newline at end of file
+async def get_last_guvi_data(sessionId: str = None, limit: int = Query(10, ge=1, le=100)):
+    # Latest reports queued (summaries kept on the traces), newest first; optionally one session's
+    reports = []
+    for trace in tracer.store.find(sessionId, limit=tracer.store.recent.maxlen):
+        for entry in reversed(trace.spans):
+            if "report" in entry:
+                reports.append({
+                    "traceId": trace.trace_id,
+                    "sessionId": trace.session_id,
+                    "queued": entry.get("queued"),
+                    "report": entry["report"],
+                })
+        if len(reports) >= limit:
+            break
+    if not reports and sessionId is not None:
+        raise HTTPException(status_code=404, detail=f"No report traced for session {sessionId}")
+    return reports[:limit]
+
+# 🔎 Request traces (ring buffer of the last TRACE_BUFFER_SIZE + the slowest TRACE_SLOWEST_SIZE)
+@router.get("/debug/traces")
+async def get_traces(sessionId: str = None, limit: int = Query(20, ge=1, le=500)):
+    # Without sessionId: summaries of the latest traces; with it: that session's traces in full
+    traces = tracer.store.find(sessionId, limit=limit)
+    return {
+        "tracer": tracer.stats(),
+        "traces": [t.to_dict(with_spans=sessionId is not None) for t in traces],
+    }
+
+@router.get("/debug/traces/slowest")
+async def get_slowest_traces(limit: int = Query(20, ge=1, le=500)):
+    return [t.to_dict(with_spans=False) for t in tracer.store.slowest(limit)]
+
+@router.get("/debug/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    trace = tracer.store.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (rotated out or never recorded)")
+    return trace.to_dict()
+
+@router.get("/debug/callbacks")
+async def get_callback_stats():
+    # Outbox health: queued / coalesced / retried / failed reports
+    return outbox.stats()
+
+@router.get("/debug/llm-keys")
+async def get_llm_key_stats():
+    # Per-key health, budgets and load (use this to size the key pool)
+    return {"keys": llm.key_stats(), "hedging": llm.hedge_stats()}
+
+@router.get("/debug/llm-providers")
+async def get_llm_provider_stats():
+    # Router view: per-provider latency / error averages, score and current order
+    return llm.provider_stats()
+
+@router.get("/debug/reply-cache")
+async def get_reply_cache_stats():
+    # Hit/miss rates = how much LLM quota repeated scam scripts are saving us
+    return reply_cache.stats()
+
+@router.get("/debug/detector")
+async def get_detector_stats():
+    return detector_stats()
+
+@router.get("/debug/sessions")
+async def get_session_stats():
+    # Occupancy vs caps + eviction counts (size SESSION_MAX_* from this)
+    return session_store.stats()
+
+@router.get("/debug/admission")
+async def get_admission_stats():
+    # In-flight / waiting / shed counts for the LLM reply gate
+    return llm_admission.stats()
+
+@router.get("/debug/pacing")
+async def get_pacing_stats():
+    # Real work vs artificial delay (keep the two apart on latency dashboards)
+    return pacer.stats()
+
+@router.get("/debug/prompts")
+async def get_prompt_stats():
+    # SPECULATIVE strategy: how often the precomputed prompt was still valid
+    return prompt_stats()
+
+@router.get("/debug/logging")
+async def get_logging_stats():
+    # Queue depth + what sampling / rate limits / a full queue kept out of the log
+    return log_pipeline.stats()
@@ -1,44 +1,361 @@
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timezone
+
 import httpx
-from app.core.config import GUVI_ENDPOINT
+from app.core.config import (
+    GUVI_CALLBACK_BACKOFF_BASE,
+    GUVI_CALLBACK_BACKOFF_MAX,
+    GUVI_CALLBACK_DRAIN_TIMEOUT,
+    GUVI_CALLBACK_MAX_ATTEMPTS,
+    GUVI_CALLBACK_QUEUE_SIZE,
+    GUVI_CALLBACK_TIMEOUT,
+    GUVI_CALLBACK_WORKERS,
+    GUVI_ENDPOINT,
+    GUVI_JOURNAL_COMPACT_BYTES,
+    GUVI_JOURNAL_ENABLED,
+    GUVI_JOURNAL_FSYNC_INTERVAL,
+    GUVI_JOURNAL_PATH,
+    GUVI_JOURNAL_REPLAY_INTERVAL,
+    GUVI_JOURNAL_REPLAY_RATE,
+)
+from app.callback.journal import ReportJournal
+from app.core.metrics import CALLBACK_POST_SECONDS
+from app.intelligence.index import IntelligenceIndex
+from app.core.log import get_logger
+from app.core.tracing import annotate
+
+log = get_logger("callback")
+
+
+def generate_agent_notes(intel):
+    notes = []
+    if intel.get("upiIds"): notes.append("Asked for UPI.")
+    if intel.get("bankAccounts"): notes.append("Provided Bank Info.")
+    if intel.get("phishingLinks"): notes.append("Sent Link.")
+    if intel.get("phoneNumbers"): notes.append("Shared Phone Number.")
+
+    keywords = str(intel.get("suspiciousKeywords", []))
+    if "GiftCard" in keywords: notes.append("Demanded Gift Cards.")
+    if "Crypto" in keywords: notes.append("Demanded Crypto.")
+    if "App-Detected" in keywords: notes.append("Attempted Remote Access.")
 
-async def send_report(session_data: dict, duration: int, message_count: int):
+    if not notes: return "Scam detected, engaging."
+    return "Scammer behavior identified: " + " ".join(notes)
+
+
+def build_report(session: dict):
     """
-    Sends the final report to the Hackathon Judge Server.
-    Schema fixed based on 422 Error Log from Jan 29, 2026.
+    The report for the Hackathon Judge Server.
+    Schema fixed based on 422 Error Log from Jan 29, 2026:
+    FLAT payload, 'extractedIntelligence', no "engagementMetrics" wrapper.
     """
-    
-    # 1. Construct the FLAT Payload (Exactly what the server asked for)
-    payload = {
-        "sessionId": session_data["sessionId"],
-        "scamDetected": session_data.get("scamDetected", False),
-        
-        # FIX 1: Rename 'intelligence' to 'extractedIntelligence'
-        "extractedIntelligence": session_data.get("intelligence", {
-            "bankAccounts": [],
-            "upiIds": [],
-            "phishingLinks": [],
-            "phoneNumbers": [],
-            "suspiciousKeywords": []
-        }),
-        
-        # FIX 2: Flatten the metrics (No "engagementMetrics" wrapper)
-        "totalMessagesExchanged": message_count,
+    duration = 0
+    start = session.get("startTime")
+    if isinstance(start, datetime):
+        duration = max(0, int((datetime.now(timezone.utc) - start).total_seconds()))
+
+    return {
+        "sessionId": session["sessionId"],
+        "scamDetected": session.get("scamDetected", False),
+        "totalMessagesExchanged": session["messageCount"],
         "engagementDurationSeconds": duration,
-        
-        # FIX 3: Add the missing 'agentNotes' field
-        "agentNotes": "Automated HoneyPot Report: Target engaged and intelligence extracted."
+        "extractedIntelligence": IntelligenceIndex(session).snapshot(),
+        "agentNotes": generate_agent_notes(session["intelligence"])
     }
 
-    # 2. Send it
-    async with httpx.AsyncClient() as client:
+
+class CallbackOutbox:
+    """
+    Background delivery of reports to Guvi (the reply never waits on it).
+
+    - one long-lived pooled httpx client (keep-alive, no TLS handshake per turn)
+    - bounded queue of session ids + a dict with the LATEST payload per session:
+      if several turns queue up, only the newest snapshot is sent
+    - retries with full-jitter exponential backoff; a retry is abandoned as soon
+      as a newer snapshot for the same session is waiting
+    - drained on shutdown (bounded by GUVI_CALLBACK_DRAIN_TIMEOUT)
+    With a `journal`, every report is written to disk before it is queued and
+    acked once Guvi answers; anything that runs out of retries (or doesn't fit
+    the queue) stays on disk and is replayed, oldest first and rate limited.
+    Reports Guvi rejects (422) leave the journal for its dead-letter file.
+    `journal_factory` opens the journal on start() (not at import).
+    """
+
+    def __init__(self, endpoint, max_queue=10000, workers=4, timeout=5.0,
+                 max_attempts=5, backoff_base=0.5, backoff_max=30.0,
+                 journal=None, journal_factory=None, replay_interval=15.0, replay_rate=5.0,
+                 transport=None):
+        self.endpoint = endpoint
+        self.max_queue = max_queue
+        self.workers = workers
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.journal = journal
+        self.journal_factory = journal_factory
+        self.replay_interval = replay_interval
+        self.replay_rate = replay_rate
+        self.transport = transport  # httpx transport override (tests)
+
+        self._queue = None
+        self._pending = {}  # sessionId -> (newest payload not yet picked up, journal seq)
+        self._sending = set()  # sessionIds a worker currently owns (one at a time per session)
+        self._tasks = []
+        self._client = None
+        self.in_flight = 0
+        self.counters = {
+            "submitted": 0, "coalesced": 0, "dropped": 0,
+            "sent": 0, "rejected": 0, "failed": 0, "retries": 0, "superseded": 0,
+            "spilled": 0, "replayed": 0,
+        }
+
+    # --- LIFECYCLE ---
+    def start(self):
+        if self._tasks:
+            return
+        if self.journal is None and self.journal_factory is not None:
+            self.journal = self.journal_factory()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.workers, max_keepalive_connections=self.workers),
+            transport=self.transport,
+        )
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        if self.journal is not None:
+            self.journal.start()
+            self._tasks.append(asyncio.ensure_future(self._replay_forever()))
+
+    async def stop(self, drain_timeout=GUVI_CALLBACK_DRAIN_TIMEOUT):
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            log.warning(f"⚠️ Callback outbox: {len(self._pending) + self.in_flight} report(s) undelivered at shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._client.aclose()
+        self._client = None
+        if self.journal is not None:
+            await self.journal.close()  # Undelivered reports are replayed on next start
+            if self.journal_factory is not None:
+                self.journal = None  # Reopened (and replayed) by the next start()
+
+    # --- PRODUCER (request path: never blocks) ---
+    def submit(self, payload: dict):
+        """Queues a report. Returns False only if the outbox is full."""
+        self.start()
+        session_id = payload["sessionId"]
+        self.counters["submitted"] += 1
+        # 📒 Write-ahead: on disk before anything can lose it
+        seq = self.journal.append(payload) if self.journal is not None else None
+        if session_id in self._pending:
+            self._pending[session_id] = (payload, seq)  # Already queued: just swap in the newer snapshot
+            self.counters["coalesced"] += 1
+            return True
+        if session_id in self._sending:
+            self._pending[session_id] = (payload, seq)  # The worker sending this session picks it up next
+            return True
+        try:
+            self._queue.put_nowait(session_id)
+        except asyncio.QueueFull:
+            if self.journal is not None:
+                self.counters["spilled"] += 1  # Replayed from the journal later
+                return True
+            self.counters["dropped"] += 1
+            log.warning(f"⚠️ Callback outbox full, dropping report for {session_id}")
+            return False
+        self._pending[session_id] = (payload, seq)
+        return True
+
+    # --- CONSUMERS ---
+    async def _worker(self):
+        while True:
+            session_id = await self._queue.get()
+            self._sending.add(session_id)
+            try:
+                # Serial per session, so Guvi never gets an older snapshot after a newer one
+                while session_id in self._pending:
+                    payload, seq = self._pending.pop(session_id)
+                    self.in_flight += 1
+                    try:
+                        result = await self._deliver(payload)
+                        if result is not None and self.journal is not None:
+                            await self._settle(session_id, seq, payload, result)
+                    finally:
+                        self.in_flight -= 1
+            except Exception as e:
+                log.warning(f"⚠️ Callback worker error: {e}")
+            finally:
+                self._sending.discard(session_id)
+                self._queue.task_done()
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _settle(self, session_id, seq, payload, result):
+        """Takes a report Guvi is done with out of the journal (rejected ones as dead letters)."""
+        outcome, detail = result
+        if outcome == "rejected":
+            await self.journal.reject(session_id, seq, payload, detail)
+        else:
+            self.journal.ack(session_id, seq)
+
+    async def _post_once(self, payload):
+        """
+        One attempt. Returns None to retry, or (outcome, detail) once Guvi is
+        done with it: ("ok", None), or ("rejected", its error) for a 422 we can't fix.
+        """
+        started = time.perf_counter()
         try:
-            print(f"🚀 Sending Report to Guvi for {payload['sessionId']}...")
-            response = await client.post(GUVI_ENDPOINT, json=payload, timeout=10)
-            
-            if response.status_code == 200:
-                print(f"✅ Report Sent Successfully! Server replied: {response.text}")
-            else:
-                print(f"⚠️ Report Failed with {response.status_code}: {response.text}")
-                
+            response = await self._client.post(self.endpoint, json=payload)
         except Exception as e:
-            print(f"❌ Connection Error sending report: {e}")
\ No newline at end of file
+            CALLBACK_POST_SECONDS.observe(time.perf_counter() - started, "network_error")
+            log.warning(f"⚠️ Callback Network Error: {e}")
+            return None
+
+        outcome = {200: "ok", 422: "rejected"}.get(response.status_code, "http_error")
+        CALLBACK_POST_SECONDS.observe(time.perf_counter() - started, outcome)
+        if response.status_code == 200:
+            self.counters["sent"] += 1
+            log.info("✅ GUVI ACCEPTED DATA")
+            return ("ok", None)
+        if response.status_code == 422:
+            # Schema problem: retrying the same payload can't help (kept as a dead letter)
+            self.counters["rejected"] += 1
+            log.error(f"❌ GUVI REJECTED (Schema Error): {response.text}")
+            return ("rejected", response.text)
+        log.warning(f"⚠️ GUVI STATUS {response.status_code}: {response.text}")
+        return None
+
+    async def _deliver(self, payload):
+        """Sends with retries. Returns _post_once's result, or None (failed or superseded)."""
+        session_id = payload["sessionId"]
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self.counters["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt))
+                if session_id in self._pending:
+                    # A newer snapshot is queued; it replaces this one
+                    self.counters["superseded"] += 1
+                    return None
+            result = await self._post_once(payload)
+            if result is not None:
+                return result
+
+        self.counters["failed"] += 1
+        if self.journal is not None:
+            log.info(f"📒 Report for {session_id} failed after {self.max_attempts} attempts, kept for replay")
+        else:
+            log.error(f"❌ Report for {session_id} failed after {self.max_attempts} attempts")
+        return None
+
+    # --- REPLAY (reports only the journal still has) ---
+    async def _replay_forever(self):
+        while True:
+            try:
+                await self.replay()
+                if self.journal.needs_compaction():
+                    await self.journal.compact()
+            except Exception as e:
+                log.warning(f"⚠️ Report replay error: {e}")
+            await asyncio.sleep(self.replay_interval)
+
+    async def replay(self):
+        """
+        Re-sends unacked journal reports, oldest first, at most `replay_rate`
+        per second. Stops at the first failure (Guvi still down: try next round).
+        """
+        for seq, session_id in self.journal.unacked():
+            if session_id in self._pending or session_id in self._sending:
+                continue  # The live path already has this session's newest report
+            if not self.journal.is_unacked(session_id, seq):
+                continue  # Acked while we were replaying earlier ones
+            payload = self.journal.read(session_id)
+            # Own the session like a worker does, so live reports queue behind us
+            self._sending.add(session_id)
+            try:
+                result = await self._post_once(payload)
+            finally:
+                self._sending.discard(session_id)
+                if session_id in self._pending:
+                    try:
+                        self._queue.put_nowait(session_id)
+                    except asyncio.QueueFull:
+                        # Like submit(): the journal still has it, the next round replays it
+                        del self._pending[session_id]
+                        self.counters["spilled"] += 1
+            if result is None:
+                return
+            await self._settle(session_id, seq, payload, result)
+            self.counters["replayed"] += 1
+            await asyncio.sleep(1.0 / self.replay_rate)
+
+    def stats(self):
+        return {
+            **self.counters,
+            "queued": len(self._pending),
+            "inFlight": self.in_flight,
+            "workers": len(self._tasks),
+            "journal": self.journal.stats() if self.journal is not None else None,
+        }
+
+
+def _open_journal():
+    if not GUVI_JOURNAL_ENABLED:
+        return None
+    try:
+        os.makedirs(os.path.dirname(GUVI_JOURNAL_PATH), exist_ok=True)
+        return ReportJournal(
+            GUVI_JOURNAL_PATH,
+            fsync_interval=GUVI_JOURNAL_FSYNC_INTERVAL,
+            compact_bytes=GUVI_JOURNAL_COMPACT_BYTES,
+        )
+    except OSError as e:
+        log.warning(f"⚠️ Could not open report journal {GUVI_JOURNAL_PATH}: {e}. Reports are memory-only.")
+        return None
+
+
+# One dispatcher for every report we send
+outbox = CallbackOutbox(
+    GUVI_ENDPOINT,
+    max_queue=GUVI_CALLBACK_QUEUE_SIZE,
+    workers=GUVI_CALLBACK_WORKERS,
+    timeout=GUVI_CALLBACK_TIMEOUT,
+    max_attempts=GUVI_CALLBACK_MAX_ATTEMPTS,
+    backoff_base=GUVI_CALLBACK_BACKOFF_BASE,
+    backoff_max=GUVI_CALLBACK_BACKOFF_MAX,
+    journal_factory=_open_journal,
+    replay_interval=GUVI_JOURNAL_REPLAY_INTERVAL,
+    replay_rate=GUVI_JOURNAL_REPLAY_RATE,
+)
+
+
+def report_summary(payload: dict):
+    """What a trace keeps of a report: counts, not the extracted values themselves."""
+    intel = payload.get("extractedIntelligence", {})
+    return {
+        "sessionId": payload["sessionId"],
+        "scamDetected": payload.get("scamDetected"),
+        "totalMessagesExchanged": payload.get("totalMessagesExchanged"),
+        "engagementDurationSeconds": payload.get("engagementDurationSeconds"),
+        "intelCounts": {key: len(values) for key, values in intel.items()},
+    }
+
+
+def send_report(session: dict):
+    """
+    Queues the current report for this session (returns immediately).
+    A summary is kept on the request's trace (see /debug/guvi-log).
+    """
+    payload = build_report(session)
+    queued = outbox.submit(payload)
+    annotate(report=report_summary(payload), queued=queued)
+    return queued
@@ -0,0 +1,351 @@
+# app/callback/journal.py
+import asyncio
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, one process per journal assumed
+    fcntl = None
+
+from app.core.log import get_logger
+
+log = get_logger("callback")
+
+# Journal files per base path: one per live process (path, path.1, path.2 ...)
+MAX_SLOTS = 64
+
+
+def _try_lock(path):
+    """Exclusive, non-blocking lock on `path`.lock. Returns the open lock file, or None if taken."""
+    lock = open(path + ".lock", "a")
+    if fcntl is None:
+        return lock
+    try:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return None
+    return lock
+
+
+def _slot_path(path, slot):
+    return path if slot == 0 else f"{path}.{slot}"
+
+
+class ReportJournal:
+    """
+    Append-only JSONL journal of outgoing Guvi reports (write-ahead).
+
+    Every report is appended BEFORE we try to send it, and an ack record is
+    appended once Guvi has it. On restart (or after an outage) whatever has
+    no ack is replayed. Lines:
+        {"op": "report", "seq": 12, "sessionId": "...", "payload": {...}}
+        {"op": "ack", "seq": 12, "sessionId": "..."}
+
+    - fsync is batched: appends only write, a background task fsyncs the
+      file every `fsync_interval` seconds
+    - only the NEWEST report per session matters (each one is a full
+      snapshot), so memory holds one (seq, file offset) per session with
+      something unacked; payloads stay on disk
+    - compaction rewrites the file with just those newest unacked reports;
+      it waits for an in-flight fsync (and vice versa)
+    - one file per process: each journal locks the first free slot (`path`,
+      `path.1` ...), so uvicorn workers never interleave or compact each
+      other's records, and takes over slots left behind by dead workers
+    - reports Guvi rejects (422) are moved to `<file>.rejected` (dead letters)
+    """
+
+    def __init__(self, path, fsync_interval=0.05, compact_bytes=4 * 1024 * 1024):
+        self.base_path = path
+        self.fsync_interval = fsync_interval
+        self.compact_bytes = compact_bytes
+        self._lock_file = None
+        self.path = self._claim(path)
+        self.dead_letter_path = self.path + ".rejected"
+
+        self._unacked = {}  # sessionId -> (seq, offset of its report line)
+        self._next_seq = 1
+        self._records = 0  # Lines in the file (live + dead)
+        self._dirty = False
+        self._fsync_task = None
+        # Held around fsync / compaction / close: none of them may see a swapped fd
+        self._io_lock = asyncio.Lock()
+
+        self.appended = 0
+        self.acked = 0
+        self.rejected = 0
+        self.compactions = 0
+        self.sync_errors = 0
+        self.adopted = 0
+
+        self._load()
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+        self._adopt_orphans()
+
+    # --- STARTUP ---
+    def _claim(self, path):
+        for slot in range(MAX_SLOTS):
+            candidate = _slot_path(path, slot)
+            lock = _try_lock(candidate)
+            if lock is not None:
+                self._lock_file = lock
+                return candidate
+        raise OSError(f"All {MAX_SLOTS} journal slots for {path} are in use")
+
+    def _adopt_orphans(self):
+        """Moves the unacked reports of slots no live process holds into this journal."""
+        for slot in range(MAX_SLOTS):
+            candidate = _slot_path(self.base_path, slot)
+            if candidate == self.path or not os.path.exists(candidate):
+                continue
+            lock = _try_lock(candidate)
+            if lock is None:
+                continue  # A live worker owns it
+            try:
+                orphan = ReportJournal._scan(candidate)
+                for _, payload in sorted(orphan.values(), key=lambda item: item[0]):
+                    if payload["sessionId"] not in self._unacked:
+                        self.append(payload)
+                        self.adopted += 1
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                os.remove(candidate)
+                if orphan:
+                    log.info(f"📒 Report journal: took over {len(orphan)} report(s) from {candidate}")
+            finally:
+                lock.close()
+
+    @staticmethod
+    def _scan(path):
+        """{sessionId: (seq, payload)}: the newest unacked report per session in a journal file."""
+        unacked = {}
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # Torn tail
+                session_id = record.get("sessionId")
+                if record.get("op") == "report":
+                    unacked[session_id] = (record.get("seq", 0), record["payload"])
+                elif record.get("op") == "ack":
+                    current = unacked.get(session_id)
+                    if current is not None and current[0] <= record.get("seq", 0):
+                        del unacked[session_id]
+        return unacked
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        good_end = 0
+        with open(self.path, "rb") as f:
+            offset = 0
+            for line in f:
+                start, offset = offset, offset + len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # Torn last write from a crash: drop the tail
+                good_end = offset
+                self._records += 1
+                seq = record.get("seq", 0)
+                self._next_seq = max(self._next_seq, seq + 1)
+                session_id = record.get("sessionId")
+                if record.get("op") == "report":
+                    self._unacked[session_id] = (seq, start)
+                elif record.get("op") == "ack":
+                    self._forget(session_id, seq)
+        if good_end < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(good_end)
+        if self._unacked:
+            log.info(f"📒 Report journal: {len(self._unacked)} undelivered report(s) to replay")
+
+    # --- WRITES (event loop thread) ---
+    def _write(self, record):
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode()
+        offset = self._size
+        self._file.write(line)
+        self._size += len(line)
+        self._records += 1
+        self._dirty = True
+        return offset
+
+    def append(self, payload):
+        """Journals a report. Returns its sequence number."""
+        seq = self._next_seq
+        self._next_seq += 1
+        session_id = payload["sessionId"]
+        offset = self._write({"op": "report", "seq": seq, "sessionId": session_id, "payload": payload})
+        self._unacked[session_id] = (seq, offset)
+        self.appended += 1
+        return seq
+
+    def ack(self, session_id, seq):
+        """Guvi has this report (and so everything older for the session)."""
+        if seq is None:
+            return
+        self._write({"op": "ack", "seq": seq, "sessionId": session_id})
+        self._forget(session_id, seq)
+        self.acked += 1
+
+    async def reject(self, session_id, seq, payload, reason):
+        """Guvi refused this report for good (422): keep it as a dead letter, then ack it."""
+        record = {
+            "sessionId": session_id,
+            "seq": seq,
+            "rejectedAt": time.time(),
+            "reason": str(reason)[:2000],
+            "payload": payload,
+        }
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode()
+        await asyncio.to_thread(self._write_dead_letter, line)
+        self.rejected += 1
+        self.ack(session_id, seq)
+
+    def _write_dead_letter(self, line):
+        # Rare: its own file, fsynced before the ack can hit the journal
+        with open(self.dead_letter_path, "ab") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _forget(self, session_id, seq):
+        current = self._unacked.get(session_id)
+        if current is not None and current[0] <= seq:
+            del self._unacked[session_id]
+
+    # --- READS ---
+    def unacked(self):
+        """[(seq, sessionId)] of the newest unacked report per session, oldest first."""
+        return sorted((seq, session_id) for session_id, (seq, _) in self._unacked.items())
+
+    def is_unacked(self, session_id, seq):
+        current = self._unacked.get(session_id)
+        return current is not None and current[0] == seq
+
+    def read(self, session_id):
+        """The newest unacked payload for a session (from disk), or None."""
+        current = self._unacked.get(session_id)
+        if current is None:
+            return None
+        self._file.flush()
+        with open(self.path, "rb") as f:
+            f.seek(current[1])
+            return json.loads(f.readline())["payload"]
+
+    # --- DURABILITY ---
+    async def _fsync_forever(self):
+        while True:
+            await asyncio.sleep(self.fsync_interval)
+            if not self._dirty:
+                continue
+            try:
+                await self.sync()
+            except Exception as e:
+                # Still dirty: the next tick tries again
+                self.sync_errors += 1
+                log.warning(f"⚠️ Report journal fsync failed: {e}")
+
+    async def sync(self):
+        async with self._io_lock:
+            self._dirty = False
+            try:
+                self._file.flush()
+                # fsync on the fd in a thread: the loop keeps appending meanwhile
+                await asyncio.to_thread(os.fsync, self._file.fileno())
+            except BaseException:
+                self._dirty = True
+                raise
+
+    def start(self):
+        if self._fsync_task is None:
+            self._fsync_task = asyncio.ensure_future(self._fsync_forever())
+
+    async def close(self):
+        async with self._io_lock:
+            # Under the lock: the fsync task is never cancelled mid-fsync
+            if self._fsync_task is not None:
+                self._fsync_task.cancel()
+                await asyncio.gather(self._fsync_task, return_exceptions=True)
+                self._fsync_task = None
+            self._file.flush()
+            await asyncio.to_thread(os.fsync, self._file.fileno())
+            self._file.close()
+        self._lock_file.close()
+
+    # --- COMPACTION ---
+    def needs_compaction(self):
+        return self._size > self.compact_bytes and self._records > 2 * len(self._unacked)
+
+    async def compact(self):
+        """
+        Rewrites the journal with only the newest unacked report per session.
+        The copy (and its fsync) runs in a thread; whatever is appended
+        meanwhile is carried over when the new file is swapped in.
+        """
+        async with self._io_lock:
+            self._file.flush()
+            cut, cut_records = self._size, self._records
+            live = [(seq, session_id, self._unacked[session_id][1]) for seq, session_id in self.unacked()]
+            tmp_path = self.path + ".compact"
+            try:
+                offsets, size = await asyncio.to_thread(self._write_compacted, tmp_path, live)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            # Appends (reports and acks) made while the thread ran: a short tail
+            self._file.flush()
+            tail_bytes = self._size - cut
+            if tail_bytes:
+                with open(self.path, "rb") as src, open(tmp_path, "ab") as dst:
+                    src.seek(cut)
+                    dst.write(src.read(tail_bytes))
+            new_unacked = {}
+            for session_id, (seq, offset) in self._unacked.items():
+                # Older than the cut: unchanged since the snapshot, so it was copied
+                new_unacked[session_id] = (seq, size + offset - cut) if offset >= cut else offsets[session_id]
+
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "ab")
+            self._unacked = new_unacked
+            self._size = size + tail_bytes
+            self._records = len(live) + (self._records - cut_records)
+            if tail_bytes:
+                self._dirty = True  # The carried-over tail is fsynced by the next sync()
+            self.compactions += 1
+
+    def _write_compacted(self, tmp_path, live):
+        """Worker thread: copies the given report lines to `tmp_path`, fsynced. Returns (offsets, size)."""
+        offsets = {}
+        size = 0
+        with open(self.path, "rb") as src, open(tmp_path, "wb") as dst:
+            for seq, session_id, offset in live:
+                src.seek(offset)
+                line = src.readline()
+                offsets[session_id] = (seq, size)
+                dst.write(line)
+                size += len(line)
+            dst.flush()
+            os.fsync(dst.fileno())
+        return offsets, size
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "unacked": len(self._unacked),
+            "bytes": self._size,
+            "records": self._records,
+            "appended": self.appended,
+            "acked": self.acked,
+            "rejected": self.rejected,
+            "adopted": self.adopted,
+            "compactions": self.compactions,
+            "syncErrors": self.sync_errors,
+        }
@@ -0,0 +1,110 @@
+# app/core/admission.py
+import asyncio
+import time
+from collections import deque
+
+from app.core.config import ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUE, ADMISSION_MAX_WAIT
+
+
+class AdmissionController:
+    """
+    Bounded concurrency in front of the LLM (load shedding).
+
+    - at most `max_in_flight` callers hold a slot at once
+    - at most `max_queue` callers wait for one; beyond that we shed at once
+    - nobody waits longer than `max_wait` (or past their own deadline)
+    A shed caller gets False from acquire() and must answer without the LLM.
+    Slots are handed over FIFO, straight from release() to the next waiter.
+    """
+
+    def __init__(self, max_in_flight=32, max_queue=64, max_wait=1.5):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self.in_flight = 0
+        self._waiters = deque()
+
+        self.admitted = 0
+        self.queued = 0
+        self.shed = {"queue_full": 0, "wait_timeout": 0}
+        self.total_wait = 0.0
+
+    @property
+    def saturated(self):
+        """True when a new caller would have to queue (background work should back off)."""
+        return bool(self._waiters) or self.in_flight >= self.max_in_flight
+
+    async def acquire(self, deadline=None):
+        """Returns True with a slot held (call release() later), False if shed."""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.shed["queue_full"] += 1
+            return False
+
+        wait = self.max_wait
+        if deadline is not None:
+            wait = min(wait, deadline - time.monotonic())
+        if wait <= 0:
+            self.shed["wait_timeout"] += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=wait)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Slot was handed to us just as we timed out: keep it
+                pass
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+                self.shed["wait_timeout"] += 1
+                return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # Got the slot but our caller is gone
+            else:
+                waiter.cancel()
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            raise
+        finally:
+            self.total_wait += time.monotonic() - started
+        self.admitted += 1
+        return True
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # Slot passes straight to the next waiter
+                return
+        self.in_flight -= 1
+
+    def stats(self):
+        return {
+            "inFlight": self.in_flight,
+            "waiting": len(self._waiters),
+            "maxInFlight": self.max_in_flight,
+            "maxQueue": self.max_queue,
+            "maxWaitSeconds": self.max_wait,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": dict(self.shed),
+            "avgQueueWaitMs": round(1000 * self.total_wait / self.queued, 1) if self.queued else 0.0,
+        }
+
+
+# One gate for every request-path LLM call (agent replies, detector fallback)
+llm_admission = AdmissionController(
+    max_in_flight=ADMISSION_MAX_IN_FLIGHT,
+    max_queue=ADMISSION_MAX_QUEUE,
+    max_wait=ADMISSION_MAX_WAIT,
+)
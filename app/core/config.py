@@ -12,7 +12,171 @@ MY_SECRET_KEY = os.getenv("MY_SECRET_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 # 3. Hackathon Configuration
-GUVI_ENDPOINT = "https://hackathon.guvi.in/api/updateHoneyPotFinalResult"
+# (Overridable so benchmarks can point reports at a local receiver)
+GUVI_ENDPOINT = os.getenv("GUVI_ENDPOINT", "https://hackathon.guvi.in/api/updateHoneyPotFinalResult")
 
 # 4. Optional: Database or other settings
-# DATABASE_URL = os.getenv("DATABASE_URL")
\ No newline at end of file
+# DATABASE_URL = os.getenv("DATABASE_URL")
+# Where files we write live (session DB, report journal); absolute, never the CWD
+DATA_DIR = os.path.abspath(os.getenv("DATA_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "data")))
+
+# 5. LLM Key Pool (health-aware scheduling across GROQ_API_KEY, GROQ_API_KEY2 ... GROQ_API_KEYn)
+# Consecutive failures before a key's circuit opens
+LLM_KEY_FAILURE_THRESHOLD = int(os.getenv("LLM_KEY_FAILURE_THRESHOLD", "3"))
+# First cooldown after a circuit opens (doubles on every re-trip, up to the max)
+LLM_KEY_CIRCUIT_BASE_COOLDOWN = float(os.getenv("LLM_KEY_CIRCUIT_BASE_COOLDOWN", "5"))
+LLM_KEY_CIRCUIT_MAX_COOLDOWN = float(os.getenv("LLM_KEY_CIRCUIT_MAX_COOLDOWN", "60"))
+# Smoothing for per-key latency / failure-rate averages
+LLM_KEY_EWMA_ALPHA = float(os.getenv("LLM_KEY_EWMA_ALPHA", "0.2"))
+
+# 6. LLM Latency Controls
+# Per-attempt timeout for a single Groq call
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "5.0"))
+# Overall budget for one /honeypot request (all LLM attempts share it)
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "8.0"))
+# Hedging (opt-in): if the first key is slower than this latency percentile,
+# fire the same request on a second key and keep whichever answers first.
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.9"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.15"))
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "1.0"))
+# Extra quota we are willing to spend: at most this fraction of calls may be hedged
+LLM_HEDGE_MAX_RATIO = float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1"))
+
+# 7. Reply Cache (repeated scam scripts get a pooled, previously generated reply)
+REPLY_CACHE_ENABLED = os.getenv("REPLY_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+REPLY_CACHE_MAX_ENTRIES = int(os.getenv("REPLY_CACHE_MAX_ENTRIES", "5000"))
+REPLY_CACHE_MAX_BYTES = int(os.getenv("REPLY_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+REPLY_CACHE_TTL = float(os.getenv("REPLY_CACHE_TTL", "3600"))
+# Distinct replies collected per key before we start serving from the cache
+REPLY_CACHE_POOL_SIZE = int(os.getenv("REPLY_CACHE_POOL_SIZE", "3"))
+
+# 8. Scam Detector LLM Fallback (verdicts cached by content hash of the normalized text)
+DETECT_VERDICT_CACHE_SIZE = int(os.getenv("DETECT_VERDICT_CACHE_SIZE", "10000"))
+DETECT_VERDICT_CACHE_TTL = float(os.getenv("DETECT_VERDICT_CACHE_TTL", str(6 * 3600)))
+
+# 9. Session Store (bounded RAM: idle TTL + LRU caps, swept in the background)
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "10000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024)))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "30"))
+# Sessions expired per sweep step before yielding back to the event loop
+SESSION_SWEEP_BATCH = int(os.getenv("SESSION_SWEEP_BATCH", "500"))
+
+# 10. Session Persistence ("memory" = RAM only, lost on restart; "sqlite" = WAL file on disk;
+# "redis" = shared by every worker/pod, needed to run more than one uvicorn worker)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+SESSION_SQLITE_PATH = os.path.abspath(os.getenv("SESSION_SQLITE_PATH", os.path.join(DATA_DIR, "honeypot_sessions.db")))
+# Persisted sessions untouched for this long are purged from the backend
+SESSION_PERSIST_TTL = float(os.getenv("SESSION_PERSIST_TTL", str(24 * 3600)))
+# Write batching: max saves per transaction / how long the writer waits to fill a batch
+SESSION_WRITE_BATCH = int(os.getenv("SESSION_WRITE_BATCH", "256"))
+SESSION_WRITE_INTERVAL = float(os.getenv("SESSION_WRITE_INTERVAL", "0.05"))
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+SESSION_REDIS_PREFIX = os.getenv("SESSION_REDIS_PREFIX", "honeypot")
+SESSION_REDIS_MAX_CONNECTIONS = int(os.getenv("SESSION_REDIS_MAX_CONNECTIONS", "50"))
+
+# 11. Guvi Callback Outbox (reports are sent in the background, latest snapshot per session)
+GUVI_CALLBACK_QUEUE_SIZE = int(os.getenv("GUVI_CALLBACK_QUEUE_SIZE", "10000"))
+GUVI_CALLBACK_WORKERS = int(os.getenv("GUVI_CALLBACK_WORKERS", "4"))
+GUVI_CALLBACK_TIMEOUT = float(os.getenv("GUVI_CALLBACK_TIMEOUT", "5.0"))
+GUVI_CALLBACK_MAX_ATTEMPTS = int(os.getenv("GUVI_CALLBACK_MAX_ATTEMPTS", "5"))
+# Retry n waits random(0, min(MAX, BASE * 2^n)) seconds
+GUVI_CALLBACK_BACKOFF_BASE = float(os.getenv("GUVI_CALLBACK_BACKOFF_BASE", "0.5"))
+GUVI_CALLBACK_BACKOFF_MAX = float(os.getenv("GUVI_CALLBACK_BACKOFF_MAX", "30"))
+# How long shutdown waits for queued reports to go out
+GUVI_CALLBACK_DRAIN_TIMEOUT = float(os.getenv("GUVI_CALLBACK_DRAIN_TIMEOUT", "10"))
+
+# 12. Report Journal (write-ahead log: no report is lost if Guvi is down or we restart)
+GUVI_JOURNAL_ENABLED = os.getenv("GUVI_JOURNAL_ENABLED", "true").lower() in ("1", "true", "yes")
+# One file per worker process: GUVI_JOURNAL_PATH, GUVI_JOURNAL_PATH.1 ... (see app/callback/journal.py)
+GUVI_JOURNAL_PATH = os.path.abspath(os.getenv("GUVI_JOURNAL_PATH", os.path.join(DATA_DIR, "guvi_reports.jsonl")))
+# Appends are fsynced in batches, at most this far apart
+GUVI_JOURNAL_FSYNC_INTERVAL = float(os.getenv("GUVI_JOURNAL_FSYNC_INTERVAL", "0.05"))
+# Undelivered reports are retried this often, at most REPLAY_RATE per second
+GUVI_JOURNAL_REPLAY_INTERVAL = float(os.getenv("GUVI_JOURNAL_REPLAY_INTERVAL", "15"))
+GUVI_JOURNAL_REPLAY_RATE = float(os.getenv("GUVI_JOURNAL_REPLAY_RATE", "5"))
+# Rewrite the journal (newest unacked report per session only) past this size
+GUVI_JOURNAL_COMPACT_BYTES = int(os.getenv("GUVI_JOURNAL_COMPACT_BYTES", str(4 * 1024 * 1024)))
+
+# 13. Admission Control (load shedding in front of request-path LLM calls: replies + detector fallback)
+# Concurrent LLM calls allowed; extra requests wait in a bounded queue
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "32"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+# Longest a request waits for a slot before it gets a canned stall reply (or an "unknown" verdict)
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "1.5"))
+
+# 14. Response Pacing (human-like reply timing; see app/core/pacing.py for the per-channel defaults)
+# Kill switch: false = reply as soon as it's ready (benchmarks, load tests)
+PACING_ENABLED = os.getenv("PACING_ENABLED", "true").lower() in ("1", "true", "yes")
+# Optional JSON overrides, e.g. {"sms": {"max": 1.5}, "telegram": {"min": 0.5, "chars_per_second": 90}}
+PACING_POLICIES = os.getenv("PACING_POLICIES")
+
+# 15. Prompt Budget (estimated tokens, see app/core/tokens.py)
+# Whole user prompt (intel + history + new message + instructions)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "600"))
+# Most history a session keeps ready for its next prompt
+PROMPT_HISTORY_MAX_TOKENS = int(os.getenv("PROMPT_HISTORY_MAX_TOKENS", "250"))
+# Per-message caps inside the prompt (Arthur's own lines need less context)
+PROMPT_SCAMMER_MESSAGE_MAX_TOKENS = int(os.getenv("PROMPT_SCAMMER_MESSAGE_MAX_TOKENS", "250"))
+PROMPT_USER_MESSAGE_MAX_TOKENS = int(os.getenv("PROMPT_USER_MESSAGE_MAX_TOKENS", "80"))
+
+# 16. System Prompt Strategy ("STATIC" | "AI_GENERATED" | "SPECULATIVE", see app/agent/prompts.py)
+PROMPT_STRATEGY = os.getenv("PROMPT_STRATEGY", "STATIC").upper()
+# SPECULATIVE: precomputed next-turn prompts per session
+SPECULATIVE_PROMPT_MAX_ENTRIES = int(os.getenv("SPECULATIVE_PROMPT_MAX_ENTRIES", "10000"))
+SPECULATIVE_PROMPT_TTL = float(os.getenv("SPECULATIVE_PROMPT_TTL", "1800"))
+# Time budget for one background precompute
+SPECULATIVE_PROMPT_TIMEOUT = float(os.getenv("SPECULATIVE_PROMPT_TIMEOUT", "8.0"))
+
+# 17. Batch Endpoint (/honeypot/batch)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+# Different sessions in one batch are processed concurrently, up to this many at once
+BATCH_MAX_CONCURRENT_SESSIONS = int(os.getenv("BATCH_MAX_CONCURRENT_SESSIONS", "16"))
+# Budget for the whole batch (each item also keeps REQUEST_DEADLINE_SECONDS)
+BATCH_DEADLINE_SECONDS = float(os.getenv("BATCH_DEADLINE_SECONDS", "30.0"))
+
+# 18. Logging (queue-based JSON logger, see app/core/log.py)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" (one object per line) or "text" (human readable, for local runs)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Records waiting for the writer thread; beyond this they are dropped, never waited on
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Share of INFO/DEBUG records kept per category, JSON, e.g. {"pacing": 0.1}
+# (warnings and errors are never sampled out)
+LOG_SAMPLING = os.getenv("LOG_SAMPLING")
+# Max records per second per category (all levels), JSON, e.g. {"llm": 50}
+LOG_RATE_LIMITS = os.getenv("LOG_RATE_LIMITS")
+LOG_DEFAULT_RATE_LIMIT = float(os.getenv("LOG_DEFAULT_RATE_LIMIT", "100"))
+# Most of a rejected request body written to the log
+LOG_BODY_MAX_BYTES = int(os.getenv("LOG_BODY_MAX_BYTES", "2048"))
+
+# 19. Request Tracing (see app/core/tracing.py, /debug/traces)
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Most recent traces kept, and the slowest ones kept separately
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "500"))
+TRACE_SLOWEST_SIZE = int(os.getenv("TRACE_SLOWEST_SIZE", "50"))
+# Sampled cProfile: profile this share of requests, keep the profile only
+# if the request took longer than the threshold (0 = off)
+TRACE_PROFILE_SAMPLE_RATE = float(os.getenv("TRACE_PROFILE_SAMPLE_RATE", "0"))
+TRACE_PROFILE_THRESHOLD = float(os.getenv("TRACE_PROFILE_THRESHOLD", "2.0"))
+# Functions listed per kept profile (sorted by cumulative time)
+TRACE_PROFILE_TOP = int(os.getenv("TRACE_PROFILE_TOP", "30"))
+
+# 20. LLM Providers + Router (see app/core/providers.py)
+# "auto" = latency/error-aware routing across configured providers,
+# or pin one first: "groq" | "gemini" | "local" (the others stay as fallbacks)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "auto").lower()
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+# Offline template provider answers when every real provider failed
+LLM_LOCAL_FALLBACK = os.getenv("LLM_LOCAL_FALLBACK", "true").lower() in ("1", "true", "yes")
+# Simulated latency of the local provider (load tests without a network)
+LLM_LOCAL_LATENCY = float(os.getenv("LLM_LOCAL_LATENCY", "0"))
+# Router: smoothing, how much a provider's error rate inflates its latency score,
+# and how long a provider sits out after MAX_FAILURES failures in a row
+LLM_ROUTER_EWMA_ALPHA = float(os.getenv("LLM_ROUTER_EWMA_ALPHA", "0.2"))
+LLM_ROUTER_ERROR_PENALTY = float(os.getenv("LLM_ROUTER_ERROR_PENALTY", "4.0"))
+LLM_ROUTER_MAX_FAILURES = int(os.getenv("LLM_ROUTER_MAX_FAILURES", "3"))
+LLM_ROUTER_COOLDOWN = float(os.getenv("LLM_ROUTER_COOLDOWN", "30"))
+# Share of calls sent to the runner-up first, so its latency stats stay current
+LLM_ROUTER_EXPLORE_RATE = float(os.getenv("LLM_ROUTER_EXPLORE_RATE", "0.05"))
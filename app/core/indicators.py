@@ -0,0 +1,111 @@
+# app/core/indicators.py
+"""
+Every keyword indicator the honeypot knows about, in one place.
+Detection and extraction share a single precompiled matcher, so each
+message is scanned once no matter how many lists (or feed entries) exist.
+"""
+import os
+from functools import lru_cache
+
+from app.core.matcher import KeywordMatcher, ScanResult
+from app.core.log import get_logger
+
+log = get_logger("detect")
+
+# --- CATEGORY TAGS ---
+SCAM = "scam"
+REMOTE_APP = "remote_app"
+GIFT_BRAND = "gift_brand"
+SENSITIVE = "sensitive"
+
+# 1. Scam triggers (used by detect_scam)
+SCAM_KEYWORDS = [
+    "blocked",
+    "suspended",
+    "verify",
+    "urgent",
+    "account",
+    "upi",
+    "otp",
+    "freeze",
+    "immediately",
+    "bank",
+    "kyc",
+    "refund",
+    "won",
+    "lottery",
+    "expired",
+    "click here",
+    "link",
+    "password",
+    "pin",
+]
+
+# 2. Advanced scam mapping (used by extract_intelligence)
+REMOTE_APPS = [
+    "anydesk",
+    "teamviewer",
+    "quicksupport",
+    "alpemix",
+    "rustdesk",
+    "screen share",
+    "remote support",
+    "any desk",
+]
+GIFT_BRANDS = [
+    "google play",
+    "amazon gift",
+    "steam card",
+    "apple card",
+    "itunes",
+    "vanilla visa",
+    "play station",
+    "xbox gift",
+    "razer gold",
+]
+SENSITIVE_CONTEXT_WORDS = ["mpin", "pin", "otp", "code", "password", "cvv"]
+
+# 3. Optional threat feed: one "category,keyword" per line, '#' for comments.
+# Lets us grow to thousands of indicators without touching the code.
+INDICATOR_FEED_PATH = os.getenv("INDICATOR_FEED_PATH")
+_KNOWN_CATEGORIES = (SCAM, REMOTE_APP, GIFT_BRAND, SENSITIVE)
+
+
+def load_indicator_feed(path):
+    """Reads a feed file into [(keyword, category), ...]. Unknown categories are skipped."""
+    entries = []
+    with open(path, encoding="utf-8") as feed:
+        for line in feed:
+            line = line.strip()
+            if not line or line.startswith("#") or "," not in line:
+                continue
+            category, keyword = (part.strip() for part in line.split(",", 1))
+            if category in _KNOWN_CATEGORIES and keyword:
+                entries.append((keyword.lower(), category))
+    return entries
+
+
+def _build_patterns():
+    patterns = [(kw, SCAM) for kw in SCAM_KEYWORDS]
+    patterns += [(kw, REMOTE_APP) for kw in REMOTE_APPS]
+    patterns += [(kw, GIFT_BRAND) for kw in GIFT_BRANDS]
+    patterns += [(kw, SENSITIVE) for kw in SENSITIVE_CONTEXT_WORDS]
+    if INDICATOR_FEED_PATH:
+        try:
+            patterns += load_indicator_feed(INDICATOR_FEED_PATH)
+        except OSError as e:
+            log.warning(f"⚠️ Could not load indicator feed {INDICATOR_FEED_PATH}: {e}")
+    return patterns
+
+
+# Built ONCE at import
+INDICATOR_MATCHER = KeywordMatcher(_build_patterns())
+
+
+@lru_cache(maxsize=64)
+def scan_indicators(text: str) -> ScanResult:
+    """
+    One scan per message. detect_scam and extract_intelligence both call this
+    with the same text in the same request, so the second call is a cache hit.
+    """
+    return ScanResult(INDICATOR_MATCHER.scan(text.lower()))
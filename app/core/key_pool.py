@@ -0,0 +1,354 @@
+# app/core/key_pool.py
+import os
+import re
+import time
+from collections import deque
+
+from app.core.config import (
+    LLM_KEY_CIRCUIT_BASE_COOLDOWN,
+    LLM_KEY_CIRCUIT_MAX_COOLDOWN,
+    LLM_KEY_FAILURE_THRESHOLD,
+    LLM_KEY_EWMA_ALPHA,
+)
+from app.core.metrics import LLM_CALL_SECONDS, LLM_ERRORS
+
+# Groq sends reset windows like "2m59.56s", "7.66s" or "450ms"
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+# Env vars like GROQ_API_KEY, GROQ_API_KEY2, GROQ_API_KEY17 ...
+_KEY_ENV = re.compile(r"^GROQ_API_KEY(\d*)$")
+
+
+def parse_reset_duration(value):
+    """
+    Converts a rate-limit reset header ("1m30.5s", "450ms", "12") to seconds.
+    Returns None when the header is missing or unreadable.
+    """
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _header_float(headers, name):
+    try:
+        raw = headers.get(name)
+        return float(raw) if raw is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    A refilling budget. Capacity and refill rate are learned from the
+    x-ratelimit-* headers, so the bucket follows what Groq actually allows.
+    Until the first response arrives the bucket is unlimited.
+    """
+
+    def __init__(self):
+        self.capacity = None  # None = unknown, treat as unlimited
+        self.tokens = 0.0
+        self.refill_per_second = 0.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        if self.capacity is None:
+            return
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+        self.updated = now
+
+    def available(self, now=None):
+        if self.capacity is None:
+            return float("inf")
+        self._refill(now or time.monotonic())
+        return self.tokens
+
+    def consume(self, amount, now=None):
+        if self.capacity is None:
+            return
+        self._refill(now or time.monotonic())
+        self.tokens = max(0.0, self.tokens - amount)
+
+    def sync(self, limit, remaining, reset_seconds, now=None):
+        """Re-anchor the bucket on the server's view of the budget."""
+        if limit is None or remaining is None:
+            return
+        now = now or time.monotonic()
+        self.capacity = max(limit, 1.0)
+        self.tokens = max(0.0, min(remaining, self.capacity))
+        if reset_seconds and reset_seconds > 0:
+            # The missing budget comes back over the reset window
+            self.refill_per_second = max(self.capacity - self.tokens, 1.0) / reset_seconds
+        elif self.refill_per_second <= 0:
+            self.refill_per_second = self.capacity / 60.0
+        self.updated = now
+
+    def drain(self, refill_after, now=None):
+        """Empty the bucket until `refill_after` seconds from now (used on 429)."""
+        now = now or time.monotonic()
+        if self.capacity is None:
+            self.capacity = 1.0
+        self.tokens = 0.0
+        self.refill_per_second = 1.0 / max(refill_after, 0.001)
+        self.updated = now
+
+
+class KeyState:
+    """Health, budget and load bookkeeping for ONE Groq API key."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, client):
+        self.name = name
+        self.client = client
+
+        # Budgets (fed from response headers)
+        self.request_budget = TokenBucket()
+        self.token_budget = TokenBucket()
+
+        # Health
+        self.ewma_latency = None
+        self.ewma_failure = 0.0
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+        self.open_until = 0.0
+        self.trips = 0
+        self.probe_in_flight = False
+
+        # Load + counters
+        self.in_flight = 0
+        self.total_requests = 0
+        self.total_failures = 0
+        self.total_rate_limited = 0
+        self.total_timeouts = 0
+        self.last_error = None
+
+    # --- HEALTH ---
+    def refresh_state(self, now):
+        if self.state == self.OPEN and now >= self.open_until:
+            self.state = self.HALF_OPEN
+            self.probe_in_flight = False
+        return self.state
+
+    def can_serve(self, estimated_tokens, now):
+        state = self.refresh_state(now)
+        if state == self.OPEN:
+            return False
+        if state == self.HALF_OPEN and self.probe_in_flight:
+            return False  # One probe at a time while half-open
+        if self.request_budget.available(now) < 1:
+            return False
+        if self.token_budget.available(now) < estimated_tokens:
+            return False
+        return True
+
+    def load_score(self):
+        """Lower is better: expected wait if we queue behind current work."""
+        # Unmeasured keys look fast so they get explored early
+        latency = self.ewma_latency if self.ewma_latency is not None else 0.05
+        return (self.in_flight + 1) * latency * (1.0 + 4.0 * self.ewma_failure)
+
+    # --- BOOKKEEPING ---
+    def _observe_latency(self, latency):
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency += LLM_KEY_EWMA_ALPHA * (latency - self.ewma_latency)
+
+    def _open_circuit(self, now, cooldown=None):
+        self.trips += 1
+        if cooldown is None:
+            cooldown = min(
+                LLM_KEY_CIRCUIT_BASE_COOLDOWN * (2 ** (self.trips - 1)),
+                LLM_KEY_CIRCUIT_MAX_COOLDOWN,
+            )
+        self.state = self.OPEN
+        self.open_until = now + cooldown
+        self.probe_in_flight = False
+
+    def sync_budgets(self, headers, now):
+        if not headers:
+            return
+        self.request_budget.sync(
+            _header_float(headers, "x-ratelimit-limit-requests"),
+            _header_float(headers, "x-ratelimit-remaining-requests"),
+            parse_reset_duration(headers.get("x-ratelimit-reset-requests")),
+            now,
+        )
+        self.token_budget.sync(
+            _header_float(headers, "x-ratelimit-limit-tokens"),
+            _header_float(headers, "x-ratelimit-remaining-tokens"),
+            parse_reset_duration(headers.get("x-ratelimit-reset-tokens")),
+            now,
+        )
+
+    def to_dict(self, now=None):
+        now = now or time.monotonic()
+        state = self.refresh_state(now)
+        requests_left = self.request_budget.available(now)
+        tokens_left = self.token_budget.available(now)
+        return {
+            "key": self.name,
+            "state": state,
+            "reopensInSeconds": round(max(0.0, self.open_until - now), 2) if state == self.OPEN else 0.0,
+            "inFlight": self.in_flight,
+            "ewmaLatencyMs": round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+            "ewmaFailureRate": round(self.ewma_failure, 3),
+            "requests": self.total_requests,
+            "failures": self.total_failures,
+            "rateLimited": self.total_rate_limited,
+            "timeouts": self.total_timeouts,
+            "requestBudget": None if requests_left == float("inf") else round(requests_left, 1),
+            "tokenBudget": None if tokens_left == float("inf") else round(tokens_left, 1),
+            "lastError": self.last_error,
+        }
+
+
+class KeyPool:
+    """
+    Routes each LLM call to the least-loaded healthy key.
+    - Keys that return 429 are parked until their reset window ends.
+    - Keys that keep failing get their circuit opened (exponential cooldown),
+      then one half-open probe decides whether they come back.
+    """
+
+    def __init__(self, keys):
+        # keys: list of (name, client)
+        self.keys = [KeyState(name, client) for name, client in keys]
+        # Pool-wide latency distribution (hedging picks its threshold from here)
+        self.latencies = LatencyWindow()
+
+    def __len__(self):
+        return len(self.keys)
+
+    @staticmethod
+    def discover_keys(environ=None):
+        """
+        Finds every configured key: GROQ_API_KEY, GROQ_API_KEY2 ... GROQ_API_KEYn,
+        plus an optional comma-separated GROQ_API_KEYS list.
+        Returns [(name, secret), ...] in a stable order without duplicates.
+        """
+        environ = os.environ if environ is None else environ
+        numbered = []
+        for env_var, value in environ.items():
+            match = _KEY_ENV.match(env_var)
+            if match and value:
+                numbered.append((int(match.group(1) or 1), env_var, value.strip()))
+        numbered.sort()
+
+        found = [(env_var, value) for _, env_var, value in numbered]
+        for i, value in enumerate(environ.get("GROQ_API_KEYS", "").split(",")):
+            if value.strip():
+                found.append((f"GROQ_API_KEYS[{i}]", value.strip()))
+
+        seen = set()
+        unique = []
+        for name, value in found:
+            if value not in seen:
+                seen.add(value)
+                unique.append((name, value))
+        return unique
+
+    def candidates(self, estimated_tokens=0):
+        """Healthy keys with budget left, least-loaded first."""
+        now = time.monotonic()
+        ready = [k for k in self.keys if k.can_serve(estimated_tokens, now)]
+        ready.sort(key=lambda k: k.load_score())
+        return ready
+
+    # --- CALL LIFECYCLE ---
+    def begin(self, key, estimated_tokens=0):
+        now = time.monotonic()
+        key.in_flight += 1
+        key.total_requests += 1
+        key.request_budget.consume(1, now)
+        key.token_budget.consume(estimated_tokens, now)
+        if key.refresh_state(now) == KeyState.HALF_OPEN:
+            key.probe_in_flight = True
+        return now
+
+    def record_success(self, key, started, headers=None):
+        now = time.monotonic()
+        key.in_flight = max(0, key.in_flight - 1)
+        key._observe_latency(now - started)
+        self.latencies.observe(now - started)
+        LLM_CALL_SECONDS.observe(now - started, key.name, "ok")
+        key.ewma_failure *= (1.0 - LLM_KEY_EWMA_ALPHA)
+        key.consecutive_failures = 0
+        if key.state != KeyState.CLOSED:
+            key.state = KeyState.CLOSED
+            key.trips = 0
+        key.probe_in_flight = False
+        key.sync_budgets(headers, now)
+
+    def record_failure(self, key, started, error, status_code=None, headers=None, timed_out=False):
+        now = time.monotonic()
+        key.in_flight = max(0, key.in_flight - 1)
+        key._observe_latency(now - started)
+        key.ewma_failure += LLM_KEY_EWMA_ALPHA * (1.0 - key.ewma_failure)
+        key.consecutive_failures += 1
+        key.total_failures += 1
+        key.last_error = str(error)[:200]
+        key.probe_in_flight = False
+        if timed_out:
+            key.total_timeouts += 1
+        LLM_CALL_SECONDS.observe(now - started, key.name, "error")
+        if status_code == 429:
+            kind = "rate_limited"
+        elif timed_out:
+            kind = "timeout"
+        else:
+            kind = f"http_{status_code}" if status_code else "network"
+        LLM_ERRORS.inc(key.name, kind)
+
+        if status_code == 429:
+            # Rate limited: park the key until Groq says the window resets
+            key.total_rate_limited += 1
+            headers = headers or {}
+            retry_after = (
+                parse_reset_duration(headers.get("retry-after"))
+                or parse_reset_duration(headers.get("x-ratelimit-reset-requests"))
+                or LLM_KEY_CIRCUIT_BASE_COOLDOWN
+            )
+            key.request_budget.drain(retry_after, now)
+            key._open_circuit(now, cooldown=retry_after)
+        elif key.state == KeyState.HALF_OPEN or key.consecutive_failures >= LLM_KEY_FAILURE_THRESHOLD:
+            key._open_circuit(now)
+
+    def release(self, key):
+        """For calls that were abandoned (cancelled) before an outcome was known."""
+        key.in_flight = max(0, key.in_flight - 1)
+        key.probe_in_flight = False
+
+    def stats(self):
+        now = time.monotonic()
+        return [k.to_dict(now) for k in self.keys]
+
+
+class LatencyWindow:
+    """Rolling window of recent successful call latencies (for hedge thresholds)."""
+
+    def __init__(self, size=256):
+        self.samples = deque(maxlen=size)
+
+    def observe(self, latency):
+        self.samples.append(latency)
+
+    def percentile(self, q):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+        return ordered[index]
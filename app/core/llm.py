@@ -1,56 +1,266 @@
 # app/core/llm.py
-import os
+import asyncio
 import random
-from groq import Groq
+import time
+from contextlib import aclosing
+
+from app.core.config import (
+    LLM_LOCAL_FALLBACK,
+    LLM_PROVIDER,
+    LLM_ROUTER_COOLDOWN,
+    LLM_ROUTER_ERROR_PENALTY,
+    LLM_ROUTER_EWMA_ALPHA,
+    LLM_ROUTER_EXPLORE_RATE,
+    LLM_ROUTER_MAX_FAILURES,
+)
+from app.core.metrics import PROVIDER_CALL_SECONDS
+from app.core.providers import GroqProvider, attempt_timeout, build_providers
+from app.core.tokens import estimate_tokens
+from app.core.tracing import add_span, span
+from app.core.log import get_logger
+
+log = get_logger("llm")
+
+# Returned when every provider fails, so callers can tell a real reply from a fallback
+FALLBACK_REPLY = "I am having trouble with my connection, dear. One moment."
+
+# Latency assumed for a provider we haven't heard from yet: optimistic, so
+# every configured provider gets tried early and earns real stats
+_UNKNOWN_LATENCY = 0.0
+
+
+class DegradedReply(str):
+    """Text from the offline provider standing in for a failed real one (never cache it)."""
+
+
+def is_fallback(text):
+    """True for replies no real model produced: FALLBACK_REPLY or a DegradedReply."""
+    return text == FALLBACK_REPLY or isinstance(text, DegradedReply)
+
+
+class ProviderHealth:
+    """Live latency / error stats for one provider (what the router ranks by)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.ewma_latency = None
+        self.ewma_error = 0.0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.last_error = None
+
+    def is_open(self, now):
+        return now < self.open_until
+
+    def score(self):
+        """Expected seconds per useful answer: lower is better."""
+        latency = self.ewma_latency if self.ewma_latency is not None else _UNKNOWN_LATENCY
+        return latency * (1.0 + LLM_ROUTER_ERROR_PENALTY * self.ewma_error)
+
+    def _observe_latency(self, latency):
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency += LLM_ROUTER_EWMA_ALPHA * (latency - self.ewma_latency)
+
+    def record_success(self, latency):
+        self.calls += 1
+        self._observe_latency(latency)
+        self.ewma_error *= (1.0 - LLM_ROUTER_EWMA_ALPHA)
+        self.consecutive_failures = 0
+
+    def record_failure(self, latency, error):
+        self.calls += 1
+        self.failures += 1
+        self._observe_latency(latency)
+        self.ewma_error += LLM_ROUTER_EWMA_ALPHA * (1.0 - self.ewma_error)
+        self.consecutive_failures += 1
+        self.last_error = str(error)[:200] or type(error).__name__
+        if self.consecutive_failures >= LLM_ROUTER_MAX_FAILURES:
+            # 🔌 Sit out for a while; the first call after the cooldown is the probe
+            self.open_until = time.monotonic() + LLM_ROUTER_COOLDOWN
+            self.consecutive_failures = 0
+            log.warning(f"🔌 Provider {self.name} benched for {LLM_ROUTER_COOLDOWN:.0f}s ({self.last_error})")
+
+    def to_dict(self, now):
+        return {
+            "ewmaLatencySeconds": None if self.ewma_latency is None else round(self.ewma_latency, 4),
+            "ewmaErrorRate": round(self.ewma_error, 4),
+            "score": round(self.score(), 4),
+            "benchedForSeconds": round(max(0.0, self.open_until - now), 2),
+            "calls": self.calls,
+            "failures": self.failures,
+            "lastError": self.last_error,
+        }
+
 
 class LLMService:
-    def __init__(self):
-        # 1. Initialize Clients for THREE Keys 🛡️🛡️🛡️
-        self.clients = []
-        
-        # Add keys dynamically if they exist
-        env_keys = ["GROQ_API_KEY", "GROQ_API_KEY2", "GROQ_API_KEY3"]
-        for env_var in env_keys:
-            key = os.getenv(env_var)
-            if key:
-                self.clients.append(Groq(api_key=key, max_retries=0))
-        
-        if not self.clients:
-            raise ValueError("❌ No Groq API Keys found in .env!")
-
-        # 2. Set Model
-        self.model = "llama-3.1-8b-instant" 
-
-    def generate(self, system_prompt, user_prompt, provider="groq"):
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
+    """
+    Routes every call to the provider expected to answer fastest (live
+    latency x error rate), falling back across providers, not only across
+    Groq keys. The offline "local" provider answers last when all else fails.
+    """
+
+    def __init__(self, providers=None, default_provider=LLM_PROVIDER, local_fallback=LLM_LOCAL_FALLBACK):
+        self.providers = {p.name: p for p in (providers or build_providers())}
+        self.health = {name: ProviderHealth(name) for name in self.providers}
+        self.default_provider = default_provider
+        self.local_fallback = local_fallback
+        self.max_tokens = max(getattr(p, "max_tokens", 0) for p in self.providers.values())
+
+        configured = [name for name, p in self.providers.items() if p.configured and name != "local"]
+        if configured:
+            log.info(f"🔌 LLM providers: {', '.join(configured)} (routing: {default_provider})")
+        else:
+            # No keys at all: still serve (templated) replies instead of crashing at import
+            log.warning("⚠️ No LLM provider configured (GROQ_API_KEY / GEMINI_API_KEY). Using the local provider only.")
+
+    @property
+    def pool(self):
+        """Groq key pool (per-key metrics and /debug/llm-keys)."""
+        groq = self.providers.get("groq")
+        return groq.pool if isinstance(groq, GroqProvider) else None
+
+    def route(self, provider=None, estimated_tokens=0):
+        """
+        Providers to try, in order. `provider` (or LLM_PROVIDER) other than
+        "auto" goes first; the rest are ranked by score. Benched providers
+        are skipped, and "local" comes last (when local fallback is on).
+        """
+        preferred = (provider or self.default_provider or "auto").lower()
+        now = time.monotonic()
+        ranked = [
+            p for name, p in self.providers.items()
+            if name != "local" and p.configured
+            and not self.health[name].is_open(now) and p.available(estimated_tokens)
         ]
-        
-        # 🎲 STEP 1: PICK A RANDOM KEY
-        # We try up to 3 times to find a working key
-        shuffled_clients = random.sample(self.clients, len(self.clients))
-        
-        for client in shuffled_clients:
+        ranked.sort(key=lambda p: self.health[p.name].score())
+        # 🎲 Now and then the runner-up goes first, so its stats don't go stale
+        if len(ranked) > 1 and random.random() < LLM_ROUTER_EXPLORE_RATE:
+            ranked[0], ranked[1] = ranked[1], ranked[0]
+
+        if preferred in self.providers and preferred != "auto":
+            ranked = [p for p in ranked if p.name != preferred]
+            chosen = self.providers[preferred]
+            if chosen.configured:
+                ranked.insert(0, chosen)
+
+        local = self.providers.get("local")
+        if local is not None and local not in ranked and (self.local_fallback or not ranked):
+            ranked.append(local)
+        return ranked
+
+    def _degraded(self, provider, preferred):
+        # Local answers are real answers only when local was asked for (load tests)
+        return provider.name == "local" and (preferred or self.default_provider) != "local"
+
+    def _record(self, provider, started, error=None, deadline=None):
+        latency = time.monotonic() - started
+        if error is None:
+            self.health[provider.name].record_success(latency)
+            PROVIDER_CALL_SECONDS.observe(latency, provider.name, "ok")
+        elif attempt_timeout(deadline) is None:
+            # The request ran out of time, not the provider: don't bench it for that
+            PROVIDER_CALL_SECONDS.observe(latency, provider.name, "deadline")
+        else:
+            self.health[provider.name].record_failure(latency, error)
+            PROVIDER_CALL_SECONDS.observe(latency, provider.name, "error")
+
+    async def generate(self, system_prompt, user_prompt, provider=None, deadline=None, purpose="reply", directive=None):
+        """
+        provider: "groq" | "gemini" | "local" to try that one first, None/"auto" to route.
+        deadline: optional time.monotonic() value shared by the whole request.
+        Every attempt (and hedge) is cut off when it passes.
+        purpose: "reply" | "verdict" | "system_prompt", what the caller wants
+        (the offline provider answers by it).
+        directive: the agent's tactical directive (picks the offline provider's stall line).
+        """
+        estimated_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt) + self.max_tokens
+
+        for candidate in self.route(provider, estimated_tokens):
+            if candidate.name != "local" and attempt_timeout(deadline) is None:
+                log.warning("⏰ Request deadline reached. Giving up on LLM.")
+                continue  # Only the (instant) local provider is still worth asking
+            started = time.monotonic()
             try:
-                return self._call_groq(client, messages)
+                with span("provider", provider=candidate.name):
+                    reply = await candidate.generate(system_prompt, user_prompt, deadline, estimated_tokens, purpose=purpose, directive=directive)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                print(f"⚠️ Key Failed ({e}). Switching... 🔄")
-                continue # Try the next key in the list
-        
-        # If we get here, ALL keys failed
-        print("❌ CRITICAL: ALL Keys Exhausted.")
-        return "I am having trouble with my connection, dear. One moment."
-
-    def _call_groq(self, client, messages):
-        response = client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=0.7,
-            max_tokens=400,
-            timeout=5.0 
-        )
-        content = response.choices[0].message.content
-        return str(content) if content else ""
-
-llm = LLMService()
\ No newline at end of file
+                self._record(candidate, started, e, deadline)
+                log.warning(f"⚠️ Provider {candidate.name} Failed ({e}). Switching... 🔄")
+                continue
+            self._record(candidate, started)
+            return DegradedReply(reply) if self._degraded(candidate, provider) else reply
+
+        # If we get here, ALL providers failed (or none were healthy / time ran out)
+        log.error("❌ CRITICAL: ALL LLM Providers Exhausted.")
+        return FALLBACK_REPLY
+
+    async def stream(self, system_prompt, user_prompt, provider=None, deadline=None, purpose="reply", directive=None):
+        """
+        Async generator of reply text chunks.
+        Providers fail over only until the first chunk has been sent; after that a
+        broken stream just ends early. Yields FALLBACK_REPLY if nobody answers.
+        """
+        estimated_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt) + self.max_tokens
+
+        for candidate in self.route(provider, estimated_tokens):
+            if candidate.name != "local" and attempt_timeout(deadline) is None:
+                log.warning("⏰ Request deadline reached. Giving up on LLM.")
+                continue
+            degraded = self._degraded(candidate, provider)
+            started = time.monotonic()
+            span_started = time.perf_counter()
+            sent_any = False
+            try:
+                async with aclosing(candidate.stream(system_prompt, user_prompt, deadline, estimated_tokens, purpose=purpose, directive=directive)) as chunks:
+                    async for chunk in chunks:
+                        sent_any = True
+                        yield DegradedReply(chunk) if degraded else chunk
+            except (asyncio.CancelledError, GeneratorExit):
+                raise
+            except Exception as e:
+                self._record(candidate, started, e, deadline)
+                add_span("provider", span_started, provider=candidate.name, stream=True,
+                         error=type(e).__name__, partial=sent_any)
+                if sent_any:
+                    log.warning(f"⚠️ Provider {candidate.name} dropped the stream ({e}). Ending reply early.")
+                    return
+                log.warning(f"⚠️ Provider {candidate.name} Failed ({e}). Switching... 🔄")
+                continue
+            self._record(candidate, started)
+            add_span("provider", span_started, provider=candidate.name, stream=True)
+            return
+
+        log.error("❌ CRITICAL: ALL LLM Providers Exhausted.")
+        yield FALLBACK_REPLY
+
+    def key_stats(self):
+        """Per-key health and budget snapshot (for sizing the key pool)."""
+        return self.pool.stats() if self.pool is not None else []
+
+    def hedge_stats(self):
+        groq = self.providers.get("groq")
+        return groq.hedge_stats() if isinstance(groq, GroqProvider) else {"enabled": False}
+
+    def provider_stats(self):
+        now = time.monotonic()
+        return {
+            "default": self.default_provider,
+            "localFallback": self.local_fallback,
+            "route": [p.name for p in self.route()],
+            "providers": {
+                name: {
+                    "configured": p.configured,
+                    **self.health[name].to_dict(now),
+                    **p.stats(),
+                }
+                for name, p in self.providers.items()
+            },
+        }
+
+llm = LLMService()
@@ -0,0 +1,199 @@
+# app/core/log.py
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from app.core.config import (
+    LOG_DEFAULT_RATE_LIMIT,
+    LOG_FORMAT,
+    LOG_LEVEL,
+    LOG_QUEUE_SIZE,
+    LOG_RATE_LIMITS,
+    LOG_SAMPLING,
+)
+
+# 📝 Non-blocking logging: the request path only formats a record and puts
+# it on a bounded queue; one background thread does all stdout writes.
+#
+#   get_logger("llm").warning(f"⚠️ Key {name} Failed ...")
+#
+# Each category (llm, agent, callback, session, ...) has its own sampling
+# (INFO/DEBUG only) and rate limit, so one noisy path can't flood the rest.
+# A full queue drops the record instead of blocking the event loop.
+
+ROOT_LOGGER = "honeypot"
+
+# Chatty INFO lines that fire on every request
+DEFAULT_SAMPLING = {"pacing": 0.1, "callback": 0.2}
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "suppressed"}
+
+
+def _load_json(raw, name):
+    if not raw:
+        return {}
+    try:
+        return {str(k): float(v) for k, v in json.loads(raw).items()}
+    except (ValueError, AttributeError, TypeError) as e:
+        # Can't log it through the pipeline: it is being configured
+        sys.stderr.write(f"⚠️ Ignoring invalid {name}: {e}\n")
+        return {}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "category": record.name.rpartition(".")[2] if record.name != ROOT_LOGGER else "app",
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressedBefore"] = suppressed
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = f"{self.formatTime(record)} {record.levelname:<7} [{record.name.rpartition('.')[2]}] {record.getMessage()}"
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            line += f" (+{suppressed} suppressed)"
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class CategoryLimiter(logging.Filter):
+    """
+    Per-category sampling + token-bucket rate limit. Runs on the caller's
+    thread, so it is cheap: a dict lookup, maybe a random(), a few floats.
+    The next record let through carries how many were suppressed before it.
+    """
+
+    def __init__(self, sampling=None, rate_limits=None, default_rate=100.0):
+        super().__init__()
+        self.sampling = sampling or {}
+        self.rate_limits = rate_limits or {}
+        self.default_rate = default_rate
+        self._buckets = {}  # category -> [tokens, last refill]
+        self._suppressed = {}
+        self._lock = threading.Lock()  # The SQLite writer thread logs too
+        self.sampled_out = 0
+        self.rate_limited = 0
+
+    def filter(self, record):
+        category = record.name.rpartition(".")[2]
+        if record.levelno < logging.WARNING:
+            rate = self.sampling.get(category, 1.0)
+            if rate < 1.0 and random.random() >= rate:
+                self.sampled_out += 1
+                return False
+
+        limit = self.rate_limits.get(category, self.default_rate)
+        if limit <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(category)
+            if bucket is None:
+                bucket = self._buckets[category] = [limit, now]
+            # Refill; one second's worth is also the burst size
+            bucket[0] = min(limit, bucket[0] + (now - bucket[1]) * limit)
+            bucket[1] = now
+            if bucket[0] < 1.0:
+                self._suppressed[category] = self._suppressed.get(category, 0) + 1
+                self.rate_limited += 1
+                return False
+            bucket[0] -= 1.0
+            suppressed = self._suppressed.pop(category, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    def __init__(self, level="INFO", fmt="json", queue_size=10000,
+                 sampling=None, rate_limits=None, default_rate=100.0, stream=None):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.limiter = CategoryLimiter(sampling, rate_limits, default_rate)
+        self.handler.addFilter(self.limiter)
+
+        writer = logging.StreamHandler(stream or sys.stdout)
+        writer.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+        self.listener = logging.handlers.QueueListener(self.queue, writer, respect_handler_level=False)
+
+        self.logger = logging.getLogger(ROOT_LOGGER)
+        self.logger.setLevel(getattr(logging, level, logging.INFO))
+        self.logger.propagate = False  # Never also through the root (blocking) handlers
+        self.logger.addHandler(self.handler)
+        self._running = False
+
+    def start(self):
+        if not self._running:
+            self.listener.start()
+            self._running = True
+
+    def stop(self):
+        """Flushes everything queued so far, then stops the writer thread."""
+        if self._running:
+            self._running = False
+            self.listener.stop()
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize(),
+            "queueSize": self.queue.maxsize,
+            "dropped": self.handler.dropped,
+            "sampledOut": self.limiter.sampled_out,
+            "rateLimited": self.limiter.rate_limited,
+            "sampling": self.limiter.sampling,
+            "rateLimits": {**self.limiter.rate_limits, "default": self.limiter.default_rate},
+        }
+
+
+def get_logger(category):
+    """Logger for one category (used for sampling/rate limits and the JSON "category" field)."""
+    return logging.getLogger(f"{ROOT_LOGGER}.{category}")
+
+
+pipeline = LogPipeline(
+    level=LOG_LEVEL,
+    fmt=LOG_FORMAT,
+    queue_size=LOG_QUEUE_SIZE,
+    sampling={**DEFAULT_SAMPLING, **_load_json(LOG_SAMPLING, "LOG_SAMPLING")},
+    rate_limits=_load_json(LOG_RATE_LIMITS, "LOG_RATE_LIMITS"),
+    default_rate=LOG_DEFAULT_RATE_LIMIT,
+)
+pipeline.start()
+# Whatever is still queued gets written before the process exits
+atexit.register(pipeline.stop)
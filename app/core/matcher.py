@@ -0,0 +1,113 @@
+# app/core/matcher.py
+import re
+from collections import namedtuple
+
+# One keyword occurrence. Offsets index into the LOWERCASED text.
+Hit = namedtuple("Hit", ["start", "end", "keyword", "category", "order"])
+
+_TERMINAL = ""  # Trie key that marks "a keyword ends here"
+
+
+class KeywordMatcher:
+    """
+    Multi-pattern, case-insensitive substring matcher (Aho-Corasick style).
+
+    All keywords go into ONE trie, built once. The trie is compiled into a
+    single regex, so the whole message is scanned in one pass by the C regex
+    engine (which skips ahead on the set of possible first characters),
+    however many keywords there are:
+    - at each position the trie regex finds the LONGEST keyword starting there
+    - every shorter keyword starting at the same position is a prefix of it,
+      so we recover those from a table built by walking the trie once
+    Result: every occurrence of every keyword, overlapping ones included,
+    exactly like running `kw in text` for each keyword.
+    """
+
+    def __init__(self, patterns):
+        """
+        patterns: iterable of (keyword, category). Order is kept: `order` on
+        each hit is the keyword's registration index, so callers can report
+        hits in their original list order.
+        """
+        self.trie = {}
+        self.size = 0
+        for keyword, category in patterns:
+            keyword = keyword.lower()
+            if not keyword:
+                continue
+            node = self.trie
+            for ch in keyword:
+                node = node.setdefault(ch, {})
+            node.setdefault(_TERMINAL, []).append((self.size, keyword, category))
+            self.size += 1
+
+        # Every keyword can be the longest match at a position; precompute the
+        # shorter keywords that end along its path so scan() is a dict lookup
+        self._expansions = {}
+        self._collect_expansions(self.trie, "", [])
+
+        body = self._compile_node(self.trie)
+        # An empty matcher must never match anything
+        self._regex = re.compile(body if body else r"(?!x)x")
+
+    def _collect_expansions(self, node, prefix, found):
+        terminals = node.get(_TERMINAL)
+        if terminals:
+            found = found + [(len(prefix), order, kw, cat) for order, kw, cat in terminals]
+            self._expansions[prefix] = found
+        for ch, child in node.items():
+            if ch != _TERMINAL:
+                self._collect_expansions(child, prefix + ch, found)
+
+    @classmethod
+    def _compile_node(cls, node):
+        branches = [
+            re.escape(ch) + cls._compile_node(child)
+            for ch, child in sorted(node.items())
+            if ch != _TERMINAL
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if _TERMINAL in node:
+            # Greedy optional: prefer the longer keyword, settle for this one
+            body = f"(?:{body})?"
+        return body
+
+    def scan(self, text_lower):
+        """
+        Returns every Hit in text order. `text_lower` must already be lowercased
+        (callers lowercase once and share it).
+        """
+        hits = []
+        expansions = self._expansions
+        search = self._regex.search
+        match = search(text_lower)
+        while match is not None:
+            start = match.start()
+            for length, order, keyword, category in expansions[match.group()]:
+                hits.append(Hit(start, start + length, keyword, category, order))
+            # Resume one char later (not at match.end()) so overlapping keywords are found
+            match = search(text_lower, start + 1)
+        return hits
+
+
+class ScanResult:
+    """Hits from one scan, with helpers for the per-category views."""
+
+    def __init__(self, hits):
+        self.hits = hits
+        self._by_category = {}
+        for hit in hits:
+            self._by_category.setdefault(hit.category, {})[hit.order] = hit.keyword
+
+    def found(self, category):
+        """Distinct keywords of a category, in registration (list) order."""
+        seen = self._by_category.get(category)
+        if not seen:
+            return []
+        # dict.fromkeys: a feed may repeat a built-in keyword
+        return list(dict.fromkeys(seen[order] for order in sorted(seen)))
+
+    def has(self, category):
+        return category in self._by_category
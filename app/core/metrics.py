@@ -0,0 +1,180 @@
+# app/core/metrics.py
+import math
+from bisect import bisect_left
+
+from app.core.log import get_logger
+
+log = get_logger("metrics")
+
+# 📊 Minimal Prometheus instrumentation (text exposition format 0.0.4).
+# Hot-path cost of one observation: a dict lookup for the label child, a
+# bisect over ~15 bucket bounds and two additions. No locks: everything
+# runs on the event loop thread.
+
+# Seconds, from sub-millisecond regex work up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.bounds = tuple(sorted(buckets))
+        self._children = {}
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _HistogramChild(self.bounds)
+        return child
+
+    def observe(self, value, *values):
+        self.labels(*values).observe(value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for values, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), child.counts):
+                cumulative += count
+                le = f'le="{_number(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, values, le)} {cumulative}")
+            labels = _label_str(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_number(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def inc(self, *values, amount=1):
+        self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for values, total in sorted(self._values.items()):
+            lines.append(f"{self.name}{_label_str(self.labelnames, values)} {_number(total)}")
+        return lines
+
+
+class GaugeFunc:
+    """
+    A gauge read at scrape time from `fn` (nothing to update on the hot path).
+    `fn` returns a number, or {label values tuple: number} when labelled.
+    """
+
+    def __init__(self, name, documentation, fn, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        try:
+            value = self.fn()
+        except Exception as e:
+            log.warning(f"⚠️ Metric {self.name} failed: {e}")
+            return lines
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for values, number in sorted(items):
+            lines.append(f"{self.name}{_label_str(self.labelnames, values)} {_number(number)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} registered twice")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge_func(self, name, documentation, fn, labelnames=()):
+        return self._register(GaugeFunc(name, documentation, fn, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# --- Pipeline ---
+# stage: session_load | detect_keyword | detect_llm | extract | reply | callback | save | pacing
+STAGE_SECONDS = registry.histogram(
+    "honeypot_stage_seconds", "Time spent in each pipeline stage.", ["stage"]
+)
+REQUEST_SECONDS = registry.histogram(
+    "honeypot_request_seconds", "Wall time of a honeypot request (pacing included).", ["route"]
+)
+DETECTIONS = registry.counter(
+    "honeypot_detections_total", "Scam detector verdicts by method.", ["method", "verdict"]
+)
+
+# --- LLM keys ---
+LLM_CALL_SECONDS = registry.histogram(
+    "honeypot_llm_call_seconds", "Latency of single Groq calls per key.", ["key", "outcome"]
+)
+LLM_ERRORS = registry.counter(
+    "honeypot_llm_errors_total", "Failed Groq calls per key and kind.", ["key", "kind"]
+)
+
+# --- Callbacks ---
+CALLBACK_POST_SECONDS = registry.histogram(
+    "honeypot_callback_post_seconds", "Latency of report POSTs to Guvi.", ["outcome"]
+)
+
+# --- LLM providers (router) ---
+PROVIDER_CALL_SECONDS = registry.histogram(
+    "honeypot_llm_provider_seconds", "Latency of one provider attempt (key failover included).", ["provider", "outcome"]
+)
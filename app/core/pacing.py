@@ -0,0 +1,117 @@
+# app/core/pacing.py
+import asyncio
+import json
+import random
+import time
+
+from app.core.config import PACING_ENABLED, PACING_POLICIES
+from app.core.log import get_logger
+
+log = get_logger("pacing")
+
+# ⌨️ How long a human would take to send this reply, per channel:
+#   delay_target = think + len(reply) / chars_per_second   (x random jitter)
+#   clamped to [min, max]; we only sleep for whatever real work didn't cover.
+# Defaults never add more than 1s to a reply (PACING_POLICIES can go slower)
+DEFAULT_POLICIES = {
+    "sms": {"think": 0.3, "chars_per_second": 120.0, "jitter": 0.1, "min": 0.5, "max": 1.0},
+    "whatsapp": {"think": 0.2, "chars_per_second": 160.0, "jitter": 0.15, "min": 0.4, "max": 1.0},
+    "email": {"think": 0.0, "chars_per_second": 0.0, "jitter": 0.0, "min": 0.0, "max": 0.0},
+    "default": {"think": 0.3, "chars_per_second": 120.0, "jitter": 0.1, "min": 0.5, "max": 1.0},
+}
+
+
+def load_policies(overrides=None):
+    """Defaults merged with PACING_POLICIES (JSON: {"sms": {"max": 1.5}, ...})."""
+    policies = {name: dict(policy) for name, policy in DEFAULT_POLICIES.items()}
+    if overrides:
+        try:
+            for name, values in json.loads(overrides).items():
+                policies.setdefault(name.lower(), dict(DEFAULT_POLICIES["default"])).update(values)
+        except (ValueError, AttributeError) as e:
+            log.warning(f"⚠️ Ignoring invalid PACING_POLICIES: {e}")
+    return policies
+
+
+class Pacer:
+    """
+    Makes replies arrive at a human pace without hiding real latency:
+    - per-channel policies (Metadata.channel)
+    - a typing-time model based on reply length
+    - a kill switch (`enabled=False`) for benchmarks
+    It also splits wall time into real work vs artificial delay, so dashboards
+    can report them separately.
+    """
+
+    def __init__(self, policies=None, enabled=True):
+        self.policies = policies or load_policies()
+        self.enabled = enabled
+        self._stats = {}
+
+    def policy_for(self, channel):
+        key = (channel or "default").strip().lower()
+        return key if key in self.policies else "default", self.policies.get(key, self.policies["default"])
+
+    def target_seconds(self, policy, reply):
+        cps = policy.get("chars_per_second") or 0
+        target = policy.get("think", 0.0) + (len(reply or "") / cps if cps else 0.0)
+        jitter = policy.get("jitter", 0.0)
+        if jitter:
+            target *= random.uniform(1 - jitter, 1 + jitter)
+        return min(max(target, policy.get("min", 0.0)), policy.get("max", target))
+
+    def delay_for(self, channel, reply, elapsed):
+        """Artificial delay still owed after `elapsed` seconds of real work."""
+        if not self.enabled:
+            return 0.0
+        _, policy = self.policy_for(channel)
+        return max(0.0, self.target_seconds(policy, reply) - elapsed)
+
+    async def pace(self, channel, reply, started):
+        """
+        Sleeps until the reply is due. `started` is the time.perf_counter()
+        taken when the request began. Returns the artificial delay.
+        """
+        work = time.perf_counter() - started
+        delay = self.delay_for(channel, reply, work)
+        if delay > 0:
+            log.info(f"⏱️ [PACING] Work {work:.4f}s, pacing {delay:.4f}s ({channel or 'default'})")
+            await asyncio.sleep(delay)
+        self._record(channel, work, delay)
+        return delay
+
+    def _record(self, channel, work, delay):
+        name, _ = self.policy_for(channel)
+        stats = self._stats.setdefault(name, {"requests": 0, "paced": 0, "workSeconds": 0.0, "delaySeconds": 0.0})
+        stats["requests"] += 1
+        stats["paced"] += delay > 0
+        stats["workSeconds"] += work
+        stats["delaySeconds"] += delay
+
+    def stats(self):
+        channels = {}
+        work = delay = 0.0
+        requests = 0
+        for name, s in self._stats.items():
+            requests += s["requests"]
+            work += s["workSeconds"]
+            delay += s["delaySeconds"]
+            channels[name] = {
+                "requests": s["requests"],
+                "paced": s["paced"],
+                "avgWorkMs": round(1000 * s["workSeconds"] / s["requests"], 1),
+                "avgDelayMs": round(1000 * s["delaySeconds"] / s["requests"], 1),
+            }
+        return {
+            "enabled": self.enabled,
+            "requests": requests,
+            "workSeconds": round(work, 3),
+            "artificialDelaySeconds": round(delay, 3),
+            # Share of total wall time that was deliberate padding
+            "artificialShare": round(delay / (work + delay), 3) if work + delay else 0.0,
+            "channels": channels,
+            "policies": self.policies,
+        }
+
+
+pacer = Pacer(load_policies(PACING_POLICIES), enabled=PACING_ENABLED)
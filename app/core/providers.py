@@ -0,0 +1,458 @@
+# app/core/providers.py
+import asyncio
+import hashlib
+import time
+
+from groq import AsyncGroq, APIStatusError, APITimeoutError
+
+from app.core.config import (
+    GEMINI_API_KEY,
+    GEMINI_MODEL,
+    LLM_CALL_TIMEOUT,
+    LLM_HEDGE_DEFAULT_DELAY,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_MAX_RATIO,
+    LLM_HEDGE_MIN_DELAY,
+    LLM_HEDGE_PERCENTILE,
+    LLM_LOCAL_LATENCY,
+)
+from app.core.indicators import SCAM, scan_indicators
+from app.core.key_pool import KeyPool
+from app.core.log import get_logger
+from app.core.stall_bank import EAGER_STALLS, STALL_BANK
+from app.core.tracing import add_span, span
+
+log = get_logger("llm")
+
+# 🔌 LLM providers behind one interface (the router lives in app/core/llm.py):
+#
+#   configured            -> has credentials / is usable at all
+#   available(tokens)     -> could take a call right now
+#   await generate(system_prompt, user_prompt, deadline) -> str
+#   stream(system_prompt, user_prompt, deadline)         -> async generator of str
+#
+# Both also take estimated_tokens, purpose and directive (the agent's tactical
+# directive; only the offline provider answers by it).
+#
+# A provider that can't answer raises ProviderError (a stream only before its
+# first chunk; after that it just ends early).
+
+# Don't start an attempt with less time than this left before the deadline
+_MIN_ATTEMPT_SECONDS = 0.05
+# Unused hedge credit can pile up to this many hedges (absorbs short bursts)
+_HEDGE_CREDIT_BURST = 5.0
+
+MAX_TOKENS = 400
+
+
+class ProviderError(Exception):
+    """The provider gave no answer (keys exhausted, deadline, API error ...)."""
+
+
+def attempt_timeout(deadline):
+    """Timeout for the next attempt, or None when the deadline leaves no room for one."""
+    if deadline is None:
+        return LLM_CALL_TIMEOUT
+    remaining = deadline - time.monotonic()
+    if remaining < _MIN_ATTEMPT_SECONDS:
+        return None
+    return min(LLM_CALL_TIMEOUT, remaining)
+
+
+def _messages(system_prompt, user_prompt):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+class GroqProvider:
+    name = "groq"
+
+    def __init__(self, keys, model="llama-3.1-8b-instant", max_tokens=MAX_TOKENS):
+        # 1. One Async Client per Key 🛡️
+        # AsyncGroq keeps the event loop free while we wait on the network,
+        # so one slow Groq call no longer stalls every other session.
+        # Any number of keys works: GROQ_API_KEY, GROQ_API_KEY2 ... GROQ_API_KEYn
+        self.pool = KeyPool(
+            [(name, AsyncGroq(api_key=secret, max_retries=0)) for name, secret in keys]
+        )
+
+        # 2. Model
+        self.model = model
+        self.max_tokens = max_tokens
+
+        # 3. Hedging bookkeeping
+        self._hedge_credit = 0.0
+        self.hedges_fired = 0
+        self.hedge_wins = 0
+
+    @property
+    def configured(self):
+        return len(self.pool) > 0
+
+    def available(self, estimated_tokens=0):
+        return bool(self.pool.candidates(estimated_tokens))
+
+    async def generate(self, system_prompt, user_prompt, deadline=None, estimated_tokens=0, purpose="reply", directive=None):
+        messages = _messages(system_prompt, user_prompt)
+
+        # 🎯 STEP 1: ASK THE POOL FOR HEALTHY KEYS (least-loaded first)
+        # Keys with an open circuit or no rate-limit budget left are skipped,
+        # so we don't burn 5s on a key that just returned 429.
+        candidates = self.pool.candidates(estimated_tokens)
+
+        # 🏎️ STEP 2: SERIAL FAILOVER, OR HEDGED RACE (opt-in)
+        if LLM_HEDGE_ENABLED and len(candidates) > 1:
+            reply = await self._generate_hedged(candidates, messages, estimated_tokens, deadline)
+        else:
+            reply = await self._generate_serial(candidates, messages, estimated_tokens, deadline)
+
+        if reply is None:
+            # ALL keys failed (or none were healthy / time ran out)
+            raise ProviderError("All Groq keys exhausted")
+        return reply
+
+    async def _generate_serial(self, candidates, messages, estimated_tokens, deadline):
+        for key in candidates:
+            timeout = attempt_timeout(deadline)
+            if timeout is None:
+                log.warning("⏰ Request deadline reached. Giving up on LLM.")
+                return None
+            try:
+                return await self._call_groq(key, messages, estimated_tokens, timeout)
+            except Exception as e:
+                log.warning(f"⚠️ Key {key.name} Failed ({e}). Switching... 🔄")
+                continue # Try the next key in the list
+        return None
+
+    async def _generate_hedged(self, candidates, messages, estimated_tokens, deadline):
+        """
+        Starts on the best key. If it hasn't answered by the hedge threshold,
+        the same request goes to the next key and the first answer wins.
+        At most two calls are in flight; the loser is cancelled.
+        """
+        remaining = list(candidates)
+        running = {}  # task -> key
+        hedge_task = None
+
+        def launch():
+            timeout = attempt_timeout(deadline)
+            if timeout is None or not remaining:
+                return None
+            key = remaining.pop(0)
+            task = asyncio.ensure_future(self._call_groq(key, messages, estimated_tokens, timeout))
+            running[task] = key
+            return task
+
+        # Every call earns a fraction of a hedge, which caps the extra quota spent
+        self._hedge_credit = min(self._hedge_credit + LLM_HEDGE_MAX_RATIO, _HEDGE_CREDIT_BURST)
+        hedge_delay = self._hedge_delay()
+        hedge_at = time.monotonic() + hedge_delay
+        launch()
+
+        try:
+            while running:
+                can_hedge = (
+                    hedge_task is None and len(running) == 1
+                    and remaining and self._hedge_credit >= 1
+                )
+                wait_until = hedge_at if can_hedge else deadline
+                if deadline is not None and wait_until is not None:
+                    wait_until = min(wait_until, deadline)
+                wait_for = None if wait_until is None else max(0.0, wait_until - time.monotonic())
+
+                done, _ = await asyncio.wait(running, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    key = running.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        if task is hedge_task:
+                            self.hedge_wins += 1
+                        return task.result()
+                    log.warning(f"⚠️ Key {key.name} Failed ({error}). Switching... 🔄")
+
+                if done:
+                    if not running and launch() is None:
+                        return None  # Plain failover ran out of keys or time
+                    continue
+
+                if deadline is not None and time.monotonic() >= deadline:
+                    log.warning("⏰ Request deadline reached. Giving up on LLM.")
+                    return None
+                if can_hedge:
+                    # 🏁 HEDGE: the first key is slow, race a second one
+                    hedge_task = launch()
+                    if hedge_task is not None:
+                        self._hedge_credit -= 1
+                        self.hedges_fired += 1
+                        log.info(f"🏁 Hedging LLM call after {hedge_delay:.2f}s")
+            return None
+        finally:
+            # Cancel the loser (or everything, if we ran out of time)
+            for task in running:
+                task.cancel()
+
+    def _hedge_delay(self):
+        observed = self.pool.latencies.percentile(LLM_HEDGE_PERCENTILE)
+        if observed is None:
+            return LLM_HEDGE_DEFAULT_DELAY
+        return max(LLM_HEDGE_MIN_DELAY, observed)
+
+    async def _call_groq(self, key, messages, estimated_tokens=0, timeout=LLM_CALL_TIMEOUT):
+        with span("llm", key=key.name) as sp:
+            started = self.pool.begin(key, estimated_tokens)
+            try:
+                raw = await key.client.chat.completions.with_raw_response.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=self.max_tokens,
+                    timeout=timeout
+                )
+                response = await raw.parse()
+            except APIStatusError as e:
+                if sp is not None:
+                    sp["status"] = e.status_code
+                self.pool.record_failure(key, started, e, status_code=e.status_code, headers=e.response.headers)
+                raise
+            except APITimeoutError as e:
+                self.pool.record_failure(key, started, e, timed_out=True)
+                raise
+            except asyncio.CancelledError:
+                self.pool.release(key)
+                raise
+            except Exception as e:
+                self.pool.record_failure(key, started, e)
+                raise
+
+            self.pool.record_success(key, started, raw.headers)
+        content = response.choices[0].message.content
+        return str(content) if content else ""
+
+    async def stream(self, system_prompt, user_prompt, deadline=None, estimated_tokens=0, purpose="reply", directive=None):
+        """
+        Reply text chunks, as Groq produces them.
+        Keys fail over only until the first chunk has been sent; after that a
+        broken stream just ends early.
+        """
+        messages = _messages(system_prompt, user_prompt)
+
+        for key in self.pool.candidates(estimated_tokens):
+            timeout = attempt_timeout(deadline)
+            if timeout is None:
+                log.warning("⏰ Request deadline reached. Giving up on LLM.")
+                break
+
+            started = self.pool.begin(key, estimated_tokens)
+            attempt_started = time.perf_counter()
+            sent_any = False
+            try:
+                raw = await key.client.chat.completions.with_raw_response.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=self.max_tokens,
+                    timeout=timeout,
+                    stream=True,
+                )
+                chunks = await raw.parse()
+                async for chunk in chunks:
+                    if not chunk.choices:
+                        continue
+                    text = chunk.choices[0].delta.content
+                    if text:
+                        sent_any = True
+                        yield text
+            except (asyncio.CancelledError, GeneratorExit):
+                self.pool.release(key)
+                add_span("llm", attempt_started, key=key.name, stream=True, error="Cancelled")
+                raise
+            except Exception as e:
+                status = e.status_code if isinstance(e, APIStatusError) else None
+                headers = e.response.headers if isinstance(e, APIStatusError) else None
+                self.pool.record_failure(
+                    key, started, e, status_code=status, headers=headers,
+                    timed_out=isinstance(e, APITimeoutError),
+                )
+                # Spans can't wrap the yields above: record the attempt once it is over
+                add_span("llm", attempt_started, key=key.name, stream=True,
+                         error=type(e).__name__, status=status, partial=sent_any)
+                if sent_any:
+                    log.warning(f"⚠️ Key {key.name} dropped the stream ({e}). Ending reply early.")
+                    return
+                log.warning(f"⚠️ Key {key.name} Failed ({e}). Switching... 🔄")
+                continue
+
+            self.pool.record_success(key, started, raw.headers)
+            add_span("llm", attempt_started, key=key.name, stream=True)
+            return
+
+        raise ProviderError("All Groq keys exhausted")
+
+    def stats(self):
+        return {
+            "keys": len(self.pool),
+            "model": self.model,
+            "hedging": self.hedge_stats(),
+        }
+
+    def hedge_stats(self):
+        return {
+            "enabled": LLM_HEDGE_ENABLED,
+            "hedgeDelaySeconds": round(self._hedge_delay(), 3),
+            "hedgesFired": self.hedges_fired,
+            "hedgeWins": self.hedge_wins,
+        }
+
+
+class GeminiProvider:
+    """
+    Google Gemini through `google-genai` (optional: without the package or
+    GEMINI_API_KEY the provider is simply not configured).
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key, model=GEMINI_MODEL, max_tokens=MAX_TOKENS):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.client = None
+        self._types = None
+        if not api_key:
+            return
+        try:
+            from google import genai
+            from google.genai import types
+        except ImportError:
+            log.warning("⚠️ GEMINI_API_KEY is set but google-genai is not installed. Gemini disabled.")
+            return
+        self.client = genai.Client(api_key=api_key)
+        self._types = types
+
+    @property
+    def configured(self):
+        return self.client is not None
+
+    def available(self, estimated_tokens=0):
+        return self.configured
+
+    def _config(self, system_prompt, timeout):
+        return self._types.GenerateContentConfig(
+            system_instruction=system_prompt,
+            temperature=0.7,
+            max_output_tokens=self.max_tokens,
+            http_options=self._types.HttpOptions(timeout=int(timeout * 1000)),  # milliseconds
+        )
+
+    async def generate(self, system_prompt, user_prompt, deadline=None, estimated_tokens=0, purpose="reply", directive=None):
+        timeout = attempt_timeout(deadline)
+        if timeout is None:
+            raise ProviderError("Request deadline reached")
+        response = await asyncio.wait_for(
+            self.client.aio.models.generate_content(
+                model=self.model,
+                contents=user_prompt,
+                config=self._config(system_prompt, timeout),
+            ),
+            timeout,
+        )
+        return response.text or ""
+
+    async def stream(self, system_prompt, user_prompt, deadline=None, estimated_tokens=0, purpose="reply", directive=None):
+        timeout = attempt_timeout(deadline)
+        if timeout is None:
+            raise ProviderError("Request deadline reached")
+        chunks = await asyncio.wait_for(
+            self.client.aio.models.generate_content_stream(
+                model=self.model,
+                contents=user_prompt,
+                config=self._config(system_prompt, timeout),
+            ),
+            timeout,
+        )
+        # The call's own timeout doesn't cover a stream that stalls between
+        # chunks: give every chunk whatever the deadline still allows
+        chunks = chunks.__aiter__()
+        while True:
+            timeout = attempt_timeout(deadline)
+            if timeout is None:
+                raise ProviderError("Request deadline reached")
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+            except StopAsyncIteration:
+                return
+            if chunk.text:
+                yield chunk.text
+
+    def stats(self):
+        return {"model": self.model}
+
+
+class LocalProvider:
+    """
+    Offline, deterministic stand-in (no network, no model): the same prompt
+    always gets the same answer. Serves as the last resort when every real
+    provider is down, and as LLM_PROVIDER=local for load tests.
+    What to answer comes from the caller's `purpose` and `directive`, never
+    from the prompt wording: "verdict" (scam detector), "system_prompt"
+    (tactical prompt generation) or "reply" (the agent, a stall line for its
+    tactical directive).
+    """
+
+    name = "local"
+    configured = True
+
+    # Persona instruction for "write Arthur's system prompt" requests
+    SYSTEM_PROMPT = (
+        "You are Arthur, a 72-year-old retired teacher who is polite, eager and hopeless with "
+        "technology. Keep the scammer talking: misunderstand instructions, invent small technical "
+        "problems, and keep asking where exactly to send the money (UPI ID, account number, IFSC). "
+        "Never share real personal details. Reply in 1-2 short sentences."
+    )
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def available(self, estimated_tokens=0):
+        return True
+
+    @staticmethod
+    def _pick(options, seed):
+        digest = hashlib.blake2b(seed.encode("utf-8"), digest_size=8).digest()
+        return options[int.from_bytes(digest, "big") % len(options)]
+
+    def complete(self, system_prompt, user_prompt, purpose="reply", directive=None):
+        # Scam detector: same keyword scan the detector itself starts with
+        if purpose == "verdict":
+            return "TRUE" if scan_indicators(user_prompt).found(SCAM) else "FALSE"
+        # Tactical prompt generation (PROMPT_STRATEGY != STATIC)
+        if purpose == "system_prompt":
+            return self.SYSTEM_PROMPT
+        # Agent reply: a stall line that pushes the same way as the directive
+        return self._pick(STALL_BANK.get(directive, EAGER_STALLS), user_prompt)
+
+    async def generate(self, system_prompt, user_prompt, deadline=None, estimated_tokens=0, purpose="reply", directive=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.complete(system_prompt, user_prompt, purpose, directive)
+
+    async def stream(self, system_prompt, user_prompt, deadline=None, estimated_tokens=0, purpose="reply", directive=None):
+        text = await self.generate(system_prompt, user_prompt, deadline, purpose=purpose, directive=directive)
+        # Word-sized chunks, like a real stream
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+
+    def stats(self):
+        return {"latencySeconds": self.latency}
+
+
+def build_providers():
+    """Every provider this process could use, in default preference order."""
+    return [
+        GroqProvider(KeyPool.discover_keys()),
+        GeminiProvider(GEMINI_API_KEY),
+        LocalProvider(latency=LLM_LOCAL_LATENCY),
+    ]
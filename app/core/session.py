@@ -1,38 +1,346 @@
 # app/core/session.py
+import asyncio
+import inspect
+import os
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone
 
-# In-Memory Database (RAM)
-_sessions = {}
-
-def get_or_create_session(session_id: str):
-    if session_id not in _sessions:
-        _sessions[session_id] = {
-            "sessionId": session_id,
-            # Use safe UTC time
-            "startTime": datetime.now(timezone.utc),
-            "messages": [],
-            "messageCount": 0,
-            # STATE FLAGS
-            "scamDetected": False,
-            "reported": False,  # True if we already sent data to Guvi
-            # CRITICAL ADDITION: The AI needs this to read the latest text
-            "last_user_message": "",
-            # THE TRAP DATA
-            "intelligence": {
-                "bankAccounts": [],
-                "upiIds": [],
-                "phishingLinks": [],
-                "phoneNumbers": [],
-                "suspiciousKeywords": [],
-            },
+from app.core.config import (
+    SESSION_BACKEND,
+    SESSION_IDLE_TTL,
+    SESSION_MAX_BYTES,
+    SESSION_MAX_COUNT,
+    SESSION_PERSIST_TTL,
+    SESSION_REDIS_MAX_CONNECTIONS,
+    SESSION_REDIS_PREFIX,
+    SESSION_REDIS_URL,
+    SESSION_SQLITE_PATH,
+    SESSION_SWEEP_BATCH,
+    SESSION_SWEEP_INTERVAL,
+    SESSION_WRITE_BATCH,
+    SESSION_WRITE_INTERVAL,
+)
+from app.core.log import get_logger
+
+log = get_logger("session")
+
+# Rough per-object overheads for the size estimate (dicts, strs, list slots)
+_SESSION_BASE_BYTES = 2048
+_MESSAGE_OVERHEAD_BYTES = 400
+_INDICATOR_BYTES = 160
+
+
+def new_session(session_id: str):
+    return {
+        "sessionId": session_id,
+        # Use safe UTC time
+        "startTime": datetime.now(timezone.utc),
+        "messages": [],
+        "messageCount": 0,
+        # STATE FLAGS
+        "scamDetected": False,
+        "reported": False,  # True if we already sent data to Guvi
+        # CRITICAL ADDITION: The AI needs this to read the latest text
+        "last_user_message": "",
+        # THE TRAP DATA
+        "intelligence": {
+            "bankAccounts": [],
+            "upiIds": [],
+            "phishingLinks": [],
+            "phoneNumbers": [],
+            "suspiciousKeywords": [],
+        },
+        # O(1) dedup + provenance for the trap data (see IntelligenceIndex)
+        # key -> {value: index in "messages" where it was first seen}
+        "intelFirstSeen": {
+            "bankAccounts": {},
+            "upiIds": {},
+            "phishingLinks": {},
+            "phoneNumbers": {},
+            "suspiciousKeywords": {},
+        },
+    }
+
+
+def _message_bytes(msg):
+    return _MESSAGE_OVERHEAD_BYTES + sum(len(str(v)) for v in msg.values())
+
+
+class _Entry:
+    __slots__ = ("last_access", "message_bytes", "counted_messages", "size")
+
+    def __init__(self, now):
+        self.last_access = now
+        self.message_bytes = 0
+        self.counted_messages = 0
+        self.size = _SESSION_BASE_BYTES
+
+
+class SessionStore:
+    """
+    In-memory session store (RAM) with limits:
+    - idle TTL: sessions untouched for `idle_ttl` seconds are expired
+    - LRU caps on session count and approximate bytes
+    Expiry runs in a background sweep that yields to the event loop between
+    batches. Eviction hooks run before a session is dropped (e.g. to flush a
+    final report).
+
+    With a persistent `backend` (see session_backends.py) the RAM side is a
+    hot cache: misses are loaded from the backend and every save goes to both.
+    A shared backend (several workers) bypasses RAM: each access reads the
+    shared copy, and TTL/eviction are the backend's job.
+    Backend I/O is awaited (never blocks the event loop); a session already
+    in RAM costs no await at all.
+    """
+
+    def __init__(self, idle_ttl=1800, max_sessions=10000, max_bytes=None, backend=None):
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self.shared = getattr(backend, "shared", False)
+
+        # Least-recently-used first
+        self._sessions = OrderedDict()
+        self._entries = {}
+        self.bytes = 0
+
+        self._hooks = []
+        self._sweeper = None
+        self.evictions = {"idle": 0, "count": 0, "bytes": 0}
+        self.created = 0
+        self.restored = 0
+        self.sweeps = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, session_id):
+        return session_id in self._sessions
+
+    # --- ACCESS ---
+    async def get_or_create(self, session_id: str):
+        if self.shared:
+            session = await self.backend.load(session_id)
+            if session is None:
+                self.created += 1
+                return new_session(session_id)
+            self.restored += 1
+            return session
+
+        now = time.monotonic()
+        session = self._sessions.get(session_id)
+        if session is not None:
+            entry = self._entries[session_id]
+            if now - entry.last_access <= self.idle_ttl:
+                entry.last_access = now
+                self._sessions.move_to_end(session_id)
+                return session
+            # Idle for too long: this is a new conversation as far as we care
+            self._evict(session_id, "idle")
+
+        session = await self.backend.load(session_id) if self.backend is not None else None
+        if session is not None:
+            # Cold start / cache miss: the backend still has it
+            self.restored += 1
+            self._cache(session_id, session)
+            return session
+
+        session = new_session(session_id)
+        self._sessions[session_id] = session
+        self._entries[session_id] = _Entry(now)
+        self.bytes += _SESSION_BASE_BYTES
+        self.created += 1
+        self._enforce_caps(keep=session_id)
+        return session
+
+    async def save(self, session_id: str, data: dict):
+        """Stores the session in RAM and persists it to the backend (if any)."""
+        if self.backend is not None:
+            await self.backend.save(session_id, data)
+        if not self.shared:
+            self._cache(session_id, data)
+
+    def _cache(self, session_id: str, data: dict):
+        """
+        Puts the session in RAM and refreshes its size estimate (only messages
+        added since the last save are measured).
+        """
+        now = time.monotonic()
+        entry = self._entries.get(session_id)
+        if entry is None or self._sessions.get(session_id) is not data:
+            if entry is not None:
+                self.bytes -= entry.size
+            entry = _Entry(now)
+            self._entries[session_id] = entry
+            self.bytes += entry.size
+        self._sessions[session_id] = data
+        self._sessions.move_to_end(session_id)
+        entry.last_access = now
+
+        messages = data.get("messages", [])
+        if len(messages) < entry.counted_messages:
+            entry.message_bytes, entry.counted_messages = 0, 0
+        for msg in messages[entry.counted_messages:]:
+            entry.message_bytes += _message_bytes(msg)
+        entry.counted_messages = len(messages)
+
+        indicators = sum(len(v) for v in data.get("intelligence", {}).values())
+        size = _SESSION_BASE_BYTES + entry.message_bytes + indicators * _INDICATOR_BYTES
+        self.bytes += size - entry.size
+        entry.size = size
+
+        self._enforce_caps(keep=session_id)
+
+    # --- EVICTION ---
+    def add_eviction_hook(self, hook):
+        """
+        hook(session_id, session, reason) runs before a session is dropped.
+        reason: "idle" | "count" | "bytes". Coroutine hooks are scheduled.
+        """
+        self._hooks.append(hook)
+
+    def _evict(self, session_id, reason):
+        session = self._sessions.pop(session_id, None)
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self.bytes -= entry.size
+        if session is None:
+            return
+        self.evictions[reason] += 1
+        for hook in self._hooks:
+            try:
+                result = hook(session_id, session, reason)
+                if inspect.isawaitable(result):
+                    asyncio.ensure_future(result)
+            except Exception as e:
+                log.warning(f"⚠️ Session eviction hook failed for {session_id}: {e}")
+
+    def _enforce_caps(self, keep=None):
+        while len(self._sessions) > self.max_sessions:
+            if not self._evict_oldest("count", keep):
+                break
+        while self.max_bytes is not None and self.bytes > self.max_bytes:
+            if not self._evict_oldest("bytes", keep):
+                break
+
+    def _evict_oldest(self, reason, keep):
+        for session_id in self._sessions:
+            if session_id != keep:
+                self._evict(session_id, reason)
+                return True
+        return False
+
+    def sweep_expired(self, max_batch=None):
+        """
+        Expires idle sessions. They sit at the LRU front, so this stops at the
+        first fresh one. Returns how many were dropped.
+        """
+        cutoff = time.monotonic() - self.idle_ttl
+        dropped = 0
+        while self._sessions and (max_batch is None or dropped < max_batch):
+            session_id = next(iter(self._sessions))
+            if self._entries[session_id].last_access > cutoff:
+                break
+            self._evict(session_id, "idle")
+            dropped += 1
+        return dropped
+
+    # --- BACKGROUND SWEEPER ---
+    async def _sweep_forever(self, interval, batch):
+        while True:
+            await asyncio.sleep(interval)
+            self.sweeps += 1
+            # Small batches, yielding in between, so requests never wait on us
+            while self.sweep_expired(max_batch=batch) == batch:
+                await asyncio.sleep(0)
+            if self.backend is not None:
+                try:
+                    await self.backend.purge_idle()
+                except Exception as e:
+                    log.warning(f"⚠️ Session backend purge failed: {e}")
+
+    def start_sweeper(self, interval=SESSION_SWEEP_INTERVAL, batch=SESSION_SWEEP_BATCH):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.ensure_future(self._sweep_forever(interval, batch))
+
+    async def stop_sweeper(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    async def close(self):
+        """Flushes and closes the backend (call on shutdown)."""
+        if self.backend is not None:
+            await self.backend.close()
+
+    # --- METRICS ---
+    def stats(self):
+        now = time.monotonic()
+        oldest = next(iter(self._sessions), None)
+        return {
+            "sessions": len(self._sessions),
+            "approxBytes": self.bytes,
+            "maxSessions": self.max_sessions,
+            "maxBytes": self.max_bytes,
+            "idleTtlSeconds": self.idle_ttl,
+            "oldestIdleSeconds": round(now - self._entries[oldest].last_access, 1) if oldest else 0.0,
+            "created": self.created,
+            "restored": self.restored,
+            "evictions": dict(self.evictions),
+            "sweeps": self.sweeps,
+            "backend": self.backend.stats() if self.backend is not None else {"backend": "memory"},
         }
-    return _sessions[session_id]
+
+
+def build_session_backend(name=SESSION_BACKEND):
+    if name == "sqlite":
+        from app.core.session_backends import SQLiteSessionBackend
+
+        log.info(f"💾 Sessions persisted to SQLite: {SESSION_SQLITE_PATH}")
+        os.makedirs(os.path.dirname(SESSION_SQLITE_PATH), exist_ok=True)
+        return SQLiteSessionBackend(
+            SESSION_SQLITE_PATH,
+            ttl=SESSION_PERSIST_TTL,
+            batch_size=SESSION_WRITE_BATCH,
+            flush_interval=SESSION_WRITE_INTERVAL,
+        )
+    if name == "redis":
+        from app.core.session_backends import RedisSessionBackend
+
+        log.info(f"🗄️ Sessions shared through Redis: {SESSION_REDIS_URL}")
+        return RedisSessionBackend(
+            SESSION_REDIS_URL,
+            prefix=SESSION_REDIS_PREFIX,
+            ttl=SESSION_PERSIST_TTL,
+            max_connections=SESSION_REDIS_MAX_CONNECTIONS,
+        )
+    if name != "memory":
+        log.warning(f"⚠️ Unknown SESSION_BACKEND '{name}', keeping sessions in memory only.")
+    return None
+
+
+# In-Memory Database (RAM), bounded; optionally backed by a persistent store
+session_store = SessionStore(
+    idle_ttl=SESSION_IDLE_TTL,
+    max_sessions=SESSION_MAX_COUNT,
+    max_bytes=SESSION_MAX_BYTES,
+    backend=build_session_backend(),
+)
+
+
+async def get_or_create_session(session_id: str):
+    return await session_store.get_or_create(session_id)
 
 
 # ✅ ADD THIS FUNCTION SO ROUTES.PY DOESN'T CRASH
-def save_session(session_id: str, data: dict):
+async def save_session(session_id: str, data: dict):
     """
-    Updates the session in memory.
-    In a real DB, this would be a database commit.
+    Updates the session in memory (and queues the write to the backend).
     """
-    _sessions[session_id] = data
+    await session_store.save(session_id, data)
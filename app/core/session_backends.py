@@ -0,0 +1,540 @@
+# app/core/session_backends.py
+"""
+Persistent homes for sessions, behind SessionStore (which stays the hot
+in-memory cache in front of them).
+
+A backend only has to:
+- async load(session_id)   -> session dict, or None (raises if unreachable)
+- async save(session_id, session)   (persist what changed since the last save)
+- async delete(session_id)
+- async purge_idle() drop sessions nobody touched for `ttl` seconds
+- async close()      flush and release resources
+- stats()
+and may set `shared = True` when several processes use it at once (then
+SessionStore keeps no local copy that could go stale).
+load/save run on the event loop: anything that can block goes to a thread
+or an async client.
+"""
+import asyncio
+import json
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from app.intelligence.index import INTEL_KEYS
+from app.core.log import get_logger
+
+log = get_logger("session")
+
+# Session field that tracks how many of session["messages"] are already stored
+PERSISTED_COUNT_FIELD = "_persistedMessageCount"
+
+
+def dump_state(session):
+    """Everything except the messages list, as JSON (datetimes as ISO strings)."""
+    state = {k: v for k, v in session.items() if k not in ("messages", PERSISTED_COUNT_FIELD)}
+    start = state.get("startTime")
+    if isinstance(start, datetime):
+        state["startTime"] = start.isoformat()
+    return json.dumps(state, ensure_ascii=False, separators=(",", ":"))
+
+
+def load_state(raw, messages):
+    session = json.loads(raw)
+    start = session.get("startTime")
+    if isinstance(start, str):
+        session["startTime"] = datetime.fromisoformat(start)
+    session["messages"] = messages
+    session[PERSISTED_COUNT_FIELD] = len(messages)
+    return session
+
+
+def dump_message(msg):
+    return json.dumps(msg, ensure_ascii=False, separators=(",", ":"))
+
+
+class SQLiteSessionBackend:
+    """
+    SQLite in WAL mode.
+
+    - sessions(session_id, state, updated_at): one small row per session
+    - messages(session_id, seq, body): append-only, one row per message
+    save() only writes the state row plus the messages added since the last
+    save, and it never touches the disk on the request path: writes go to a
+    queue drained by one writer thread, many saves per transaction.
+    load() runs in a worker thread: it waits for that session's queued
+    writes first, so a read always sees every write, and the event loop
+    never waits on the disk or the writer.
+    """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        state      TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+    CREATE TABLE IF NOT EXISTS messages (
+        session_id TEXT NOT NULL,
+        seq        INTEGER NOT NULL,
+        body       TEXT NOT NULL,
+        PRIMARY KEY (session_id, seq)
+    ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path, ttl=None, batch_size=256, flush_interval=0.05):
+        self.path = path
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._reader = self._connect()
+        self._reader.executescript(self._SCHEMA)
+        self._read_lock = threading.Lock()
+
+        self._queue = queue.Queue()
+        # session_id -> queued writes not yet committed
+        self._pending = {}
+        self._pending_cond = threading.Condition()
+        self._closed = False
+        self.writes = 0
+        self.transactions = 0
+        self.loads = 0
+        self.purged = 0
+        self.write_errors = 0
+        self._writer = threading.Thread(target=self._write_loop, name="session-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: durable across app crashes, one fsync per checkpoint
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    # --- WRITE PATH (event loop: just enqueue) ---
+    async def save(self, session_id, session):
+        messages = session.get("messages", [])
+        persisted = session.get(PERSISTED_COUNT_FIELD, 0)
+        rewrite = persisted > len(messages)
+        if rewrite:
+            persisted = 0
+        new_rows = [
+            (session_id, seq, dump_message(msg))
+            for seq, msg in enumerate(messages[persisted:], start=persisted)
+        ]
+        self._enqueue(("save", session_id, dump_state(session), time.time(), new_rows, rewrite))
+        session[PERSISTED_COUNT_FIELD] = len(messages)
+
+    async def delete(self, session_id):
+        self._enqueue(("delete", session_id))
+
+    def _enqueue(self, op):
+        with self._pending_cond:
+            self._pending[op[1]] = self._pending.get(op[1], 0) + 1
+        self._queue.put(op)
+
+    async def purge_idle(self):
+        if self.ttl is not None:
+            self._queue.put(("purge", time.time() - self.ttl))
+
+    def flush(self):
+        """Blocks until everything queued so far is committed."""
+        if not self._closed:
+            self._queue.put(("flush",))
+            self._queue.join()
+
+    def _wait_for(self, session_id):
+        """Blocks until the session's queued writes are committed (worker thread only)."""
+        with self._pending_cond:
+            if not self._pending.get(session_id):
+                return
+            self._queue.put(("flush",))  # Writer: stop waiting for a fuller batch
+            self._pending_cond.wait_for(lambda: not self._pending.get(session_id), timeout=5.0)
+
+    # --- WRITER THREAD ---
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            op = self._queue.get()
+            if op is None:
+                self._queue.task_done()
+                break
+            batch = [op]
+            # Group whatever else arrives within the flush window
+            deadline = time.monotonic() + self.flush_interval
+            while op[0] != "flush" and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    nxt = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(nxt)
+                if nxt is None or nxt[0] == "flush":
+                    break
+            stop = batch[-1] is None
+            ops = batch[:-1] if stop else batch
+            try:
+                self._apply(conn, ops)
+            except sqlite3.Error as e:
+                self.write_errors += 1
+                log.warning(f"⚠️ Session DB write failed ({len(ops)} ops): {e}")
+            finally:
+                self._done(ops)
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                break
+        conn.close()
+
+    def _done(self, ops):
+        with self._pending_cond:
+            for op in ops:
+                if op[0] in ("save", "delete"):
+                    left = self._pending.get(op[1], 0) - 1
+                    if left > 0:
+                        self._pending[op[1]] = left
+                    else:
+                        self._pending.pop(op[1], None)
+            self._pending_cond.notify_all()
+
+    def _apply(self, conn, ops):
+        conn.execute("BEGIN")
+        try:
+            for op in ops:
+                kind = op[0]
+                if kind == "save":
+                    _, session_id, state, updated_at, rows, rewrite = op
+                    if rewrite:
+                        conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                    conn.execute(
+                        "INSERT INTO sessions (session_id, state, updated_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(session_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                        (session_id, state, updated_at),
+                    )
+                    if rows:
+                        conn.executemany(
+                            "INSERT OR REPLACE INTO messages (session_id, seq, body) VALUES (?, ?, ?)", rows
+                        )
+                elif kind == "delete":
+                    conn.execute("DELETE FROM messages WHERE session_id = ?", (op[1],))
+                    conn.execute("DELETE FROM sessions WHERE session_id = ?", (op[1],))
+                elif kind == "purge":
+                    cutoff = op[1]
+                    conn.execute(
+                        "DELETE FROM messages WHERE session_id IN "
+                        "(SELECT session_id FROM sessions WHERE updated_at < ?)",
+                        (cutoff,),
+                    )
+                    cur = conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+                    self.purged += cur.rowcount
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        self.writes += len(ops)
+        self.transactions += 1
+
+    # --- READ PATH ---
+    async def load(self, session_id):
+        return await asyncio.to_thread(self._load_blocking, session_id)
+
+    def _load_blocking(self, session_id):
+        self._wait_for(session_id)
+        with self._read_lock:
+            row = self._reader.execute(
+                "SELECT state, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl is not None and row[1] < time.time() - self.ttl:
+                return None  # Expired; the next purge removes it
+            bodies = self._reader.execute(
+                "SELECT body FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        self.loads += 1
+        return load_state(row[0], [json.loads(body) for (body,) in bodies])
+
+    async def close(self):
+        await asyncio.to_thread(self._close_blocking)
+
+    def _close_blocking(self):
+        if self._closed:
+            return
+        self._queue.put(None)
+        self._writer.join()
+        self._closed = True
+        with self._read_lock:
+            self._reader.close()
+
+    def stats(self):
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "pendingWrites": self._queue.qsize(),
+            "writes": self.writes,
+            "transactions": self.transactions,
+            "loads": self.loads,
+            "purged": self.purged,
+            "writeErrors": self.write_errors,
+        }
+
+
+# Atomic merge of one save into the shared copy. Several workers may save the
+# same session concurrently, so nothing is blindly overwritten:
+# - new messages are appended, messageCount is the resulting list length
+# - an indicator is appended only if its "seen" hash didn't have it (HSETNX)
+# - flags only go False -> True, reportedMessageCount only grows,
+#   startTime keeps the first writer's value
+# KEYS: state, messages, intel lists (n), seen hashes (n)
+# ARGV: ttl, n_intel_keys, n_messages, n_state_pairs, messages...,
+#       state field/value pairs..., then per intel key: count, (value, index)...
+_MERGE_SCRIPT = """
+local ttl = tonumber(ARGV[1])
+local n_keys = tonumber(ARGV[2])
+local n_msgs = tonumber(ARGV[3])
+local n_pairs = tonumber(ARGV[4])
+local i = 5
+
+for _ = 1, n_msgs do
+    redis.call('RPUSH', KEYS[2], ARGV[i])
+    i = i + 1
+end
+
+for _ = 1, n_pairs do
+    local field, value = ARGV[i], ARGV[i + 1]
+    i = i + 2
+    if field == 'startTime' then
+        redis.call('HSETNX', KEYS[1], field, value)
+    elseif field == 'scamDetected' or field == 'reported' then
+        if value == 'true' then redis.call('HSET', KEYS[1], field, value)
+        else redis.call('HSETNX', KEYS[1], field, value) end
+    elseif field == 'reportedMessageCount' then
+        local current = tonumber(redis.call('HGET', KEYS[1], field) or '-1') or -1
+        if (tonumber(value) or -1) > current then redis.call('HSET', KEYS[1], field, value) end
+    elseif field ~= 'messageCount' then
+        redis.call('HSET', KEYS[1], field, value)
+    end
+end
+
+local count = redis.call('LLEN', KEYS[2])
+redis.call('HSET', KEYS[1], 'messageCount', count)
+
+for k = 1, n_keys do
+    local list_key, seen_key = KEYS[2 + k], KEYS[2 + n_keys + k]
+    local n = tonumber(ARGV[i])
+    i = i + 1
+    for _ = 1, n do
+        if redis.call('HSETNX', seen_key, ARGV[i], ARGV[i + 1]) == 1 then
+            redis.call('RPUSH', list_key, ARGV[i])
+        end
+        i = i + 2
+    end
+end
+
+if ttl > 0 then
+    for _, key in ipairs(KEYS) do redis.call('EXPIRE', key, ttl) end
+end
+return count
+"""
+
+# Session field: how many of each intelligence list the shared copy already has
+PERSISTED_INTEL_FIELD = "_persistedIntelCounts"
+
+
+class SessionBackendError(Exception):
+    """The backend could not be read: the caller must not treat the session as new."""
+
+
+class RedisSessionBackend:
+    """
+    Shared sessions over the Redis protocol, for N workers / N pods.
+
+    `shared = True`: SessionStore keeps no local copy, every turn reads the
+    shared state. Per session (the {hash tag} keeps them on one cluster slot):
+    - {prefix}:{sid}:state         hash, one JSON value per session field
+    - {prefix}:{sid}:msgs          list of JSON messages (append-only)
+    - {prefix}:{sid}:intel:{key}   list, insertion order
+    - {prefix}:{sid}:seen:{key}    hash value -> first-seen message index
+    A load is one pipelined round trip; a save is one atomic merge script,
+    both on the asyncio client (the event loop never blocks on Redis).
+    Idle sessions expire through EXPIRE (`ttl`).
+
+    A failed save keeps the session (its unsaved messages / indicators) for a
+    retry: on the next load of that session, and on every sweep. A failed load
+    raises SessionBackendError instead of looking like a brand-new session.
+    """
+
+    shared = True
+
+    # Sessions with unsaved deltas kept for a retry (oldest dropped beyond this)
+    MAX_RETRY_SESSIONS = 10000
+
+    def __init__(self, url=None, client=None, prefix="honeypot", ttl=None, max_connections=50):
+        if client is None:
+            import redis.asyncio as redis  # Optional dependency: only needed for SESSION_BACKEND=redis
+
+            client = redis.Redis.from_url(url, max_connections=max_connections)
+        self.client = client
+        self.url = url
+        self.prefix = prefix
+        self.ttl = int(ttl) if ttl else 0
+        self._merge = client.register_script(_MERGE_SCRIPT)
+        # session_id -> session whose last save failed (its counters still mark the unsaved part)
+        self._retry = {}
+        self.loads = 0
+        self.saves = 0
+        self.errors = 0
+        self.retried = 0
+        self.retry_dropped = 0
+
+    def _keys(self, session_id):
+        base = f"{self.prefix}:{{{session_id}}}"
+        return (
+            [f"{base}:state", f"{base}:msgs"]
+            + [f"{base}:intel:{key}" for key in INTEL_KEYS]
+            + [f"{base}:seen:{key}" for key in INTEL_KEYS]
+        )
+
+    async def load(self, session_id):
+        # Unsaved deltas first, or this turn would start from a stale copy
+        pending = self._retry.get(session_id)
+        if pending is not None and not await self._save(session_id, pending):
+            raise SessionBackendError(f"Session {session_id} has unsaved changes and Redis is unavailable")
+
+        keys = self._keys(session_id)
+        n = len(INTEL_KEYS)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hgetall(keys[0])
+        pipe.lrange(keys[1], 0, -1)
+        for key in keys[2:2 + n]:
+            pipe.lrange(key, 0, -1)
+        for key in keys[2 + n:]:
+            pipe.hgetall(key)
+        try:
+            results = await pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            log.warning(f"⚠️ Session load from Redis failed for {session_id}: {e}")
+            raise SessionBackendError(f"Session load failed for {session_id}: {e}") from e
+        state = results[0]
+        if not state:
+            return None
+
+        self.loads += 1
+        session = {_text(k): json.loads(v) for k, v in state.items()}
+        start = session.get("startTime")
+        if isinstance(start, str):
+            session["startTime"] = datetime.fromisoformat(start)
+        session["messages"] = [json.loads(m) for m in results[1]]
+        session["intelligence"] = {
+            key: [_text(v) for v in values] for key, values in zip(INTEL_KEYS, results[2:2 + n])
+        }
+        session["intelFirstSeen"] = {
+            key: {_text(v): _index(i) for v, i in seen.items()}
+            for key, seen in zip(INTEL_KEYS, results[2 + n:])
+        }
+        session[PERSISTED_COUNT_FIELD] = len(session["messages"])
+        session[PERSISTED_INTEL_FIELD] = {key: len(v) for key, v in session["intelligence"].items()}
+        return session
+
+    async def save(self, session_id, session):
+        if not await self._save(session_id, session):
+            self._keep_for_retry(session_id, session)
+
+    async def _save(self, session_id, session):
+        """One merge of everything this copy has that Redis doesn't. True on success."""
+        messages = session.get("messages", [])
+        persisted = session.get(PERSISTED_COUNT_FIELD, 0)
+        intel = session.get("intelligence", {})
+        first_seen = session.get("intelFirstSeen", {})
+        intel_counts = session.get(PERSISTED_INTEL_FIELD, {})
+
+        new_messages = [dump_message(m) for m in messages[persisted:]]
+        pairs = []
+        for field, value in session.items():
+            if field in ("messages", "intelligence", "intelFirstSeen") or field.startswith("_persisted"):
+                continue
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            pairs += [field, json.dumps(value, ensure_ascii=False)]
+
+        args = [self.ttl, len(INTEL_KEYS), len(new_messages), len(pairs) // 2]
+        args += new_messages
+        args += pairs
+        for key in INTEL_KEYS:
+            values = intel.get(key, [])[intel_counts.get(key, 0):]
+            args.append(len(values))
+            for value in values:
+                index = first_seen.get(key, {}).get(value)
+                args += [value, "" if index is None else index]
+
+        try:
+            await self._merge(keys=self._keys(session_id), args=args)
+        except Exception as e:
+            # Counters untouched: a retry sends the same messages/indicators again
+            self.errors += 1
+            log.warning(f"⚠️ Session save to Redis failed for {session_id}: {e}")
+            return False
+        self.saves += 1
+        session[PERSISTED_COUNT_FIELD] = len(messages)
+        session[PERSISTED_INTEL_FIELD] = {key: len(intel.get(key, [])) for key in INTEL_KEYS}
+        self._retry.pop(session_id, None)
+        return True
+
+    def _keep_for_retry(self, session_id, session):
+        self._retry.pop(session_id, None)
+        self._retry[session_id] = session  # Newest last
+        if len(self._retry) > self.MAX_RETRY_SESSIONS:
+            dropped = next(iter(self._retry))
+            del self._retry[dropped]
+            self.retry_dropped += 1
+            log.error(f"❌ Session {dropped}: unsaved changes dropped (Redis retry buffer full)")
+
+    async def retry_failed(self):
+        """Re-sends every session whose last save failed. Returns how many are still pending."""
+        for session_id, session in list(self._retry.items()):
+            if self._retry.get(session_id) is not session:
+                continue  # Saved (or replaced) meanwhile
+            if not await self._save(session_id, session):
+                break  # Still down: try again on the next sweep
+            self.retried += 1
+        return len(self._retry)
+
+    async def delete(self, session_id):
+        self._retry.pop(session_id, None)
+        await self.client.delete(*self._keys(session_id))
+
+    async def purge_idle(self):
+        # Redis expires idle sessions itself (EXPIRE on every save); just retry failed saves
+        if self._retry:
+            await self.retry_failed()
+
+    async def close(self):
+        if self._retry and await self.retry_failed():
+            log.error(f"❌ {len(self._retry)} session(s) with unsaved changes at shutdown (Redis unavailable)")
+        await self.client.aclose()
+
+    def stats(self):
+        return {
+            "backend": "redis",
+            "url": self.url,
+            "loads": self.loads,
+            "saves": self.saves,
+            "errors": self.errors,
+            "pendingRetries": len(self._retry),
+            "retried": self.retried,
+            "retryDropped": self.retry_dropped,
+        }
+
+
+def _text(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _index(value):
+    value = _text(value)
+    return int(value) if value else None
@@ -0,0 +1,38 @@
+# app/core/singleflight.py
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller starts the
+    work, everyone who arrives while it is running awaits the same result.
+    Once the call finishes the key is forgotten (results are not cached here).
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> asyncio.Task
+        self.leaders = 0
+        self.shared = 0
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key, fn, timeout=None):
+        """
+        fn: zero-argument coroutine function, only run by the leader.
+        timeout: how long THIS caller waits (asyncio.TimeoutError after it);
+        the shared call keeps running for everyone else.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _t, k=key: self._calls.pop(k, None))
+        else:
+            self.shared += 1
+        # shield(): one impatient caller being cancelled must not cancel the others
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+    def stats(self):
+        return {"inFlight": len(self._calls), "leaders": self.leaders, "shared": self.shared}
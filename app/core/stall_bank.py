@@ -0,0 +1,58 @@
+# app/core/stall_bank.py
+import random
+
+# Canned replies for when the LLM is saturated (see AdmissionController) or
+# only the offline provider is left (LocalProvider).
+# Same persona as the LLM (Arthur: polite, eager, hopeless with technology),
+# grouped by the tactical directive so a stall still pushes the right way.
+
+# Tactical directives (what Arthur should be doing right now)
+DIRECTIVE_LINK_ONLY = "STATUS: Phishing Link Found. ACTION: Lie (404 Error). Demand Bank/UPI."
+DIRECTIVE_CAPTURED = "STATUS: Success (Details Captured). ACTION: STALL INDEFINITELY. Invent tech failures. Be creative about excuses. You may reference the captured details to sound convincing."
+DIRECTIVE_NO_DETAILS = "STATUS: No details. ACTION: Act eager. Ask for UPI/Bank details."
+
+# STATUS: No details -> act eager, fish for UPI / bank details
+EAGER_STALLS = [
+    "Oh yes, I want to sort this out right away. Where exactly should I send the money? Please give me the UPI ID again.",
+    "I am ready, dear. My grandson set up this phone, so please tell me slowly, which account number should I use?",
+    "Yes yes, I understand it is urgent. Should I pay by UPI or bank transfer? Give me the details and I will do it now.",
+    "I have my reading glasses on now. Please type the account number and IFSC code, I will write it down.",
+    "Oh dear, I don't want any trouble with my account. Tell me where to pay and I will do it immediately.",
+    "My bank app is open. What UPI ID do I type in the box? I will copy it exactly.",
+]
+
+# STATUS: Phishing Link Found -> the link "does not work", ask for bank/UPI instead
+LINK_STALLS = [
+    "I clicked the link but it says 404 Not Found. Can I just pay you by UPI instead?",
+    "The page is not opening, it keeps showing an error. Is there an account number I can send it to directly?",
+    "My phone says the website cannot be reached. Please give me your UPI ID, that will be easier for me.",
+    "The link shows a blank white page. Can you send me the bank details so I can go to the branch?",
+    "Oh no, it says 'page expired'. Should I transfer it to your account instead? What is the number?",
+]
+
+# STATUS: Success (Details Captured) -> stall indefinitely with tech trouble
+CAPTURED_STALLS = [
+    "I typed everything in but it says 'server busy, try again later'. Let me try once more.",
+    "The app is asking me to update it first. It is downloading very slowly, please wait a moment.",
+    "My phone battery is at 2 percent, let me find the charger. Don't go anywhere, I am trying.",
+    "It says the transaction is pending. Is that normal? Should I wait or press the button again?",
+    "I entered the amount but my screen froze. I am restarting the phone now, give me a minute.",
+    "The bank sent me a message but the letters are too small. Let me find my glasses, one moment dear.",
+    "It is showing 'limit exceeded'. I think I need to call my bank. Can you hold on?",
+]
+
+
+STALL_BANK = {
+    DIRECTIVE_LINK_ONLY: LINK_STALLS,
+    DIRECTIVE_CAPTURED: CAPTURED_STALLS,
+    DIRECTIVE_NO_DETAILS: EAGER_STALLS,
+}
+
+
+def pick_stall_reply(replies, recent_replies=()):
+    """
+    Random stall from `replies`, avoiding ones Arthur used recently in this
+    session (persona rule: never the same excuse twice).
+    """
+    fresh = [r for r in replies if r not in recent_replies]
+    return random.choice(fresh or replies)
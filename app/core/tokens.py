@@ -0,0 +1,47 @@
+# app/core/tokens.py
+import re
+
+# Local token estimate (no tokenizer download, no network). Modelled on the
+# BPE vocabularies Groq's Llama models use:
+# - a word (with its leading space) is one token, long words are split
+# - digit runs are split into groups of 3
+# - every punctuation/symbol character is its own token
+_PIECE = re.compile(r"(?P<word>[^\W\d_]+)|(?P<digits>\d+)|[^\w\s]|_+")
+_LONG_WORD = 8
+# Extra tokens beyond one per piece, counted by the C regex engine:
+# one per full 8 letters of a word, one per 3 digits after a run's first digit
+_LONG_WORD_CHUNK = re.compile(r"[^\W\d_]{%d}" % _LONG_WORD)
+_DIGIT_GROUP = re.compile(r"(?<=\d)\d{3}")
+
+
+def _piece_tokens(text):
+    """Yields (start offset, token count) for each piece of `text`."""
+    for match in _PIECE.finditer(text):
+        start = match.start()
+        kind = match.lastgroup
+        if kind == "word":
+            yield start, 1 + (match.end() - start) // _LONG_WORD
+        elif kind == "digits":
+            yield start, (match.end() - start + 2) // 3
+        else:
+            yield start, 1
+
+
+def estimate_tokens(text):
+    """Approximate token count of `text` (errs slightly high on purpose)."""
+    # Same total as summing _piece_tokens(), without a Python loop per piece
+    return (
+        len(_PIECE.findall(text))
+        + len(_LONG_WORD_CHUNK.findall(text))
+        + len(_DIGIT_GROUP.findall(text))
+    )
+
+
+def truncate_to_tokens(text, max_tokens, suffix="..."):
+    """Cuts `text` after roughly `max_tokens` tokens (at a piece boundary)."""
+    count = 0
+    for start, tokens in _piece_tokens(text):
+        count += tokens
+        if count > max_tokens:
+            return text[:start].rstrip() + suffix
+    return text
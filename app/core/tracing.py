@@ -0,0 +1,256 @@
+# app/core/tracing.py
+import cProfile
+import heapq
+import io
+import itertools
+import pstats
+import random
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from app.core.config import (
+    TRACE_BUFFER_SIZE,
+    TRACE_ENABLED,
+    TRACE_PROFILE_SAMPLE_RATE,
+    TRACE_PROFILE_THRESHOLD,
+    TRACE_PROFILE_TOP,
+    TRACE_SLOWEST_SIZE,
+)
+
+# 🔎 Lightweight per-request tracing.
+#
+#   with trace_request("honeypot", session_id):
+#       with span("detect"):
+#           ...
+#
+# The current trace and span live in contextvars, so spans opened anywhere
+# below (agent, LLM key attempts, hedges in their own tasks) attach to the
+# right request. Outside a request span() costs one ContextVar lookup.
+
+_current_trace = ContextVar("honeypot_trace", default=None)
+_current_span = ContextVar("honeypot_span", default=None)
+
+
+class Trace:
+    __slots__ = ("trace_id", "route", "session_id", "started_at", "start", "duration",
+                 "spans", "attrs", "profiler", "profile", "finished", "tokens")
+
+    def __init__(self, route, session_id):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.route = route
+        self.session_id = session_id
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.attrs = {}
+        self.profiler = None
+        self.profile = None
+        self.finished = False
+        self.tokens = None  # ContextVar tokens to undo start() with
+
+    def to_dict(self, with_spans=True):
+        data = {
+            "traceId": self.trace_id,
+            "route": self.route,
+            "sessionId": self.session_id,
+            "startedAt": self.started_at.isoformat(timespec="milliseconds"),
+            "durationMs": round(self.duration * 1000, 2) if self.duration is not None else None,
+            **self.attrs,
+        }
+        if with_spans:
+            data["spans"] = self.spans
+            data["profile"] = self.profile
+        else:
+            data["spans"] = len(self.spans)
+            data["hasProfile"] = self.profile is not None
+        return data
+
+
+class TraceStore:
+    """Last `size` traces (ring buffer) + the `slowest` slowest ones (min-heap)."""
+
+    def __init__(self, size=500, slowest=50):
+        self.recent = deque(maxlen=size)
+        self.slowest_size = slowest
+        self._slowest = []  # (duration, seq, trace)
+        self._seq = itertools.count()
+
+    def add(self, trace):
+        self.recent.append(trace)
+        if self.slowest_size <= 0:
+            return
+        item = (trace.duration, next(self._seq), trace)
+        if len(self._slowest) < self.slowest_size:
+            heapq.heappush(self._slowest, item)
+        elif trace.duration > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, item)
+
+    def _all(self):
+        seen = set()
+        for trace in itertools.chain(reversed(self.recent), (t for _, _, t in self._slowest)):
+            if trace.trace_id not in seen:
+                seen.add(trace.trace_id)
+                yield trace
+
+    def find(self, session_id=None, limit=50):
+        """Newest first (slow traces already rotated out of the ring come last)."""
+        matches = (t for t in self._all() if session_id is None or t.session_id == session_id)
+        return list(itertools.islice(matches, limit))
+
+    def slowest(self, limit=50):
+        return [t for _, _, t in sorted(self._slowest, key=lambda item: item[0], reverse=True)][:limit]
+
+    def get(self, trace_id):
+        return next((t for t in self._all() if t.trace_id == trace_id), None)
+
+
+class Tracer:
+    def __init__(self, enabled=True, store=None, profile_rate=0.0, profile_threshold=2.0, profile_top=30):
+        self.enabled = enabled
+        self.store = store or TraceStore()
+        self.profile_rate = profile_rate
+        self.profile_threshold = profile_threshold
+        self.profile_top = profile_top
+        # One profiler at a time: cProfile hooks the whole thread
+        self._profiling = False
+        self.traces = 0
+        self.profiles_taken = 0
+        self.profiles_kept = 0
+
+    def start(self, route, session_id=None):
+        """Opens a trace and makes it current for this task (and tasks it spawns)."""
+        if not self.enabled:
+            return None
+        trace = Trace(route, session_id)
+        trace.tokens = (_current_trace.set(trace), _current_span.set(None))
+        if self.profile_rate and not self._profiling and random.random() < self.profile_rate:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                return trace  # Some other profiler is active on this thread
+            self._profiling = True
+            self.profiles_taken += 1
+            trace.profiler = profiler
+        return trace
+
+    def finish(self, trace):
+        if trace is None or trace.finished:
+            return
+        trace.finished = True
+        trace.duration = time.perf_counter() - trace.start
+        self._restore_context(trace)
+        if trace.profiler is not None:
+            trace.profiler.disable()
+            self._profiling = False
+            if trace.duration >= self.profile_threshold:
+                # NOTE: other requests running on the loop meanwhile are in it too
+                out = io.StringIO()
+                pstats.Stats(trace.profiler, stream=out).sort_stats("cumulative").print_stats(self.profile_top)
+                trace.profile = out.getvalue()
+                self.profiles_kept += 1
+            trace.profiler = None
+        self.traces += 1
+        self.store.add(trace)
+
+    @staticmethod
+    def _restore_context(trace):
+        """Puts back whatever trace/span was current before start()."""
+        if trace.tokens is None:
+            return
+        trace_token, span_token = trace.tokens
+        trace.tokens = None
+        try:
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+        except ValueError:
+            # Finished from another context (a streaming body's task): the
+            # context start() ran in ends with its request, and spans on a
+            # finished trace are no-ops meanwhile
+            pass
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "traces": self.traces,
+            "buffered": len(self.store.recent),
+            "bufferSize": self.store.recent.maxlen,
+            "slowestSize": self.store.slowest_size,
+            "profileSampleRate": self.profile_rate,
+            "profileThresholdSeconds": self.profile_threshold,
+            "profilesTaken": self.profiles_taken,
+            "profilesKept": self.profiles_kept,
+        }
+
+
+tracer = Tracer(
+    enabled=TRACE_ENABLED,
+    store=TraceStore(size=TRACE_BUFFER_SIZE, slowest=TRACE_SLOWEST_SIZE),
+    profile_rate=TRACE_PROFILE_SAMPLE_RATE,
+    profile_threshold=TRACE_PROFILE_THRESHOLD,
+    profile_top=TRACE_PROFILE_TOP,
+)
+
+
+@contextmanager
+def trace_request(route, session_id=None):
+    trace = tracer.start(route, session_id)
+    try:
+        yield trace
+    finally:
+        tracer.finish(trace)
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Times a block as a child of the current span. Yields the span dict (add
+    attributes to it), or None when there is no live trace.
+    """
+    trace = _current_trace.get()
+    if trace is None or trace.finished:
+        # No request (or a background task outliving its request): no-op
+        yield None
+        return
+    started = time.perf_counter()
+    entry = {"name": name, "parent": _current_span.get(), "startMs": round((started - trace.start) * 1000, 3)}
+    entry.update(attrs)
+    trace.spans.append(entry)
+    token = _current_span.set(len(trace.spans) - 1)
+    try:
+        yield entry
+    except BaseException as e:
+        entry["error"] = type(e).__name__
+        raise
+    finally:
+        entry["durationMs"] = round((time.perf_counter() - started) * 1000, 3)
+        _current_span.reset(token)
+
+
+def add_span(name, started, **attrs):
+    """
+    Records an already finished span that began at `started` (perf_counter).
+    For blocks that can't sit inside a `with`, e.g. around a generator's yields.
+    """
+    trace = _current_trace.get()
+    if trace is None or trace.finished:
+        return
+    now = time.perf_counter()
+    entry = {"name": name, "parent": _current_span.get(), "startMs": round((started - trace.start) * 1000, 3)}
+    entry.update(attrs)
+    entry["durationMs"] = round((now - started) * 1000, 3)
+    trace.spans.append(entry)
+
+
+def annotate(**attrs):
+    """Adds attributes to the current span (or to the trace itself at top level)."""
+    trace = _current_trace.get()
+    if trace is None or trace.finished:
+        return
+    index = _current_span.get()
+    (trace.spans[index] if index is not None else trace.attrs).update(attrs)
@@ -1,58 +1,124 @@
-from app.core.llm import llm
-
-
-# 2. Hardcoded Patterns
-SCAM_KEYWORDS = [
-    "blocked",
-    "suspended",
-    "verify",
-    "urgent",
-    "account",
-    "upi",
-    "otp",
-    "freeze",
-    "immediately",
-    "bank",
-    "kyc",
-    "refund",
-    "won",
-    "lottery",
-    "expired",
-    "click here",
-    "link",
-    "password",
-    "pin",
-]
-
-
-def detect_scam(text: str):
-    """
-    Returns: (is_scam: bool, keywords_found: list[str])
-    """
-    text_lower = text.lower()
+import asyncio
+import hashlib
+import time
 
-    # STEP 1: Fast Keyword Match
-    hits = [kw for kw in SCAM_KEYWORDS if kw in text_lower]
-    if len(hits) >= 1:
-        return True, hits
+from app.core.admission import llm_admission
+from app.core.cache import TTLCache
+from app.core.config import DETECT_VERDICT_CACHE_SIZE, DETECT_VERDICT_CACHE_TTL
+from app.core.indicators import SCAM, SCAM_KEYWORDS, scan_indicators
+from app.core.llm import llm, is_fallback
+from app.core.metrics import DETECTIONS, STAGE_SECONDS
+from app.core.singleflight import SingleFlight
+from app.core.tracing import annotate, span
+from app.core.log import get_logger
+
+log = get_logger("detect")
+
+
+# 2. Hardcoded Patterns (live in app/core/indicators.py, shared with the extractor)
+# SCAM_KEYWORDS is re-exported here for existing imports.
+__all__ = ["SCAM_KEYWORDS", "verdict_cache", "detect_scam", "detector_stats"]
 
+# LLM verdicts for texts with no keyword hit, keyed by content hash
+verdict_cache = TTLCache(max_entries=DETECT_VERDICT_CACHE_SIZE, ttl=DETECT_VERDICT_CACHE_TTL)
+# Concurrent identical texts share one in-flight classification
+_inflight = SingleFlight()
+
+
+def _verdict_key(text: str) -> bytes:
+    """Content hash of the normalized text (case + whitespace folded)."""
+    normalized = " ".join(text.lower().split())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+
+
+async def _classify_with_llm(text: str, deadline=None):
+    """
+    Returns True / False, or None when the LLM gave no usable answer
+    (errors, load shedding and the all-keys-failed fallback are never cached).
+    """
+    # 🚦 Same gate as agent replies: a burst of new sessions can't flood Groq
+    with span("admission"):
+        admitted = await llm_admission.acquire(deadline)
+    if not admitted:
+        annotate(admission="shed")
+        return None
     try:
-        raw_response = llm.generate(
+        raw_response = await llm.generate(
             system_prompt="You are a scam detector. Reply ONLY with 'TRUE' or 'FALSE'.",
             user_prompt=f"Analyze this message for scam intent: '{text}'",
-            provider="groq" # You can use "gemini" here explicitly if you want specific efficiency
+            deadline=deadline,
+            purpose="verdict",
         )
-        
+
+        if is_fallback(raw_response):
+            return None
+
         if raw_response:
             response_text = raw_response.strip().upper()
         else:
             response_text = "FALSE"
 
-        if "TRUE" in response_text:
-            return True, ["AI_Context_Analysis"]
-            
+        return "TRUE" in response_text
+
     except Exception as e:
-        print(f"Detector Error: {e}")
+        log.warning(f"Detector Error: {e}")
+        return None
+    finally:
+        llm_admission.release()
+
+
+async def _classify_and_cache(key: bytes, text: str):
+    """
+    The shared call behind _inflight. It runs on no caller's deadline (a
+    follower may have more time left than the leader) and caches its own
+    verdict, so callers that stopped waiting still leave one for next time.
+    """
+    verdict = await _classify_with_llm(text)
+    if verdict is not None:
+        verdict_cache.set(key, verdict, size=1)
+    return verdict
+
+
+async def detect_scam(text: str, deadline=None):
+    """
+    Returns: (is_scam: bool, keywords_found: list[str])
+    """
+    # STEP 1: Fast Keyword Match (one multi-pattern scan, shared with extraction)
+    started = time.perf_counter()
+    hits = scan_indicators(text).found(SCAM)
+    STAGE_SECONDS.observe(time.perf_counter() - started, "detect_keyword")
+    if len(hits) >= 1:
+        DETECTIONS.inc("keyword", "scam")
+        annotate(method="keyword", verdict="scam")
+        return True, hits
+
+    # STEP 2: LLM Fallback (cached verdict, or ONE shared call per distinct text)
+    started = time.perf_counter()
+    key = _verdict_key(text)
+    verdict = verdict_cache.get(key)
+    with span("detect_llm", cached=verdict is not None) as sp:
+        if verdict is None:
+            # Each caller waits only as long as its own deadline allows
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                verdict = await _inflight.do(key, lambda: _classify_and_cache(key, text), timeout=wait)
+            except asyncio.TimeoutError:
+                verdict = None
+        outcome = "unknown" if verdict is None else "scam" if verdict else "clean"
+        if sp is not None:
+            sp["verdict"] = outcome
+    STAGE_SECONDS.observe(time.perf_counter() - started, "detect_llm")
+    DETECTIONS.inc("llm", outcome)
+
+    if verdict:
+        return True, ["AI_Context_Analysis"]
 
     # Default to Safe
     return False, []
+
+
+def detector_stats():
+    return {
+        "verdictCache": verdict_cache.stats(),
+        "singleflight": _inflight.stats(),
+    }
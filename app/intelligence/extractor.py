@@ -1,6 +1,18 @@
 import re
 
+from app.core.indicators import (
+    GIFT_BRAND,
+    GIFT_BRANDS,
+    REMOTE_APP,
+    REMOTE_APPS,
+    SENSITIVE,
+    SENSITIVE_CONTEXT_WORDS,
+    scan_indicators,
+)
+
 # --- 1. CORE PATTERNS ---
+# PHONE / BANK / MPIN / AADHAAR are the reference definitions; at runtime they
+# are matched by scan_digit_runs() below, which reads each digit run once.
 UPI_REGEX = re.compile(r"\b[a-zA-Z0-9.\-_]{2,256}@[a-zA-Z]{2,64}\b")
 PHONE_REGEX = re.compile(r"(?:\+91[\-\s]?)?[6-9]\d{9}\b")
 URL_REGEX = re.compile(r"\b(?:https?://|www\.)\S+\b")
@@ -18,81 +30,177 @@ BTC_REGEX = re.compile(r"\b(?:1|3|bc1)[a-zA-Z0-9]{25,39}\b")
 ETH_REGEX = re.compile(r"\b0x[a-fA-F0-9]{40}\b")
 GIFT_CODE_REGEX = re.compile(r"\b[A-Z0-9]{4}-[A-Z0-9]{4}-[A-Z0-9]{4}-[A-Z0-9]{4}\b")
 
-REMOTE_APPS = [
-    "anydesk",
-    "teamviewer",
-    "quicksupport",
-    "alpemix",
-    "rustdesk",
-    "screen share",
-    "remote support",
-    "any desk",
-]
-GIFT_BRANDS = [
-    "google play",
-    "amazon gift",
-    "steam card",
-    "apple card",
-    "itunes",
-    "vanilla visa",
-    "play station",
-    "xbox gift",
-    "razer gold",
+# Keyword lists (REMOTE_APPS, GIFT_BRANDS, SENSITIVE_CONTEXT_WORDS) live in
+# app/core/indicators.py and are matched in one shared scan; re-exported here
+# for existing imports.
+__all__ = [
+    "UPI_REGEX", "PHONE_REGEX", "URL_REGEX", "BANK_REGEX",
+    "MPIN_REGEX", "IFSC_REGEX", "PAN_REGEX", "AADHAAR_REGEX",
+    "BTC_REGEX", "ETH_REGEX", "GIFT_CODE_REGEX",
+    "REMOTE_APPS", "GIFT_BRANDS", "SENSITIVE_CONTEXT_WORDS",
+    "scan_digit_runs", "extract_intelligence",
 ]
-SENSITIVE_CONTEXT_WORDS = ["mpin", "pin", "otp", "code", "password", "cvv"]
+
+# --- 4. FUSED DIGIT SCANNER ---
+_DIGIT_RUN = re.compile(r"\d+")
+_SPACE_CHAR = re.compile(r"\s")
+_PHONE_STARTS = "6789"
+# IFSC and PAN both start with 4+ capitals
+_UPPER_PREFIX = re.compile(r"[A-Z]{4}")
+
+
+def _is_glued(text, i):
+    """
+    True if text[i] is a word char. Used on the neighbours of a maximal digit
+    run (never digits themselves): there is a \\b between the run and text[i]
+    only when this is False. Same definition of \\w as the re module.
+    """
+    if 0 <= i < len(text):
+        c = text[i]
+        return c.isalnum() or c == "_"
+    return False
+
+
+def _is_space(text, i):
+    return 0 <= i < len(text) and _SPACE_CHAR.match(text, i) is not None
+
+
+def _aadhaar_end(text, runs, i):
+    """
+    AADHAAR_REGEX starting at runs[i]: 12 digits as 12, 4+8, 8+4 or 4+4+4
+    runs joined by ONE whitespace char, then a word boundary.
+    Returns the index of the last run used, or None.
+    """
+    total = 0
+    for j in range(i, len(runs)):
+        run = runs[j]
+        if j > i:
+            prev_end = runs[j - 1].end()
+            if run.start() != prev_end + 1 or not _is_space(text, prev_end):
+                return None
+        length = run.end() - run.start()
+        total += length
+        if length % 4 or total > 12:
+            return None
+        if total == 12:
+            return j if not _is_glued(text, run.end()) else None
+    return None
+
+
+def scan_digit_runs(text):
+    """
+    One pass over the digit runs of `text`, classifying each run as the
+    PHONE / BANK / MPIN / AADHAAR regexes would (same matches, same order).
+    Returns (phones, banks, mpins, aadhaars) as lists in findall order.
+    """
+    runs = list(_DIGIT_RUN.finditer(text))
+    phones, banks, mpins, aadhaars = [], [], [], []
+    aadhaar_resume = 0  # findall() never overlaps: skip runs already consumed
+
+    for i, run in enumerate(runs):
+        start, end = run.span()
+        length = end - start
+        if length < 4:
+            continue  # Too short for every numeric class
+        open_left = not _is_glued(text, start - 1)
+        open_right = not _is_glued(text, end)
+
+        # BANK (\b\d{9,18}\b) and MPIN (\b\d{4,6}\b): the whole run, bounded
+        if open_left and open_right:
+            if 9 <= length <= 18:
+                banks.append(run.group())
+            elif 4 <= length <= 6:
+                mpins.append(run.group())
+
+        # PHONE: the last 10 digits of a run, optionally with a +91 prefix
+        if open_right and length >= 10 and text[end - 10] in _PHONE_STARTS:
+            if length == 12 and text.startswith("91", start) and text[start - 1:start] == "+":
+                phones.append(text[start - 1:end])  # +91XXXXXXXXXX
+            elif (
+                length == 10 and start >= 4 and text.startswith("+91", start - 4)
+                and (text[start - 1] == "-" or _is_space(text, start - 1))
+            ):
+                phones.append(text[start - 4:end])  # +91-XXXXXXXXXX / +91 XXXXXXXXXX
+            else:
+                phones.append(text[end - 10:end])
+
+        # AADHAAR: may span up to three runs
+        if i >= aadhaar_resume and open_left and length in (4, 8, 12):
+            last = _aadhaar_end(text, runs, i)
+            if last is not None:
+                aadhaars.append(text[start:runs[last].end()])
+                aadhaar_resume = last + 1
+
+    return phones, banks, mpins, aadhaars
 
 
 def extract_intelligence(text: str):
     """
     Extracts structured data + Advanced Scams.
+    Fused: digits are classified in one scan, and every other pattern is
+    skipped unless a cheap prefilter says it could match.
     """
 
+    # 0. Cheap Prefilters
+    has_digits = _DIGIT_RUN.search(text) is not None
+
     # 1. Raw Extraction
-    upi_list = list(set(UPI_REGEX.findall(text)))
-    phone_list = list(set(PHONE_REGEX.findall(text)))
-    url_list = list(set(URL_REGEX.findall(text)))
-    raw_bank_list = list(set(BANK_REGEX.findall(text)))
-    raw_mpin_list = list(set(MPIN_REGEX.findall(text)))
+    if has_digits:
+        phones, banks, mpins, aadhaars = scan_digit_runs(text)
+    else:
+        phones, banks, mpins, aadhaars = [], [], [], []
+
+    upi_list = list(set(UPI_REGEX.findall(text))) if "@" in text else []
+    phone_list = list(set(phones))
+    url_list = list(set(URL_REGEX.findall(text))) if ("http" in text or "www." in text) else []
+    raw_bank_list = list(set(banks))
+    raw_mpin_list = list(set(mpins))
 
     # 2. Advanced Extraction
     extra_keywords = []
 
-    for ifsc in IFSC_REGEX.findall(text):
-        extra_keywords.append(f"IFSC:{ifsc}")
-    for pan in PAN_REGEX.findall(text):
-        extra_keywords.append(f"PAN:{pan}")
-    for aadhaar in AADHAAR_REGEX.findall(text):
+    if has_digits and _UPPER_PREFIX.search(text):
+        if "0" in text:
+            for ifsc in IFSC_REGEX.findall(text):
+                extra_keywords.append(f"IFSC:{ifsc}")
+        for pan in PAN_REGEX.findall(text):
+            extra_keywords.append(f"PAN:{pan}")
+    for aadhaar in aadhaars:
         extra_keywords.append(f"Aadhaar:{aadhaar}")
 
+    # One keyword scan for the whole message (shared with detect_scam)
+    indicators = scan_indicators(text)
+
     # MPIN Logic
-    lower_text = text.lower()
     for num in raw_mpin_list:
         if len(num) == 4 and (num.startswith("19") or num.startswith("20")):
             continue
         if len(num) == 6:
             extra_keywords.append(f"Potential-OTP/PIN:{num}")
         elif len(num) == 4:
-            if any(w in lower_text for w in SENSITIVE_CONTEXT_WORDS):
+            if indicators.has(SENSITIVE):
                 extra_keywords.append(f"Potential-MPIN:{num}")
 
     # Crypto & Gift
-    for wallet in BTC_REGEX.findall(text):
-        extra_keywords.append(f"Crypto-BTC:{wallet}")
-    for wallet in ETH_REGEX.findall(text):
-        extra_keywords.append(f"Crypto-ETH:{wallet}")
-    for code in GIFT_CODE_REGEX.findall(text):
-        extra_keywords.append(f"GiftCard-Code:{code}")
+    if "1" in text or "3" in text:
+        for wallet in BTC_REGEX.findall(text):
+            extra_keywords.append(f"Crypto-BTC:{wallet}")
+    if "0x" in text:
+        for wallet in ETH_REGEX.findall(text):
+            extra_keywords.append(f"Crypto-ETH:{wallet}")
+    if "-" in text:
+        for code in GIFT_CODE_REGEX.findall(text):
+            extra_keywords.append(f"GiftCard-Code:{code}")
 
     # Keyword Mapping
-    for app in REMOTE_APPS:
-        if app in lower_text:
-            extra_keywords.append(f"App-Detected:{app}")
-    for brand in GIFT_BRANDS:
-        if brand in lower_text:
-            extra_keywords.append(f"Scam-Type:{brand}")
+    for app in indicators.found(REMOTE_APP):
+        extra_keywords.append(f"App-Detected:{app}")
+    for brand in indicators.found(GIFT_BRAND):
+        extra_keywords.append(f"Scam-Type:{brand}")
 
     # --- 3. CLEANING LOGIC (✅ FIXED) ---
-    normalized_phones = [re.sub(r"\D", "", p)[-10:] for p in phone_list]
+    # Every phone match ends in its 10 digits, so no re.sub needed
+    normalized_phones = [p[-10:] for p in phone_list]
     clean_bank_list = []
 
     for acc in raw_bank_list:
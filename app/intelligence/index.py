@@ -0,0 +1,60 @@
+# app/intelligence/index.py
+
+# The five lists of ExtractedIntelligence, in schema order
+INTEL_KEYS = ("bankAccounts", "upiIds", "phishingLinks", "phoneNumbers", "suspiciousKeywords")
+
+
+def empty_intelligence():
+    return {key: [] for key in INTEL_KEYS}
+
+
+class IntelligenceIndex:
+    """
+    O(1) dedup over a session's collected intelligence.
+
+    State lives in two plain (JSON-friendly) session fields:
+    - session["intelligence"]:   key -> [values]            insertion order, Guvi shape
+    - session["intelFirstSeen"]: key -> {value: msg_index}   membership + provenance
+    The index is a thin accessor; build one per request, it holds no extra data.
+    """
+
+    def __init__(self, session):
+        self.lists = session.setdefault("intelligence", empty_intelligence())
+        self.first_seen = session.get("intelFirstSeen")
+        if self.first_seen is None or self.first_seen.keys() != self.lists.keys():
+            # Older/partial session: rebuild membership from the lists (provenance unknown)
+            self.first_seen = {
+                key: dict.fromkeys(values) for key, values in self.lists.items()
+            }
+            session["intelFirstSeen"] = self.first_seen
+
+    def add(self, key, value, message_index=None):
+        """Adds one indicator. Returns True if it was new."""
+        seen = self.first_seen.get(key)
+        if seen is None or value in seen:
+            return False
+        seen[value] = message_index
+        self.lists[key].append(value)
+        return True
+
+    def merge(self, intel, message_index=None):
+        """
+        Merges an extract_intelligence() result. Keys the session doesn't track
+        are ignored. Returns [(key, value), ...] for the indicators that were new.
+        """
+        added = []
+        for key, values in intel.items():
+            if key not in self.first_seen:
+                continue
+            for value in values:
+                if self.add(key, value, message_index):
+                    added.append((key, value))
+        return added
+
+    def first_seen_at(self, key, value):
+        """Index into session["messages"] where the indicator first appeared (None if unknown)."""
+        return self.first_seen.get(key, {}).get(value)
+
+    def snapshot(self):
+        """Copy in the ExtractedIntelligence list shape (safe to hand to the callback)."""
+        return {key: list(values) for key, values in self.lists.items()}
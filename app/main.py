@@ -2,15 +2,29 @@ from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-import logging
+from contextlib import asynccontextmanager
 
 from app.api.routes import router as honeypot_router
+from app.core.session import session_store
+from app.core.session_backends import SessionBackendError
+from app.callback.guvi_client import outbox
+from app.core.config import LOG_BODY_MAX_BYTES
+from app.core.log import get_logger
 
-# 1. Setup Logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger("uvicorn.error")
+# 1. Setup Logging (queue-based JSON logger, see app/core/log.py)
+logger = get_logger("api")
 
-app = FastAPI(title="Agentic Honeypot")
+# 🔄 Background jobs live as long as the app
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    session_store.start_sweeper()
+    outbox.start()
+    yield
+    await session_store.stop_sweeper()
+    await outbox.stop()
+    await session_store.close()
+
+app = FastAPI(title="Agentic Honeypot", lifespan=lifespan)
 
 # 2. Add CORS
 app.add_middleware(
@@ -24,12 +38,17 @@ app.add_middleware(
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     error_details = exc.errors()
-    logger.error(f"❌ VALIDATION ERROR: {error_details}")
+    # Without "input": that is the (possibly huge) body again
+    summary = [{k: e.get(k) for k in ("type", "loc", "msg")} for e in error_details]
+    logger.error(f"❌ VALIDATION ERROR: {str(summary)[:LOG_BODY_MAX_BYTES]}")
     
+    # Raw bytes (already buffered by FastAPI), capped: no re-parse, no huge log lines
     try:
-        body = await request.json()
-        logger.error(f"📩 RECEIVED BODY: {body}")
-    except:
+        body = await request.body()
+        shown = body[:LOG_BODY_MAX_BYTES].decode("utf-8", errors="replace")
+        more = f" ... (+{len(body) - LOG_BODY_MAX_BYTES} bytes)" if len(body) > LOG_BODY_MAX_BYTES else ""
+        logger.error(f"📩 RECEIVED BODY: {shown}{more}")
+    except Exception:
         logger.error("Could not read body")
 
     return JSONResponse(
@@ -37,6 +56,12 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         content={"detail": error_details, "body": "Check logs for details"},
     )
 
+# Shared session store unreachable: retryable, and never answered as a brand-new session
+@app.exception_handler(SessionBackendError)
+async def session_backend_exception_handler(request: Request, exc: SessionBackendError):
+    logger.error(f"❌ SESSION BACKEND: {exc}")
+    return JSONResponse(status_code=503, content={"detail": "Session store unavailable, retry later"})
+
 # 4. Include Router
 # ✅ FIX: Use the imported router object directly
 app.include_router(honeypot_router)
@@ -110,4 +110,49 @@ class HoneypotResponse(BaseModel):
     reply: str = Field(
         ..., 
         description="The AI Agent's response text"
-    )
\ No newline at end of file
+    )
+
+# --- BATCH (/honeypot/batch) ---
+class HoneypotBatchRequest(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
+    # Raw values on purpose (not even dicts): each item is validated on its
+    # own, so one bad item fails alone instead of rejecting the whole batch with a 422
+    items: List[Any] = Field(
+        ...,
+        description="HoneypotRequest objects, in arrival order."
+    )
+
+class BatchItemResult(BaseModel):
+    index: int = Field(
+        ...,
+        description="Position of the item in the request."
+    )
+    sessionId: Optional[str] = Field(
+        default=None,
+        description="Session of the item (missing if the item was invalid)."
+    )
+    status: str = Field(
+        ...,
+        description="'success' or 'error'"
+    )
+    reply: Optional[str] = Field(
+        default=None,
+        description="The AI Agent's response text (on success)."
+    )
+    error: Optional[str] = Field(
+        default=None,
+        description="Why the item failed (on error)."
+    )
+
+class HoneypotBatchResponse(BaseModel):
+    status: str = Field(
+        ...,
+        description="'success' if every item succeeded, else 'partial'"
+    )
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult] = Field(
+        ...,
+        description="One result per item, in request order."
+    )
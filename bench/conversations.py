@@ -0,0 +1,116 @@
+# bench/conversations.py
+import json
+import random
+
+# 🎭 Synthetic scam scripts. Each turn is a template filled from the
+# generators below, so every conversation carries different intel
+# (and repeated runs with the same seed are identical).
+SCRIPTS = {
+    "kyc": [
+        "Dear customer your {bank} account will be BLOCKED today. Verify KYC immediately.",
+        "Sir this is urgent, click {link} and update your PAN details.",
+        "Send Rs {amount} verification fee to {upi} or account will be suspended.",
+        "Call our officer on {phone} now, share the OTP you received.",
+        "Why are you delaying? Transfer to account {account} IFSC SBIN0001234.",
+    ],
+    "lottery": [
+        "Congratulations! You won Rs {amount} in the KBC lucky draw.",
+        "To claim the prize pay processing charge to {upi}.",
+        "Contact our manager on WhatsApp {phone} for the release.",
+        "Last chance, fill the form at {link} before 6 PM.",
+    ],
+    "crypto": [
+        "Hello, I am an investment advisor. Bitcoin is giving 300% returns this month.",
+        "Install AnyDesk so I can set up your trading wallet.",
+        "Deposit {amount} USDT to wallet 0x{wallet} to start.",
+        "Your profit is ready, pay the withdrawal tax to {upi}.",
+    ],
+    "giftcard": [
+        "This is your boss. I am in a meeting, need a favour urgently.",
+        "Buy 5 Amazon gift cards of Rs {amount} each and send me the codes.",
+        "Scratch the back and send photos to {phone}, hurry.",
+    ],
+    "refund": [
+        "Your electricity bill payment failed, connection will be cut tonight.",
+        "Download the app from {link} to get the refund of Rs {amount}.",
+        "Enter your card number and CVV in the app, then share the OTP.",
+        "Or pay the pending amount to {upi} and send screenshot to {phone}.",
+    ],
+}
+
+# Benign openers: exercise the "not a scam" path of the detector
+BENIGN = [
+    ["Hi grandpa, are we still meeting for lunch on Sunday?", "I will bring the kids along."],
+    ["Your order #{amount} has been shipped and will arrive tomorrow.", "Thank you for shopping with us."],
+    ["Reminder: your doctor's appointment is at 10 AM on Monday."],
+]
+
+ARTHUR_LINES = [
+    "Oh dear, which button do I press?",
+    "Wait, let me find my glasses.",
+    "Is this the bank? My son usually handles this.",
+    "I am trying, the screen went dark.",
+]
+
+_BANKS = ["SBI", "HDFC", "ICICI", "Axis", "PNB"]
+_HANDLES = ["ybl", "okaxis", "paytm", "oksbi", "ibl"]
+
+
+def _fill(template, rng):
+    return template.format(
+        bank=rng.choice(_BANKS),
+        link=f"http://{rng.choice(['kyc', 'verify', 'claim', 'refund'])}-{rng.randint(100, 999)}.{rng.choice(['xyz', 'top', 'in'])}/login",
+        amount=rng.choice([499, 1999, 5000, 25000, 100000]),
+        upi=f"{rng.choice(['help', 'support', 'claim', 'pay'])}{rng.randint(10, 9999)}@{rng.choice(_HANDLES)}",
+        phone=f"+91-9{rng.randint(100000000, 999999999)}",
+        account=str(rng.randint(10**11, 10**15)),
+        wallet="".join(rng.choice("0123456789abcdef") for _ in range(40)),
+    )
+
+
+def synthetic_conversations(count, seed=7, history_share=0.3, benign_share=0.1):
+    """
+    `count` conversations: {"channel", "history": [Message dicts], "turns": [texts]}.
+    `history_share` of them start with a conversationHistory bootstrap (we
+    join a conversation the platform already had), `benign_share` aren't scams.
+    """
+    rng = random.Random(seed)
+    conversations = []
+    for _ in range(count):
+        if rng.random() < benign_share:
+            script = rng.choice(BENIGN)
+        else:
+            script = SCRIPTS[rng.choice(sorted(SCRIPTS))]
+        texts = [_fill(t, rng) for t in script]
+
+        history = []
+        if len(texts) > 2 and rng.random() < history_share:
+            split = rng.randint(1, len(texts) - 2)
+            for i, text in enumerate(texts[:split]):
+                history.append({"sender": "scammer", "text": text, "timestamp": i * 2})
+                history.append({"sender": "user", "text": rng.choice(ARTHUR_LINES), "timestamp": i * 2 + 1})
+            texts = texts[split:]
+
+        conversations.append({
+            "channel": rng.choice(["SMS", "WhatsApp"]),
+            "history": history,
+            "turns": texts,
+        })
+    return conversations
+
+
+def load_conversations(path):
+    """Recorded conversations, one JSON object per line (same shape as above)."""
+    conversations = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            conversations.append({
+                "channel": item.get("channel", "SMS"),
+                "history": item.get("history", []),
+                "turns": item["turns"],
+            })
+    return conversations
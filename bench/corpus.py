@@ -0,0 +1,133 @@
+# bench/corpus.py
+import random
+import string
+
+# 🧪 Deterministic synthetic corpus for the CPU-bound stages (extractor,
+# keyword detector). Same seed -> byte-identical corpus, so numbers from
+# different commits are comparable.
+
+_HANDLES = ["ybl", "okaxis", "oksbi", "okhdfcbank", "paytm", "ibl", "axl", "upi"]
+_BANK_CODES = ["SBIN", "HDFC", "ICIC", "UTIB", "PUNB", "KKBK"]
+_GIFT_BRANDS = ["Amazon gift card", "Google Play card", "iTunes card", "Steam card", "Flipkart voucher"]
+_REMOTE_APPS = ["AnyDesk", "TeamViewer", "QuickSupport", "RustDesk"]
+_SCAM_LINES = [
+    "Your account will be blocked today, verify KYC immediately",
+    "Congratulations you won a lottery prize, pay the processing fee",
+    "Share the OTP to cancel the transaction",
+    "Electricity connection will be disconnected tonight, pay now",
+    "Refund is pending, enter your CVV in the form",
+    "Urgent: your PAN card is suspended",
+]
+_BENIGN_LINES = [
+    "Are we still meeting for lunch on Sunday?",
+    "The parcel was delivered to the front desk.",
+    "Please bring the documents to the office tomorrow.",
+    "Happy birthday! Have a wonderful year ahead.",
+    "Meeting moved to 4 PM, room 2B.",
+]
+
+
+def _digits(rng, n, first="123456789"):
+    return rng.choice(first) + "".join(rng.choice(string.digits) for _ in range(n - 1))
+
+
+def phone(rng):
+    number = _digits(rng, 10, first="6789")
+    return rng.choice([
+        number,
+        f"+91{number}",
+        f"+91-{number}",
+        f"+91 {number}",
+        f"0{number}",
+        f"{number[:5]} {number[5:]}",
+    ])
+
+
+def upi(rng):
+    name = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 12)))
+    return f"{name}{rng.choice(['', '.', '_'])}{rng.randint(0, 999)}@{rng.choice(_HANDLES)}"
+
+
+def account(rng):
+    return _digits(rng, rng.randint(9, 18))
+
+
+def ifsc(rng):
+    return rng.choice(_BANK_CODES) + "0" + "".join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(6))
+
+
+def pan(rng):
+    letters = string.ascii_uppercase
+    return "".join(rng.choice(letters) for _ in range(5)) + _digits(rng, 4) + rng.choice(letters)
+
+
+def aadhaar(rng):
+    number = _digits(rng, 12, first="23456789")
+    return rng.choice([number, f"{number[:4]} {number[4:8]} {number[8:]}"])
+
+
+def wallet(rng):
+    if rng.random() < 0.5:
+        return "0x" + "".join(rng.choice("0123456789abcdefABCDEF") for _ in range(40))
+    alphabet = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+    return rng.choice(["1", "3", "bc1"]) + "".join(rng.choice(alphabet) for _ in range(rng.randint(25, 39)))
+
+
+def gift_code(rng):
+    chars = string.ascii_uppercase + string.digits
+    return "-".join("".join(rng.choice(chars) for _ in range(4)) for _ in range(4))
+
+
+def link(rng):
+    host = f"{rng.choice(['kyc', 'secure', 'verify', 'claim'])}-{rng.randint(1, 999)}.{rng.choice(['xyz', 'top', 'in', 'com'])}"
+    return rng.choice(["http://", "https://", "www."]) + host + rng.choice(["", "/login", "/pay?id=" + _digits(rng, 6)])
+
+
+def scam_message(rng):
+    parts = [rng.choice(_SCAM_LINES)]
+    for make, label in (
+        (phone, "Call"), (upi, "Pay to"), (account, "A/c"), (ifsc, "IFSC"), (pan, "PAN"),
+        (aadhaar, "Aadhaar"), (wallet, "Wallet"), (gift_code, "Code"), (link, "Visit"),
+    ):
+        if rng.random() < 0.3:
+            parts.append(f"{label} {make(rng)}")
+    if rng.random() < 0.2:
+        parts.append(f"Buy {rng.choice(_GIFT_BRANDS)} of Rs {rng.randint(1, 50) * 500}")
+    if rng.random() < 0.2:
+        parts.append(f"Install {rng.choice(_REMOTE_APPS)} and share the code")
+    return rng.choice([". ", ", ", "\n", " "]).join(parts)
+
+
+def benign_message(rng):
+    return rng.choice(_BENIGN_LINES) + (f" Order #{_digits(rng, 6)}" if rng.random() < 0.3 else "")
+
+
+def blob(rng, size):
+    """A long pasted blob (forwarded chat, SMS dump, log) of about `size` bytes."""
+    chunks = []
+    total = 0
+    while total < size:
+        line = rng.choice([scam_message, benign_message, benign_message])(rng)
+        if rng.random() < 0.1:
+            line += " " + "".join(rng.choice(string.printable[:94]) for _ in range(rng.randint(20, 120)))
+        chunks.append(line)
+        total += len(line) + 1
+    return "\n".join(chunks)[:size]
+
+
+def generate_corpus(count=2000, seed=1337, blob_share=0.02, max_blob=100_000):
+    """
+    `count` messages, about 70% scam / 28% benign / `blob_share` long blobs
+    (1 KB .. `max_blob` bytes). Returns a list of (kind, text).
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < blob_share:
+            corpus.append(("blob", blob(rng, rng.randint(1_000, max_blob))))
+        elif roll < 0.72:
+            corpus.append(("scam", scam_message(rng)))
+        else:
+            corpus.append(("benign", benign_message(rng)))
+    return corpus
@@ -0,0 +1,39 @@
+# bench/fake_callback.py
+# Local stand-in for the Guvi report endpoint.
+# Point the app at it with GUVI_ENDPOINT=http://127.0.0.1:<port>/report
+# Run alone:  uvicorn bench.fake_callback:app --port 8766
+import asyncio
+import os
+import random
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+settings = {
+    "latency": float(os.getenv("FAKE_CALLBACK_LATENCY", "0.05")),
+    "error_rate": float(os.getenv("FAKE_CALLBACK_ERROR_RATE", "0.0")),
+}
+stats = {"received": 0, "errors": 0, "sessions": set()}
+
+app = FastAPI(title="Fake Guvi callback")
+
+
+@app.post("/report")
+async def receive_report(request: Request):
+    payload = await request.json()
+    await asyncio.sleep(settings["latency"])
+    if settings["error_rate"] and random.random() < settings["error_rate"]:
+        stats["errors"] += 1
+        return JSONResponse({"error": "injected failure"}, status_code=503)
+    stats["received"] += 1
+    stats["sessions"].add(payload.get("sessionId"))
+    return {"status": "ok"}
+
+
+def summary():
+    return {"received": stats["received"], "errors": stats["errors"], "sessions": len(stats["sessions"])}
+
+
+@app.get("/stats")
+async def get_stats():
+    return {"settings": settings, **summary()}
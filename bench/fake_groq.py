@@ -0,0 +1,108 @@
+# bench/fake_groq.py
+# Local stand-in for the Groq (OpenAI-compatible) chat API.
+# Point the app at it with GROQ_BASE_URL=http://127.0.0.1:<port>
+# Run alone:  uvicorn bench.fake_groq:app --port 8765
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# ⚙️ Behaviour (env defaults, the replay harness overrides them in-process)
+settings = {
+    "latency": float(os.getenv("FAKE_GROQ_LATENCY", "0.25")),        # mean seconds per call
+    "jitter": float(os.getenv("FAKE_GROQ_JITTER", "0.3")),           # +/- share of latency
+    "error_rate": float(os.getenv("FAKE_GROQ_ERROR_RATE", "0.0")),   # share of calls that fail
+    "error_status": int(os.getenv("FAKE_GROQ_ERROR_STATUS", "429")),  # 429 / 500 / 503 ...
+    "chunk_delay": float(os.getenv("FAKE_GROQ_CHUNK_DELAY", "0.01")),  # streaming, per chunk
+}
+stats = {"calls": 0, "errors": 0, "streams": 0}
+
+_SCAM_WORDS = ("kyc", "blocked", "otp", "prize", "lottery", "upi", "bitcoin", "usdt",
+               "gift card", "anydesk", "refund", "urgent", "verify", "cvv", "fee")
+
+_ARTHUR_REPLIES = [
+    "Oh dear, which button do I press? I am trying now.",
+    "Wait beta, my glasses are in the other room. Which number did you say?",
+    "The app is asking me something in English, what should I type?",
+    "I sent it I think... or did it go to my grandson? Can you check?",
+    "My son handles the bank things. Can you tell me the account again, slowly?",
+]
+
+_RATE_HEADERS = {
+    "x-ratelimit-remaining-requests": "14000",
+    "x-ratelimit-limit-requests": "14400",
+    "x-ratelimit-remaining-tokens": "5900",
+    "x-ratelimit-limit-tokens": "6000",
+    "x-ratelimit-reset-requests": "6s",
+    "x-ratelimit-reset-tokens": "1.5s",
+}
+
+app = FastAPI(title="Fake Groq")
+
+
+def _answer(messages):
+    """Plausible content for the three kinds of prompts the app sends."""
+    system = messages[0]["content"] if messages else ""
+    user = messages[-1]["content"] if messages else ""
+    if "scam detector" in system:
+        return "TRUE" if any(w in user.lower() for w in _SCAM_WORDS) else "FALSE"
+    if "Prompt Engineer" in system:
+        return "Act confused about the app and ask them to repeat the payment details slowly."
+    # Stable per prompt, so the reply cache behaves as it would on real traffic
+    digest = int(hashlib.md5(user.encode("utf-8")).hexdigest(), 16)
+    return "Arthur: " + _ARTHUR_REPLIES[digest % len(_ARTHUR_REPLIES)]
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["calls"] += 1
+
+    if settings["error_rate"] and random.random() < settings["error_rate"]:
+        stats["errors"] += 1
+        return JSONResponse(
+            {"error": {"message": "injected failure", "type": "fake_groq"}},
+            status_code=settings["error_status"],
+            headers={"retry-after": "1"},
+        )
+
+    jitter = settings["jitter"]
+    await asyncio.sleep(max(0.0, settings["latency"] * random.uniform(1 - jitter, 1 + jitter)))
+
+    text = _answer(body.get("messages", []))
+    model = body.get("model", "fake")
+    if body.get("stream"):
+        stats["streams"] += 1
+
+        async def chunks():
+            for i in range(0, len(text), 8):
+                delta = {"index": 0, "delta": {"content": text[i:i + 8]}, "finish_reason": None}
+                chunk = {"id": "fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": [delta]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(settings["chunk_delay"])
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream", headers=_RATE_HEADERS)
+
+    return JSONResponse(
+        {
+            "id": "fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        },
+        headers=_RATE_HEADERS,
+    )
+
+
+@app.get("/stats")
+async def get_stats():
+    return {"settings": settings, **stats}
@@ -0,0 +1,245 @@
+# bench/micro.py
+"""
+🔬 Microbenchmarks for the CPU-bound stages we fully control.
+
+    extract   extract_intelligence(text)
+    detect    detect_scam(text), LLM stubbed (no network, instant "FALSE")
+    report    IntelligenceIndex.merge(extract(...)) + build_report(session),
+              i.e. the per-turn intel merge and the agent-notes/report build
+
+    python -m bench.micro                                   # print results
+    python -m bench.micro --save-baseline bench/micro_baseline.json
+    python -m bench.micro --baseline bench/micro_baseline.json --threshold 0.25
+
+Each benchmark runs over a deterministic corpus (bench/corpus.py). Reported:
+per-message latency (p50/p95/p99/max in µs) and throughput (MB/s, msgs/s),
+each from the best of --repeat passes (noise only ever adds time), and memory (tracemalloc peak +
+retained, in a separate pass so tracing doesn't skew the timings). With --baseline, exits 1 if p95 latency or peak
+memory grow, or MB/s drops, by more than --threshold.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+# Import-time config: no real keys
+os.environ.setdefault("GROQ_API_KEY", "bench-stub")
+
+from app.callback.guvi_client import build_report
+from app.core.session import new_session
+from app.core.indicators import scan_indicators
+from app.detection import scam_detector
+from app.intelligence.extractor import extract_intelligence
+from app.intelligence.index import IntelligenceIndex
+from bench.corpus import generate_corpus
+
+MESSAGES_PER_SESSION = 20
+
+
+async def _stub_generate(*args, **kwargs):
+    return "FALSE"
+
+
+def _percentile(sorted_values, pct):
+    rank = max(1, min(len(sorted_values), round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+
+# --- Benchmarks: each returns a runner(texts, timings) that does one pass ---
+
+def bench_extract():
+    def run(texts, timings):
+        clock = time.perf_counter_ns
+        for text in texts:
+            t = clock()
+            extract_intelligence(text)
+            timings.append(clock() - t)
+    return run
+
+
+def bench_detect():
+    scam_detector.llm.generate = _stub_generate
+
+    def run(texts, timings):
+        async def go():
+            clock = time.perf_counter_ns
+            for text in texts:
+                t = clock()
+                await scam_detector.detect_scam(text)
+                timings.append(clock() - t)
+        asyncio.run(go())
+    return run
+
+
+def bench_report():
+    def run(texts, timings):
+        clock = time.perf_counter_ns
+        session = None
+        for i, text in enumerate(texts):
+            if i % MESSAGES_PER_SESSION == 0:
+                session = new_session(f"bench-{i}")
+                session["scamDetected"] = True
+            t = clock()
+            session["messages"].append({"sender": "scammer", "text": text, "timestamp": i})
+            session["messageCount"] += 1
+            IntelligenceIndex(session).merge(extract_intelligence(text), len(session["messages"]) - 1)
+            build_report(session)
+            timings.append(clock() - t)
+    return run
+
+
+BENCHMARKS = {"extract": bench_extract, "detect": bench_detect, "report": bench_report}
+
+
+def _latency(timings):
+    timings = sorted(timings)
+    return {
+        "p50": _percentile(timings, 50) / 1000,
+        "p95": _percentile(timings, 95) / 1000,
+        "p99": _percentile(timings, 99) / 1000,
+        "max": timings[-1] / 1000,
+    }
+
+
+def _cold_caches():
+    # Each text is seen once per pass, as in production: no per-text cache
+    # hits carried over from the previous pass (scan cache, LLM verdicts)
+    scan_indicators.cache_clear()
+    scam_detector.verdict_cache.clear()
+
+
+def measure(run, texts, repeat):
+    total_bytes = sum(len(t.encode("utf-8")) for t in texts)
+    run(texts, [])  # Warm-up (compiled regexes, lazy imports)
+
+    passes, pass_seconds = [], []
+    for _ in range(repeat):
+        _cold_caches()
+        gc.collect()  # Don't bill this pass for the previous pass's garbage
+        pass_timings = []
+        run(texts, pass_timings)
+        pass_seconds.append(sum(pass_timings) / 1e9)
+        passes.append(_latency(pass_timings))
+
+    _cold_caches()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    run(texts, [])
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Best pass, like timeit: a busy machine slows passes down, never speeds them up
+    seconds = min(pass_seconds)
+    return {
+        "messages": len(texts),
+        "bytes": total_bytes,
+        "latencyUs": {
+            stat: round(min(p[stat] for p in passes), 2) for stat in ("p50", "p95", "p99", "max")
+        },
+        "mbPerSecond": round(total_bytes / seconds / 1e6, 3) if seconds else 0.0,
+        "messagesPerSecond": round(len(texts) / seconds, 1) if seconds else 0.0,
+        "memory": {
+            "peakKB": round((peak - before) / 1024, 1),
+            "retainedKB": round((after - before) / 1024, 1),
+        },
+    }
+
+
+def run_suite(names, corpus, repeat):
+    texts = [text for _, text in corpus]
+    blobs = [text for kind, text in corpus if kind == "blob"]
+    results = {}
+    for name in names:
+        results[name] = measure(BENCHMARKS[name](), texts, repeat)
+        if blobs:
+            # Long pastes on their own: where a super-linear regex would show up first
+            results[f"{name}.blobs"] = measure(BENCHMARKS[name](), blobs, repeat)
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        checks = [
+            ("p95 µs", base["latencyUs"]["p95"], result["latencyUs"]["p95"], True),
+            ("MB/s", base["mbPerSecond"], result["mbPerSecond"], False),
+            ("peak KB", base["memory"]["peakKB"], result["memory"]["peakKB"], True),
+        ]
+        for label, old, new, lower_is_better in checks:
+            if old <= 0:
+                continue
+            change = (new - old) / old
+            if (change > threshold) if lower_is_better else (change < -threshold):
+                regressions.append(f"{name} {label}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def print_results(results):
+    print(f"{'benchmark':<15} {'msgs':>6} {'p50µs':>9} {'p95µs':>9} {'p99µs':>9} {'maxµs':>10} "
+          f"{'MB/s':>8} {'msg/s':>10} {'peakKB':>9}")
+    for name, r in results.items():
+        lat = r["latencyUs"]
+        print(f"{name:<15} {r['messages']:>6} {lat['p50']:>9.2f} {lat['p95']:>9.2f} {lat['p99']:>9.2f} "
+              f"{lat['max']:>10.2f} {r['mbPerSecond']:>8.2f} {r['messagesPerSecond']:>10.1f} "
+              f"{r['memory']['peakKB']:>9.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extractor / detector microbenchmarks")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="Comma separated: extract,detect,report")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1337)
+    parser.add_argument("--max-blob", type=int, default=100_000, help="Largest pasted blob (bytes)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="Write results JSON here")
+    parser.add_argument("--save-baseline", help="Write results as the new baseline")
+    parser.add_argument("--baseline", help="Compare against this baseline, exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative change vs baseline")
+    args = parser.parse_args(argv)
+
+    names = [n.strip() for n in args.only.split(",") if n.strip()]
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    corpus = generate_corpus(args.messages, seed=args.seed, max_blob=args.max_blob)
+    results = run_suite(names, corpus, args.repeat)
+    print_results(results)
+
+    report = {
+        "createdAt": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "config": {"messages": args.messages, "seed": args.seed, "maxBlob": args.max_blob, "repeat": args.repeat},
+        "results": results,
+    }
+    for path in (args.out, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"💾 Saved {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print(f"⚠️ Baseline was recorded with {baseline.get('config')}, comparing anyway")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) vs {args.baseline}:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print(f"\n✅ No regressions vs {args.baseline} (threshold {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+# bench/replay.py
+"""
+🏁 Offline end-to-end benchmark.
+
+Replays multi-turn scam conversations against the real FastAPI app with
+Groq and the Guvi callback replaced by local stand-ins, so it costs no
+quota and reports nothing to the live endpoint.
+
+    python -m bench.replay                                  # synthetic, 1/8/32/64
+    python -m bench.replay --file recorded.jsonl --concurrency 4,16
+    python -m bench.replay --save-baseline bench/baseline.json
+    python -m bench.replay --baseline bench/baseline.json   # exit 1 on regression
+
+Per concurrency level it prints requests/sec and p50/p95/p99 for the whole
+request and for each pipeline stage (from the app's Server-Timing header).
+Levels run in order in one process with fresh session ids. Reply, verdict
+and prompt caches are emptied before each level so levels are comparable
+(--warm keeps them, like a long-running server).
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from bench import fake_callback, fake_groq
+from bench.conversations import load_conversations, synthetic_conversations
+
+STAGES = ("prepare", "reply", "finish", "pacing")
+API_KEY = "bench-secret"
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app, port):
+    """Runs a stand-in on its own thread + event loop (its sleeps don't touch the app's loop)."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"Stand-in server on port {port} failed to start")
+        time.sleep(0.01)
+    return server, thread
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "mean": round(sum(values) / len(values), 2) if values else 0.0,
+    }
+
+
+def parse_server_timing(header):
+    """'prepare;dur=1.20, reply;dur=50.1' -> {"prepare": 1.2, "reply": 50.1} (ms)."""
+    stages = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "dur":
+                try:
+                    stages[name] = float(value)
+                except ValueError:
+                    pass
+    return stages
+
+
+async def play_conversation(client, conversation, session_id, samples):
+    """One conversation, turn by turn (the way a scammer would send it)."""
+    history = list(conversation["history"])
+    timestamp = len(history)
+    for text in conversation["turns"]:
+        payload = {
+            "sessionId": session_id,
+            "message": {"sender": "scammer", "text": text, "timestamp": timestamp},
+            "conversationHistory": history,
+            "metadata": {"channel": conversation["channel"], "language": "English", "locale": "IN"},
+        }
+        started = time.perf_counter()
+        try:
+            response = await client.post("/honeypot", json=payload, headers={"x-api-key": API_KEY})
+            ok = response.status_code == 200
+        except Exception as e:
+            print(f"⚠️ Request failed: {e}")
+            response, ok = None, False
+        elapsed = (time.perf_counter() - started) * 1000
+        samples.append({
+            "ok": ok,
+            "total": elapsed,
+            "stages": parse_server_timing(response.headers.get("server-timing")) if ok else {},
+        })
+        if not ok:
+            return  # A conversation doesn't go on after the honeypot failed on it
+
+        # The platform sends the full history on every turn
+        history.append(payload["message"])
+        history.append({"sender": "user", "text": response.json()["reply"], "timestamp": timestamp + 1})
+        timestamp += 2
+
+
+async def run_level(client, conversations, concurrency, label):
+    samples = []
+    queue = asyncio.Queue()
+    for i, conversation in enumerate(conversations):
+        queue.put_nowait((f"{label}-{i}", conversation))
+
+    async def worker():
+        while True:
+            try:
+                session_id, conversation = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await play_conversation(client, conversation, session_id, samples)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - started
+
+    ok = [s for s in samples if s["ok"]]
+    return {
+        "concurrency": concurrency,
+        "conversations": len(conversations),
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "seconds": round(seconds, 3),
+        "rps": round(len(samples) / seconds, 2) if seconds else 0.0,
+        "latencyMs": {
+            "total": summarize([s["total"] for s in ok]),
+            **{stage: summarize([s["stages"].get(stage, 0.0) for s in ok]) for stage in STAGES},
+        },
+    }
+
+
+def reset_caches():
+    from app.agent.prompts import speculative_prompts
+    from app.agent.reply_cache import reply_cache
+    from app.detection.scam_detector import verdict_cache
+
+    for cache in (reply_cache.cache, verdict_cache, speculative_prompts):
+        cache.clear()
+
+
+async def run_benchmark(app, conversations, levels, warm=False):
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    # The app's own lifespan: session sweeper + callback outbox
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60.0) as client:
+            for concurrency in levels:
+                if not warm:
+                    reset_caches()
+                result = await run_level(client, conversations, concurrency, f"c{concurrency}")
+                results.append(result)
+                print_level(result)
+            debug = {}
+            for name in ("admission", "reply-cache", "pacing", "callbacks", "llm-providers"):
+                response = await client.get(f"/debug/{name}")
+                debug[name] = response.json() if response.status_code == 200 else None
+    return results, debug
+
+
+def print_level(result):
+    latency = result["latencyMs"]
+    print(
+        f"\n🏁 concurrency={result['concurrency']:<4} requests={result['requests']:<6} "
+        f"errors={result['errors']:<4} rps={result['rps']:<8} ({result['seconds']}s)"
+    )
+    print(f"   {'stage':<8} {'p50':>9} {'p95':>9} {'p99':>9}   (ms)")
+    for stage in ("total",) + STAGES:
+        s = latency[stage]
+        print(f"   {stage:<8} {s['p50']:>9.2f} {s['p95']:>9.2f} {s['p99']:>9.2f}")
+
+
+def compare(results, baseline, tolerance):
+    """Regressions vs a saved baseline: p95 up or rps down by more than `tolerance`."""
+    base_levels = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    regressions = []
+    for level in results:
+        base = base_levels.get(level["concurrency"])
+        if base is None:
+            continue
+        checks = [("rps", base["rps"], level["rps"], False)]
+        for stage in ("total",) + STAGES:
+            checks.append((f"{stage}.p95", base["latencyMs"][stage]["p95"], level["latencyMs"][stage]["p95"], True))
+        for name, old, new, lower_is_better in checks:
+            if old <= 0:
+                continue
+            change = (new - old) / old
+            worse = change > tolerance if lower_is_better else change < -tolerance
+            # Stages under a millisecond are noise, not regressions
+            if worse and not (lower_is_better and new < 1.0):
+                regressions.append(f"c={level['concurrency']} {name}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end honeypot benchmark")
+    parser.add_argument("--file", help="Recorded conversations (JSONL: {channel, history, turns})")
+    parser.add_argument("--conversations", type=int, default=100, help="Synthetic conversations per level")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--concurrency", default="1,8,32,64", help="Comma separated levels")
+    parser.add_argument("--keys", type=int, default=4, help="Fake Groq keys in the pool")
+    parser.add_argument("--groq-latency", type=float, default=0.25)
+    parser.add_argument("--groq-jitter", type=float, default=0.3)
+    parser.add_argument("--groq-error-rate", type=float, default=0.0)
+    parser.add_argument("--groq-error-status", type=int, default=429)
+    parser.add_argument("--callback-latency", type=float, default=0.05)
+    parser.add_argument("--callback-error-rate", type=float, default=0.0)
+    parser.add_argument("--provider", default="groq", choices=["groq", "local"],
+                        help="groq = fake Groq server; local = offline template provider (no network at all)")
+    parser.add_argument("--pacing", action="store_true", help="Keep human-pace delays on (off by default)")
+    parser.add_argument("--warm", action="store_true", help="Keep caches warm across levels")
+    parser.add_argument("--out", help="Write the full results JSON here")
+    parser.add_argument("--save-baseline", help="Write results as the new baseline")
+    parser.add_argument("--baseline", help="Compare against this baseline, exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative change vs baseline")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    conversations = (
+        load_conversations(args.file) if args.file
+        else synthetic_conversations(args.conversations, seed=args.seed)
+    )
+
+    # 1. Stand-ins
+    fake_groq.settings.update(latency=args.groq_latency, jitter=args.groq_jitter,
+                              error_rate=args.groq_error_rate, error_status=args.groq_error_status)
+    fake_callback.settings.update(latency=args.callback_latency, error_rate=args.callback_error_rate)
+    groq_port, callback_port = _free_port(), _free_port()
+    servers = [start_server(fake_groq.app, groq_port), start_server(fake_callback.app, callback_port)]
+
+    # 2. Point the app at them (before it is imported: config is read at import)
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{groq_port}"
+    os.environ["GUVI_ENDPOINT"] = f"http://127.0.0.1:{callback_port}/report"
+    os.environ["MY_SECRET_KEY"] = API_KEY
+    for i in range(args.keys):
+        os.environ["GROQ_API_KEY" if i == 0 else f"GROQ_API_KEY{i + 1}"] = f"bench-key-{i + 1}"
+    os.environ["GEMINI_API_KEY"] = ""  # Never route a benchmark to the real Gemini from .env
+    os.environ["LLM_PROVIDER"] = args.provider
+    os.environ["SESSION_BACKEND"] = "memory"
+    os.environ.setdefault("GUVI_JOURNAL_ENABLED", "false")
+    os.environ["PACING_ENABLED"] = "true" if args.pacing else "false"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")  # Keep the app's INFO lines out of the results
+    from app.main import app
+
+    # 3. Replay
+    results, debug = asyncio.run(run_benchmark(app, conversations, levels, warm=args.warm))
+    for server, thread in servers:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+    report = {
+        "createdAt": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "save_baseline", "baseline")},
+        "levels": results,
+        "fakeGroq": dict(fake_groq.stats),
+        "fakeCallback": fake_callback.summary(),
+        "app": debug,
+    }
+    print(f"\n📮 Reports received: {report['fakeCallback']}  🤖 Groq calls: {report['fakeGroq']}")
+
+    for path in (args.out, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"💾 Saved {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) vs {args.baseline}:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print(f"\n✅ No regressions vs {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
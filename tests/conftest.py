@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import tempfile
+
+# Before any app import: files the app writes (journal, session DB) stay out of the repo
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="honeypot-tests-"))
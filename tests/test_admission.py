@@ -0,0 +1,96 @@
+# tests/test_admission.py
+import asyncio
+import time
+
+from app.core.admission import AdmissionController
+
+
+def test_admits_up_to_the_limit_then_sheds_on_full_queue():
+    async def run():
+        gate = AdmissionController(max_in_flight=2, max_queue=1, max_wait=1.0)
+        assert await gate.acquire() and await gate.acquire()
+        assert gate.saturated
+
+        waiter = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+        assert gate.stats()["waiting"] == 1
+        assert await gate.acquire() is False  # Queue full: shed at once
+        assert gate.shed["queue_full"] == 1
+
+        gate.release()
+        assert await waiter is True
+        assert gate.in_flight == 2
+        gate.release()
+        gate.release()
+        assert gate.in_flight == 0 and not gate.saturated
+
+    asyncio.run(run())
+
+
+def test_wait_times_out():
+    async def run():
+        gate = AdmissionController(max_in_flight=1, max_queue=4, max_wait=0.02)
+        assert await gate.acquire()
+        assert await gate.acquire() is False
+        assert gate.shed["wait_timeout"] == 1
+        assert gate.stats()["waiting"] == 0  # Timed-out waiter left the queue
+        gate.release()
+        assert gate.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_own_deadline_caps_the_wait():
+    async def run():
+        gate = AdmissionController(max_in_flight=1, max_queue=4, max_wait=10.0)
+        assert await gate.acquire()
+        started = time.monotonic()
+        assert await gate.acquire(deadline=time.monotonic() + 0.02) is False
+        assert time.monotonic() - started < 1.0
+        # Deadline already gone: shed without queueing
+        assert await gate.acquire(deadline=time.monotonic() - 1) is False
+        assert gate.shed["wait_timeout"] == 2
+
+    asyncio.run(run())
+
+
+def test_freed_slot_goes_to_the_next_waiter_in_order():
+    async def run():
+        gate = AdmissionController(max_in_flight=1, max_queue=4, max_wait=1.0)
+        assert await gate.acquire()
+        order = []
+
+        async def waiter(name):
+            assert await gate.acquire()
+            order.append(name)
+
+        tasks = [asyncio.create_task(waiter(name)) for name in ("a", "b")]
+        await asyncio.sleep(0)
+        # A newcomer can't jump the queue while others wait
+        late = asyncio.create_task(waiter("late"))
+        await asyncio.sleep(0)
+
+        for _ in range(3):
+            gate.release()  # Handed over directly: in_flight never drops
+            await asyncio.sleep(0)
+            assert gate.in_flight == 1
+        await asyncio.gather(*tasks, late)
+        assert order == ["a", "b", "late"]
+        gate.release()
+        assert gate.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def run():
+        gate = AdmissionController(max_in_flight=1, max_queue=4, max_wait=1.0)
+        assert await gate.acquire()
+        waiter = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        gate.release()
+        assert gate.in_flight == 0 and gate.stats()["waiting"] == 0
+
+    asyncio.run(run())
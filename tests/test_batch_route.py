@@ -0,0 +1,78 @@
+# tests/test_batch_route.py
+import asyncio
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import routes
+from app.main import app
+
+API_KEY = "test-key"
+
+
+def item(session_id, text):
+    return {"sessionId": session_id, "message": {"sender": "scammer", "text": text, "timestamp": 0}}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("MY_SECRET_KEY", API_KEY)
+    seen = []
+
+    async def generate_agent_reply(session, deadline=None):
+        # Finish out of order on purpose: results must still come back in request order
+        await asyncio.sleep(random.uniform(0, 0.02))
+        if session["last_user_message"] == "boom":
+            raise RuntimeError("LLM exploded")
+        seen.append((session["sessionId"], session["messageCount"]))
+        return f"{session['sessionId']}#{session['messageCount']}"
+
+    reports = []
+    monkeypatch.setattr(routes, "generate_agent_reply", generate_agent_reply)
+    monkeypatch.setattr(routes, "send_report", lambda session: reports.append(session["sessionId"]))
+    test_client = TestClient(app)  # Not entered: no lifespan, no background jobs
+    test_client.seen = seen
+    test_client.reports = reports
+    return test_client
+
+
+def post(client, items):
+    return client.post("/honeypot/batch", json={"items": items}, headers={"x-api-key": API_KEY})
+
+
+def test_results_keep_request_order(client):
+    items = [item(f"order-{n}", f"hello {n}") for n in range(8)]
+    response = post(client, items)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "success" and body["succeeded"] == 8
+    assert [r["index"] for r in body["results"]] == list(range(8))
+    assert [r["reply"] for r in body["results"]] == [f"order-{n}#1" for n in range(8)]
+
+
+def test_bad_items_fail_alone(client):
+    items = [item("partial-1", "hello"), 5, None, "x", {"sessionId": "partial-2"}, item("partial-3", "boom")]
+    response = post(client, items)
+    assert response.status_code == 200  # Not a 422 for the whole batch
+    body = response.json()
+    assert body["status"] == "partial"
+    assert (body["succeeded"], body["failed"]) == (1, 5)
+    statuses = [r["status"] for r in body["results"]]
+    assert statuses == ["success", "error", "error", "error", "error", "error"]
+    assert body["results"][1]["sessionId"] is None
+    assert body["results"][4]["sessionId"] == "partial-2"  # Known even though the item is invalid
+    assert body["results"][5]["error"].startswith("RuntimeError")
+
+
+def test_items_of_one_session_run_in_order(client):
+    items = [item("same", "one"), item("other", "hi"), item("same", "two"), item("same", "three")]
+    body = post(client, items).json()
+    assert [r["reply"] for r in body["results"]] == ["same#1", "other#1", "same#2", "same#3"]
+    assert [count for sid, count in client.seen if sid == "same"] == [1, 2, 3]
+
+
+def test_one_report_per_scam_session(client):
+    items = [item("scam", "Your account is blocked, share OTP now"), item("scam", "pay to abc@ybl urgently")]
+    post(client, items)
+    assert client.reports == ["scam"]
@@ -0,0 +1,40 @@
+# tests/test_extractor_differential.py
+import json
+import os
+from collections import Counter
+
+import pytest
+
+import baseline_extractor
+from app.intelligence.extractor import extract_intelligence
+from bench.corpus import generate_corpus
+
+# Hand-written edge cases (one JSON string per line) + the seeded bench corpus
+_CORPUS_PATH = os.path.join(os.path.dirname(__file__), "data", "extractor_corpus.jsonl")
+
+
+def _edge_cases():
+    with open(_CORPUS_PATH, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _generated():
+    return [text for _, text in generate_corpus(count=400, seed=2024, blob_share=0.05, max_blob=5_000)]
+
+
+def _canonical(result):
+    # The baseline dedups through set(): compare contents, not order
+    return {key: Counter(values) for key, values in result.items()}
+
+
+@pytest.mark.parametrize("text", _edge_cases())
+def test_matches_baseline_on_edge_cases(text):
+    assert _canonical(extract_intelligence(text)) == _canonical(baseline_extractor.extract_intelligence(text))
+
+
+def test_matches_baseline_on_generated_corpus():
+    mismatches = [
+        text[:200] for text in _generated()
+        if _canonical(extract_intelligence(text)) != _canonical(baseline_extractor.extract_intelligence(text))
+    ]
+    assert not mismatches
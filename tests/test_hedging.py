@@ -0,0 +1,111 @@
+# tests/test_hedging.py
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import providers
+from app.core.key_pool import KeyPool
+from app.core.providers import GroqProvider
+
+HEDGE_DELAY = 0.05
+
+
+class FakeGroqClient:
+    """Just enough of AsyncGroq: answers `reply` after `delay`, records cancellations."""
+
+    def __init__(self, reply, delay):
+        self.reply = reply
+        self.delay = delay
+        self.calls = 0
+        self.cancelled = 0
+        # client.chat.completions.with_raw_response.create(...)
+        self.chat = self.completions = self.with_raw_response = self
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return FakeRawResponse(self.reply)
+
+
+class FakeRawResponse:
+    headers = {}
+
+    def __init__(self, reply):
+        self.reply = reply
+
+    async def parse(self):
+        message = SimpleNamespace(content=self.reply)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture(autouse=True)
+def short_hedge_delay(monkeypatch):
+    monkeypatch.setattr(providers, "LLM_HEDGE_DEFAULT_DELAY", HEDGE_DELAY)
+
+
+def groq(*clients, credit=1.0):
+    provider = GroqProvider([])
+    provider.pool = KeyPool([(f"k{i}", client) for i, client in enumerate(clients)])
+    provider._hedge_credit = credit
+    return provider
+
+
+async def hedged(provider, deadline=None):
+    reply = await provider._generate_hedged(provider.pool.keys, [], 0, deadline)
+    await asyncio.sleep(0.01)  # Let the cancelled loser unwind
+    return reply
+
+
+def test_hedge_wins_and_the_loser_is_cancelled_and_released(monkeypatch):
+    slow, fast = FakeGroqClient("slow", 5.0), FakeGroqClient("fast", 0.01)
+    provider = groq(slow, fast)
+    released = []
+    release = provider.pool.release
+    monkeypatch.setattr(provider.pool, "release", lambda key: (released.append(key.name), release(key)))
+
+    assert asyncio.run(hedged(provider)) == "fast"
+    assert provider.hedges_fired == 1 and provider.hedge_wins == 1
+    assert slow.cancelled == 1
+    assert released == ["k0"]
+    assert [k.in_flight for k in provider.pool.keys] == [0, 0]
+    assert provider.pool.keys[0].total_failures == 0  # Losing a race is not a failure
+
+
+def test_no_hedge_once_the_credit_runs_out():
+    slow, fast = FakeGroqClient("slow", 0.2), FakeGroqClient("fast", 0.01)
+    provider = groq(slow, fast, credit=0.0)
+
+    assert asyncio.run(hedged(provider)) == "slow"
+    assert provider.hedges_fired == 0 and fast.calls == 0
+
+
+def test_hedge_credit_is_spent_per_hedge():
+    slow, fast = FakeGroqClient("slow", 0.2), FakeGroqClient("fast", 0.01)
+    provider = groq(slow, fast, credit=1.0)
+
+    assert asyncio.run(hedged(provider)) == "fast"
+    # 1.0 + one call's share - one hedge leaves less than a whole hedge
+    assert provider._hedge_credit < 1
+    assert asyncio.run(hedged(provider)) == "slow"
+    assert provider.hedges_fired == 1 and fast.calls == 1
+
+
+def test_deadline_cancels_both_calls():
+    first, second = FakeGroqClient("a", 5.0), FakeGroqClient("b", 5.0)
+    provider = groq(first, second)
+
+    async def run():
+        return await hedged(provider, deadline=time.monotonic() + 0.3)
+
+    started = time.monotonic()
+    assert asyncio.run(run()) is None
+    assert time.monotonic() - started < 1.0
+    assert provider.hedges_fired == 1
+    assert first.cancelled == 1 and second.cancelled == 1
+    assert [k.in_flight for k in provider.pool.keys] == [0, 0]
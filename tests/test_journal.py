@@ -0,0 +1,200 @@
+# tests/test_journal.py
+import asyncio
+import os
+import threading
+
+from app.callback.journal import ReportJournal
+
+
+def report(session_id, n):
+    return {"sessionId": session_id, "totalMessagesExchanged": n}
+
+
+def close(journal):
+    asyncio.run(journal.close())
+
+
+def test_replays_only_unacked_after_restart(tmp_path):
+    path = str(tmp_path / "reports.jsonl")
+    journal = ReportJournal(path)
+    seq1 = journal.append(report("s1", 1))
+    journal.append(report("s2", 1))
+    journal.ack("s1", seq1)
+    close(journal)
+
+    journal = ReportJournal(path)
+    assert [sid for _, sid in journal.unacked()] == ["s2"]
+    assert journal.read("s2") == report("s2", 1)
+    # Sequence numbers keep growing across restarts
+    assert journal.append(report("s3", 1)) > seq1
+    close(journal)
+
+
+def test_newest_report_per_session_wins(tmp_path):
+    journal = ReportJournal(str(tmp_path / "reports.jsonl"))
+    old = journal.append(report("s1", 1))
+    journal.append(report("s1", 2))
+    journal.ack("s1", old)  # Acking the older snapshot leaves the newer one
+    assert journal.read("s1") == report("s1", 2)
+    close(journal)
+
+
+def test_torn_tail_is_dropped(tmp_path):
+    path = str(tmp_path / "reports.jsonl")
+    journal = ReportJournal(path)
+    journal.append(report("s1", 1))
+    close(journal)
+    with open(path, "ab") as f:
+        f.write(b'{"op": "report", "seq": 9, "sessionId": "s2", "payl')
+
+    journal = ReportJournal(path)
+    assert [sid for _, sid in journal.unacked()] == ["s1"]
+    journal.append(report("s2", 1))
+    close(journal)
+    assert [sid for _, sid in ReportJournal(path).unacked()] == ["s1", "s2"]
+
+
+def test_compaction_keeps_only_unacked(tmp_path):
+    path = str(tmp_path / "reports.jsonl")
+    journal = ReportJournal(path, compact_bytes=1024)
+    for n in range(50):
+        seq = journal.append(report(f"s{n}", n))
+        if n % 10:
+            journal.ack(f"s{n}", seq)
+    assert journal.needs_compaction()
+
+    asyncio.run(journal.compact())
+    kept = [f"s{n}" for n in range(0, 50, 10)]
+    assert sorted(sid for _, sid in journal.unacked()) == sorted(kept)
+    assert journal.stats()["records"] == len(kept)
+    assert journal.read("s20") == report("s20", 20)
+    assert not journal.needs_compaction()
+
+    journal.append(report("s99", 99))  # Still appending to the new file
+    close(journal)
+    journal = ReportJournal(path)
+    assert sorted(sid for _, sid in journal.unacked()) == sorted(kept + ["s99"])
+    close(journal)
+
+
+def test_compaction_waits_for_inflight_fsync(tmp_path, monkeypatch):
+    journal = ReportJournal(str(tmp_path / "reports.jsonl"))
+    journal.append(report("s1", 1))
+    release = threading.Event()
+    real_fsync = os.fsync
+
+    def slow_fsync(fd):
+        release.wait(5)
+        real_fsync(fd)
+
+    async def run():
+        monkeypatch.setattr(os, "fsync", slow_fsync)
+        sync = asyncio.create_task(journal.sync())
+        await asyncio.sleep(0.02)
+        compact = asyncio.create_task(journal.compact())
+        await asyncio.sleep(0.05)
+        assert not compact.done()  # The old fd is still being fsynced
+        release.set()
+        await sync
+        await compact
+        monkeypatch.setattr(os, "fsync", real_fsync)
+        await journal.close()
+
+    asyncio.run(run())
+    assert journal.compactions == 1
+
+
+def test_fsync_loop_survives_errors(tmp_path, monkeypatch):
+    journal = ReportJournal(str(tmp_path / "reports.jsonl"), fsync_interval=0.005)
+    real_fsync = os.fsync
+    failures = [OSError("disk hiccup")] * 2
+
+    def flaky_fsync(fd):
+        if failures:
+            raise failures.pop()
+        real_fsync(fd)
+
+    async def run():
+        monkeypatch.setattr(os, "fsync", flaky_fsync)
+        journal.start()
+        journal.append(report("s1", 1))
+        for _ in range(200):
+            if not journal._dirty:
+                break
+            await asyncio.sleep(0.005)
+        assert journal.sync_errors == 2
+        assert not journal._dirty  # The loop kept going and synced
+        await journal.close()
+
+    asyncio.run(run())
+
+
+def test_each_process_gets_its_own_file(tmp_path):
+    path = str(tmp_path / "reports.jsonl")
+    first = ReportJournal(path)
+    second = ReportJournal(path)
+    assert first.path == path
+    assert second.path == path + ".1"
+    close(second)
+    again = ReportJournal(path)  # The freed slot is reused (and its reports replayed)
+    assert again.path == path + ".1"
+    close(again)
+    close(first)
+
+
+def test_takes_over_files_of_dead_workers(tmp_path):
+    path = str(tmp_path / "reports.jsonl")
+    workers = [ReportJournal(path) for _ in range(3)]
+    for n, journal in enumerate(workers):
+        journal.append(report(f"s{n}", n))
+    close(workers[1])
+    close(workers[2])
+
+    # Restarted with fewer workers: slot 1 is reclaimed, slot 2 has nobody
+    journal = ReportJournal(path)
+    assert journal.path == path + ".1"
+    assert sorted(sid for _, sid in journal.unacked()) == ["s1", "s2"]
+    assert journal.read("s2") == report("s2", 2)
+    assert not os.path.exists(path + ".2")
+    close(journal)
+    close(workers[0])
+
+
+def test_compaction_keeps_appends_made_meanwhile(tmp_path, monkeypatch):
+    path = str(tmp_path / "reports.jsonl")
+    journal = ReportJournal(path, compact_bytes=0)
+    for n in range(20):
+        seq = journal.append(report(f"s{n}", n))
+        if n >= 2:
+            journal.ack(f"s{n}", seq)
+    release = threading.Event()
+    real_fsync = os.fsync
+
+    def slow_fsync(fd):
+        release.wait(5)
+        real_fsync(fd)
+
+    async def run():
+        monkeypatch.setattr(os, "fsync", slow_fsync)
+        compact = asyncio.create_task(journal.compact())
+        await asyncio.sleep(0.02)
+        # The loop is free while the compacted copy is written: keep journaling
+        assert not compact.done()
+        journal.append(report("s1", 100))  # Newer snapshot of a session being compacted
+        journal.append(report("new", 1))
+        journal.ack("s0", journal._unacked["s0"][0])
+        release.set()
+        await compact
+        monkeypatch.setattr(os, "fsync", real_fsync)
+        assert sorted(sid for _, sid in journal.unacked()) == ["new", "s1"]
+        assert journal.read("s1") == report("s1", 100)
+        assert journal.read("new") == report("new", 1)
+        journal.append(report("after", 1))
+        await journal.close()
+
+    asyncio.run(run())
+    assert journal.compactions == 1
+    reopened = ReportJournal(path)
+    assert sorted(sid for _, sid in reopened.unacked()) == ["after", "new", "s1"]
+    assert reopened.read("s1") == report("s1", 100)
+    close(reopened)
@@ -0,0 +1,175 @@
+# tests/test_key_pool.py
+import pytest
+
+from app.core import key_pool
+from app.core.config import LLM_KEY_CIRCUIT_BASE_COOLDOWN, LLM_KEY_FAILURE_THRESHOLD
+from app.core.key_pool import KeyPool, KeyState, TokenBucket, parse_reset_duration
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(key_pool.time, "monotonic", clock)
+    return clock
+
+
+def budget_headers(requests_left=100, tokens_left=10_000):
+    return {
+        "x-ratelimit-limit-requests": "100",
+        "x-ratelimit-remaining-requests": str(requests_left),
+        "x-ratelimit-reset-requests": "1m",
+        "x-ratelimit-limit-tokens": "10000",
+        "x-ratelimit-remaining-tokens": str(tokens_left),
+        "x-ratelimit-reset-tokens": "10s",
+    }
+
+
+def fail(pool, key, **kwargs):
+    pool.record_failure(key, pool.begin(key), RuntimeError("boom"), **kwargs)
+
+
+def names(keys):
+    return [k.name for k in keys]
+
+
+def test_parse_reset_duration():
+    assert parse_reset_duration("2m59.5s") == pytest.approx(179.5)
+    assert parse_reset_duration("450ms") == pytest.approx(0.45)
+    assert parse_reset_duration("12") == 12.0
+    assert parse_reset_duration("soon") is None
+    assert parse_reset_duration(None) is None
+
+
+def test_token_bucket_is_unlimited_until_synced(clock):
+    bucket = TokenBucket()
+    bucket.consume(1_000_000)
+    assert bucket.available() == float("inf")
+
+
+def test_token_bucket_refills_over_the_reset_window(clock):
+    bucket = TokenBucket()
+    bucket.sync(limit=100, remaining=40, reset_seconds=6.0)
+    bucket.consume(10)
+    assert bucket.available() == pytest.approx(30)
+    clock.advance(3.0)  # The missing 60 come back over 6 s
+    assert bucket.available() == pytest.approx(60)
+    clock.advance(60.0)
+    assert bucket.available() == pytest.approx(100)  # Never past capacity
+
+
+def test_token_bucket_drain_empties_until_the_window_ends(clock):
+    bucket = TokenBucket()
+    bucket.drain(4.0)
+    assert bucket.available() < 1
+    clock.advance(4.0)
+    assert bucket.available() == pytest.approx(1)
+
+
+def test_breaker_opens_after_repeated_failures(clock):
+    pool = KeyPool([("a", None), ("b", None)])
+    a = pool.keys[0]
+    for _ in range(LLM_KEY_FAILURE_THRESHOLD - 1):
+        fail(pool, a)
+    assert a.state == KeyState.CLOSED
+    fail(pool, a)
+    assert a.state == KeyState.OPEN
+    assert names(pool.candidates()) == ["b"]
+
+
+def test_half_open_probe_closes_the_breaker(clock):
+    pool = KeyPool([("a", None)])
+    a = pool.keys[0]
+    for _ in range(LLM_KEY_FAILURE_THRESHOLD):
+        fail(pool, a)
+    clock.advance(LLM_KEY_CIRCUIT_BASE_COOLDOWN - 0.1)
+    assert pool.candidates() == []
+
+    clock.advance(0.2)
+    assert names(pool.candidates()) == ["a"]
+    started = pool.begin(a)
+    assert a.state == KeyState.HALF_OPEN and a.probe_in_flight
+    assert pool.candidates() == []  # One probe at a time
+
+    clock.advance(0.3)
+    pool.record_success(a, started)
+    assert a.state == KeyState.CLOSED and a.trips == 0
+    assert names(pool.candidates()) == ["a"]
+
+
+def test_failed_probe_reopens_with_a_longer_cooldown(clock):
+    pool = KeyPool([("a", None)])
+    a = pool.keys[0]
+    for _ in range(LLM_KEY_FAILURE_THRESHOLD):
+        fail(pool, a)
+    clock.advance(LLM_KEY_CIRCUIT_BASE_COOLDOWN)
+    fail(pool, a)  # The probe fails: straight back to open
+    assert a.state == KeyState.OPEN
+    assert a.open_until == pytest.approx(clock.now + 2 * LLM_KEY_CIRCUIT_BASE_COOLDOWN)
+
+
+def test_cancelled_probe_frees_the_half_open_slot(clock):
+    pool = KeyPool([("a", None)])
+    a = pool.keys[0]
+    for _ in range(LLM_KEY_FAILURE_THRESHOLD):
+        fail(pool, a)
+    clock.advance(LLM_KEY_CIRCUIT_BASE_COOLDOWN)
+    pool.begin(a)
+    pool.release(a)
+    assert a.in_flight == 0
+    assert names(pool.candidates()) == ["a"]
+
+
+def test_rate_limited_key_is_parked_until_retry_after(clock):
+    pool = KeyPool([("a", None), ("b", None)])
+    a = pool.keys[0]
+    fail(pool, a, status_code=429, headers={"retry-after": "7.5"})
+    assert a.total_rate_limited == 1
+    assert names(pool.candidates()) == ["b"]  # One 429 is enough, no threshold
+
+    clock.advance(7.4)
+    assert names(pool.candidates()) == ["b"]
+    clock.advance(0.2)
+    assert names(pool.candidates()) == ["a", "b"]
+
+
+def test_rate_limit_falls_back_to_the_reset_header(clock):
+    pool = KeyPool([("a", None)])
+    a = pool.keys[0]
+    fail(pool, a, status_code=429, headers={"x-ratelimit-reset-requests": "2m"})
+    assert a.open_until == pytest.approx(clock.now + 120.0)
+
+
+def test_candidates_skip_keys_without_budget(clock):
+    pool = KeyPool([("a", None), ("b", None), ("c", None)])
+    a, b, c = pool.keys
+    pool.record_success(a, pool.begin(a), budget_headers(tokens_left=300))
+    pool.record_success(b, pool.begin(b), budget_headers(requests_left=0))
+    pool.record_success(c, pool.begin(c), budget_headers())
+
+    assert "a" in names(pool.candidates(estimated_tokens=200))
+    assert "a" not in names(pool.candidates(estimated_tokens=500))  # Not enough tokens left
+    assert "b" not in names(pool.candidates())  # No requests left this window
+    assert names(pool.candidates(estimated_tokens=500)) == ["c"]
+
+
+def test_candidates_prefer_the_least_loaded_key(clock):
+    pool = KeyPool([("a", None), ("b", None)])
+    a, b = pool.keys
+    for key in (a, b):
+        started = pool.begin(key)
+        clock.advance(0.5)
+        pool.record_success(key, started)
+    pool.begin(a)
+    pool.begin(a)
+    assert names(pool.candidates()) == ["b", "a"]
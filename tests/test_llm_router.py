@@ -0,0 +1,211 @@
+# tests/test_llm_router.py
+import asyncio
+
+import pytest
+
+from app.core import llm as llm_module
+from app.core.config import LLM_ROUTER_MAX_FAILURES
+from app.core.llm import FALLBACK_REPLY, DegradedReply, LLMService, is_fallback
+from app.core.providers import GeminiProvider, LocalProvider
+from app.core.stall_bank import CAPTURED_STALLS, DIRECTIVE_CAPTURED, DIRECTIVE_LINK_ONLY, LINK_STALLS
+
+
+class FakeProvider:
+    """Scripted provider: answers `reply`, or raises while `fail` is set."""
+
+    max_tokens = 100
+
+    def __init__(self, name, reply="ok", fail=False, fail_after_chunks=None, delay=0.0):
+        self.name = name
+        self.reply = reply
+        self.fail = fail
+        self.fail_after_chunks = fail_after_chunks
+        self.delay = delay
+        self.configured = True
+        self.calls = []
+        self.directives = []
+
+    def available(self, estimated_tokens=0):
+        return True
+
+    async def generate(self, system_prompt, user_prompt, deadline=None, estimated_tokens=0, purpose="reply", directive=None):
+        self.calls.append(purpose)
+        self.directives.append(directive)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} down")
+        return self.reply
+
+    async def stream(self, system_prompt, user_prompt, deadline=None, estimated_tokens=0, purpose="reply", directive=None):
+        self.calls.append(purpose)
+        self.directives.append(directive)
+        for i, word in enumerate(self.reply.split(" ")):
+            if self.fail or (self.fail_after_chunks is not None and i >= self.fail_after_chunks):
+                raise RuntimeError(f"{self.name} down")
+            yield word
+
+    def stats(self):
+        return {}
+
+
+@pytest.fixture(autouse=True)
+def no_exploration(monkeypatch):
+    # Keep the ranking deterministic (no runner-up probes)
+    monkeypatch.setattr(llm_module.random, "random", lambda: 1.0)
+
+
+def service(*providers, local_fallback=True):
+    return LLMService(providers=list(providers), default_provider="auto", local_fallback=local_fallback)
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_fails_over_to_the_next_provider():
+    groq = FakeProvider("groq", fail=True)
+    gemini = FakeProvider("gemini", reply="from gemini")
+    router = service(groq, gemini, LocalProvider())
+
+    reply = asyncio.run(router.generate("sys", "user"))
+    assert reply == "from gemini" and not is_fallback(reply)
+    assert groq.calls == ["reply"] and gemini.calls == ["reply"]
+    assert router.health["groq"].failures == 1
+    # The failing provider now ranks behind the healthy one
+    assert [p.name for p in router.route()] == ["gemini", "groq", "local"]
+
+
+def test_preferred_provider_goes_first():
+    groq = FakeProvider("groq", reply="from groq")
+    gemini = FakeProvider("gemini", reply="from gemini")
+    router = service(groq, gemini)
+    assert asyncio.run(router.generate("sys", "user", provider="gemini")) == "from gemini"
+    assert groq.calls == []
+
+
+def test_local_stands_in_when_every_real_provider_fails():
+    router = service(FakeProvider("groq", fail=True), FakeProvider("gemini", fail=True), LocalProvider())
+    reply = asyncio.run(router.generate("sys", "user"))
+    assert isinstance(reply, DegradedReply) and is_fallback(reply)
+
+
+def test_fallback_reply_without_local():
+    router = service(FakeProvider("groq", fail=True), LocalProvider(), local_fallback=False)
+    assert asyncio.run(router.generate("sys", "user")) == FALLBACK_REPLY
+
+
+def test_repeated_failures_bench_a_provider():
+    groq = FakeProvider("groq", fail=True)
+    router = service(groq, FakeProvider("gemini"))
+    for _ in range(LLM_ROUTER_MAX_FAILURES):
+        asyncio.run(router.generate("sys", "user", provider="groq"))
+    assert router.health["groq"].is_open(llm_module.time.monotonic())
+    assert [p.name for p in router.route()] == ["gemini"]
+
+
+def test_stream_fails_over_before_the_first_chunk():
+    router = service(FakeProvider("groq", fail=True), FakeProvider("gemini", reply="hello there"))
+    assert asyncio.run(collect(router.stream("sys", "user"))) == ["hello", "there"]
+
+
+def test_stream_ends_early_after_a_chunk_was_sent():
+    groq = FakeProvider("groq", reply="hello there friend", fail_after_chunks=1)
+    gemini = FakeProvider("gemini", reply="other")
+    router = service(groq, gemini)
+    assert asyncio.run(collect(router.stream("sys", "user"))) == ["hello"]
+    assert gemini.calls == []  # No second voice mid-reply
+
+
+def test_purpose_reaches_the_provider():
+    groq = FakeProvider("groq")
+    router = service(groq)
+    asyncio.run(router.generate("sys", "user", purpose="verdict"))
+    asyncio.run(collect(router.stream("sys", "user", purpose="system_prompt")))
+    assert groq.calls == ["verdict", "system_prompt"]
+
+
+def test_local_provider_answers_by_purpose():
+    local = LocalProvider()
+    scam = "Your account is blocked, share the OTP to verify KYC immediately"
+    assert local.complete("anything", scam, purpose="verdict") == "TRUE"
+    assert local.complete("anything", "See you at lunch", purpose="verdict") == "FALSE"
+    assert local.complete("anything", "anything", purpose="system_prompt") == LocalProvider.SYSTEM_PROMPT
+    reply = local.complete("You are a scam detector. Reply 'TRUE' or 'FALSE'.", "hello", purpose="reply")
+    assert reply not in ("TRUE", "FALSE")
+    assert reply == local.complete("other system prompt", "hello", purpose="reply")  # Deterministic
+
+
+def test_directive_reaches_the_provider():
+    groq = FakeProvider("groq")
+    router = service(groq)
+    asyncio.run(router.generate("sys", "user", directive=DIRECTIVE_CAPTURED))
+    asyncio.run(collect(router.stream("sys", "user", directive=DIRECTIVE_LINK_ONLY)))
+    assert groq.directives == [DIRECTIVE_CAPTURED, DIRECTIVE_LINK_ONLY]
+
+
+def test_local_reply_follows_the_directive_not_the_prompt():
+    local = LocalProvider()
+    # The prompt mentions a link, but the directive says details were captured
+    prompt = "STATUS: Phishing Link Found. scammer: click http://x.example"
+    assert local.complete("sys", prompt, directive=DIRECTIVE_CAPTURED) in CAPTURED_STALLS
+    assert local.complete("sys", "hello", directive=DIRECTIVE_LINK_ONLY) in LINK_STALLS
+
+
+def test_deadline_failures_dont_bench_a_provider():
+    groq = FakeProvider("groq", fail=True, delay=0.1)
+
+    async def run():
+        deadline = llm_module.time.monotonic() + 0.05
+        return await router.generate("sys", "user", deadline=deadline)
+
+    router = service(groq, LocalProvider())
+    for _ in range(LLM_ROUTER_MAX_FAILURES):
+        asyncio.run(run())
+    health = router.health["groq"]
+    assert health.failures == 0 and health.ewma_error == 0.0
+    assert not health.is_open(llm_module.time.monotonic())
+
+
+class FakeGeminiClient:
+    """Just enough of google-genai: a stream that sends one chunk, then stalls."""
+
+    class _Chunk:
+        def __init__(self, text):
+            self.text = text
+
+    def __init__(self):
+        self.aio = self
+        self.models = self
+
+    async def generate_content_stream(self, model, contents, config):
+        async def chunks():
+            yield self._Chunk("hello")
+            await asyncio.sleep(60)
+            yield self._Chunk("never")
+        return chunks()
+
+
+def test_gemini_stream_deadline_applies_to_every_chunk():
+    gemini = GeminiProvider(None)
+    gemini.client = FakeGeminiClient()
+    gemini._config = lambda system_prompt, timeout: None
+    received = []
+
+    async def run():
+        deadline = llm_module.time.monotonic() + 0.2
+        async for chunk in gemini.stream("sys", "user", deadline):
+            received.append(chunk)
+
+    started = llm_module.time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
+    assert received == ["hello"]
+    assert llm_module.time.monotonic() - started < 1.0
+
+
+def test_key_gauges_without_groq(monkeypatch):
+    from app.api import routes
+
+    monkeypatch.setattr(routes, "llm", service(FakeProvider("gemini"), LocalProvider()))
+    assert routes._groq_keys() == []
+    assert "honeypot_llm_key_in_flight" in routes.metrics_registry.render()
@@ -0,0 +1,92 @@
+# tests/test_log.py
+import io
+import json
+import logging
+import queue
+
+import pytest
+
+from app.core import log as log_module
+from app.core.log import CategoryLimiter, DroppingQueueHandler, JsonFormatter, LogPipeline, get_logger
+
+
+def record(category, level=logging.INFO, msg="hello", **extra):
+    rec = logging.LogRecord(f"honeypot.{category}", level, __file__, 1, msg, (), None)
+    for key, value in extra.items():
+        setattr(rec, key, value)
+    return rec
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(log_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_sampling_applies_below_warning_only(monkeypatch):
+    monkeypatch.setattr(log_module.random, "random", lambda: 0.5)
+    limiter = CategoryLimiter(sampling={"pacing": 0.1}, default_rate=0)
+    assert not limiter.filter(record("pacing"))
+    assert limiter.filter(record("pacing", logging.WARNING))
+    assert limiter.filter(record("llm"))  # Not sampled at all
+    assert limiter.sampled_out == 1
+
+
+def test_rate_limit_per_category_reports_suppressed(clock):
+    limiter = CategoryLimiter(rate_limits={"llm": 2}, default_rate=0)
+    passed = [limiter.filter(record("llm")) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+    assert limiter.filter(record("callback"))  # Other categories are unaffected
+    assert limiter.rate_limited == 3
+
+    clock[0] += 0.5  # One token back
+    rec = record("llm")
+    assert limiter.filter(rec)
+    assert rec.suppressed == 3
+    assert not limiter.filter(record("llm"))
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(record("llm", msg="first"))
+    handler.handle(record("llm", msg="second"))
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 1
+
+
+def test_json_formatter_fields():
+    entry = json.loads(JsonFormatter().format(record("session", logging.WARNING, suppressed=4, sessionId="s1")))
+    assert entry["level"] == "WARNING"
+    assert entry["category"] == "session"
+    assert entry["msg"] == "hello"
+    assert entry["sessionId"] == "s1"  # extra= fields come along
+    assert entry["suppressedBefore"] == 4
+
+
+@pytest.fixture
+def pipeline():
+    out = io.StringIO()
+    pipeline = LogPipeline(level="INFO", fmt="json", queue_size=100, default_rate=0, stream=out)
+    pipeline.start()
+    yield pipeline, out
+    pipeline.stop()
+    pipeline.logger.removeHandler(pipeline.handler)
+
+
+def test_pipeline_writes_from_the_background_thread(pipeline):
+    pipe, out = pipeline
+    get_logger("tests").info("through the queue", extra={"turn": 3})
+    pipe.stop()  # Flushes what is queued
+
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    entry = next(line for line in lines if line["msg"] == "through the queue")
+    assert entry["category"] == "tests" and entry["turn"] == 3
+
+
+def test_pipeline_stats(pipeline):
+    pipe, _ = pipeline
+    stats = pipe.stats()
+    assert stats["queueSize"] == 100
+    assert stats["dropped"] == 0
+    assert stats["rateLimits"] == {"default": 0}
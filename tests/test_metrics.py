@@ -0,0 +1,74 @@
+# tests/test_metrics.py
+import pytest
+
+from app.core.metrics import MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("t_seconds", "Test latency.", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, "extract")
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP t_seconds Test latency.", "# TYPE t_seconds histogram"]
+    assert 't_seconds_bucket{stage="extract",le="0.1"} 2' in lines  # Bounds are inclusive
+    assert 't_seconds_bucket{stage="extract",le="1"} 3' in lines
+    assert 't_seconds_bucket{stage="extract",le="+Inf"} 4' in lines
+    assert 't_seconds_sum{stage="extract"} 3.65' in lines
+    assert 't_seconds_count{stage="extract"} 4' in lines
+
+
+def test_counter_series_per_label_set():
+    registry = MetricsRegistry()
+    errors = registry.counter("t_errors_total", "Test errors.", ["key", "kind"])
+    errors.inc("k1", "timeout")
+    errors.inc("k1", "timeout")
+    errors.inc("k2", "http_500", amount=3)
+
+    text = registry.render()
+    assert 't_errors_total{key="k1",kind="timeout"} 2\n' in text
+    assert 't_errors_total{key="k2",kind="http_500"} 3\n' in text
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter("t_total", "Test.", ["name"]).inc('a"b\\c\nd')
+    assert 't_total{name="a\\"b\\\\c\\nd"} 1' in registry.render()
+
+
+def test_gauge_func_is_read_at_scrape_time():
+    registry = MetricsRegistry()
+    depth = [3]
+    registry.gauge_func("t_depth", "Test depth.", lambda: depth[0])
+    registry.gauge_func("t_in_flight", "Per key.", lambda: {("k1",): 2, ("k2",): 0}, ["key"])
+
+    assert "t_depth 3\n" in registry.render()
+    depth[0] = 7
+    text = registry.render()
+    assert "t_depth 7\n" in text
+    assert 't_in_flight{key="k1"} 2\n' in text and 't_in_flight{key="k2"} 0\n' in text
+
+
+def test_failing_gauge_does_not_break_the_scrape():
+    registry = MetricsRegistry()
+    registry.gauge_func("t_broken", "Broken.", lambda: 1 / 0)
+    registry.counter("t_ok_total", "Fine.").inc()
+    text = registry.render()
+    assert "# TYPE t_broken gauge" in text
+    assert "t_ok_total 1\n" in text
+
+
+def test_names_are_unique():
+    registry = MetricsRegistry()
+    registry.counter("t_total", "Test.")
+    with pytest.raises(ValueError):
+        registry.histogram("t_total", "Again.")
+
+
+def test_app_registry_renders():
+    from app.api import routes
+
+    text = routes.metrics_registry.render()
+    assert "# TYPE honeypot_stage_seconds histogram" in text
+    assert "honeypot_sessions " in text
@@ -0,0 +1,172 @@
+# tests/test_outbox.py
+import asyncio
+import json
+import os
+
+import httpx
+
+from app.callback.guvi_client import CallbackOutbox
+from app.callback.journal import ReportJournal
+
+
+def report(session_id, n):
+    return {"sessionId": session_id, "totalMessagesExchanged": n}
+
+
+class FakeGuvi:
+    """MockTransport handler: records every POST, answers from `statuses` (then 200)."""
+
+    def __init__(self, statuses=(), gate=None):
+        self.statuses = list(statuses)
+        self.gate = gate
+        self.posts = []
+
+    async def __call__(self, request):
+        self.posts.append(json.loads(request.content))
+        if self.gate is not None:
+            await self.gate.wait()
+        status = self.statuses.pop(0) if self.statuses else 200
+        return httpx.Response(status, text="" if status == 200 else "nope")
+
+
+def make_outbox(guvi, **kwargs):
+    kwargs.setdefault("workers", 1)
+    kwargs.setdefault("backoff_base", 0.0)
+    return CallbackOutbox("http://guvi.test/report", transport=httpx.MockTransport(guvi), **kwargs)
+
+
+async def wait_until(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.005)
+
+
+def test_coalesces_queued_snapshots():
+    async def run():
+        guvi = FakeGuvi()
+        outbox = make_outbox(guvi)
+        # No await in between: the worker hasn't picked anything up yet
+        for n in range(1, 4):
+            assert outbox.submit(report("s1", n))
+        await outbox.stop()
+        assert [p["totalMessagesExchanged"] for p in guvi.posts] == [3]
+        assert outbox.counters["coalesced"] == 2
+        assert outbox.counters["sent"] == 1
+
+    asyncio.run(run())
+
+
+def test_newest_snapshot_follows_the_one_in_flight():
+    async def run():
+        gate = asyncio.Event()
+        guvi = FakeGuvi(gate=gate)
+        outbox = make_outbox(guvi, workers=2)
+        outbox.submit(report("s1", 1))
+        await wait_until(lambda: guvi.posts)
+        # s1 is being sent: later snapshots wait for it, only the newest goes out
+        outbox.submit(report("s1", 2))
+        outbox.submit(report("s1", 3))
+        gate.set()
+        await outbox.stop()
+        assert [p["totalMessagesExchanged"] for p in guvi.posts] == [1, 3]
+
+    asyncio.run(run())
+
+
+def test_retries_until_delivered():
+    async def run():
+        guvi = FakeGuvi(statuses=[503, 503])
+        outbox = make_outbox(guvi, max_attempts=5)
+        outbox.submit(report("s1", 1))
+        await outbox.stop()
+        assert len(guvi.posts) == 3
+        assert outbox.counters["retries"] == 2
+        assert outbox.counters["sent"] == 1
+        assert outbox.counters["failed"] == 0
+
+    asyncio.run(run())
+
+
+def test_gives_up_after_max_attempts():
+    async def run():
+        guvi = FakeGuvi(statuses=[503] * 10)
+        outbox = make_outbox(guvi, max_attempts=3)
+        outbox.submit(report("s1", 1))
+        await outbox.stop()
+        assert len(guvi.posts) == 3
+        assert outbox.counters["failed"] == 1
+
+    asyncio.run(run())
+
+
+def test_failed_report_stays_in_journal_for_replay(tmp_path):
+    async def run():
+        path = str(tmp_path / "reports.jsonl")
+        outbox = make_outbox(FakeGuvi(statuses=[503] * 10), max_attempts=2,
+                             journal=ReportJournal(path), replay_interval=60)
+        outbox.submit(report("s1", 1))
+        await outbox.stop()
+
+        guvi = FakeGuvi()
+        outbox = make_outbox(guvi, journal=ReportJournal(path), replay_interval=60, replay_rate=1000)
+        outbox.start()  # Replays what the last run left undelivered
+        await wait_until(lambda: outbox.counters["replayed"] == 1)
+        await outbox.stop()
+        assert guvi.posts == [report("s1", 1)]
+        assert ReportJournal(path).unacked() == []
+
+    asyncio.run(run())
+
+
+def test_replay_spills_when_queue_is_full(tmp_path):
+    async def run():
+        path = str(tmp_path / "reports.jsonl")
+        journal = ReportJournal(path)
+        journal.append(report("s1", 1))  # Left over from a previous run
+        outbox = None
+
+        async def guvi(request):
+            # While s1 is being replayed: a newer s1 snapshot arrives and the queue fills up
+            outbox.submit(report("s2", 1))
+            outbox.submit(report("s1", 2))
+            return httpx.Response(503)
+
+        outbox = CallbackOutbox("http://guvi.test/report", transport=httpx.MockTransport(guvi),
+                                workers=0, max_queue=1, journal=journal, replay_interval=60)
+        outbox.start()
+        await wait_until(lambda: outbox.counters["spilled"] == 1)
+        assert "s1" not in outbox._pending  # Not stuck: the journal has it
+        assert sorted(sid for _, sid in journal.unacked()) == ["s1", "s2"]
+        assert journal.read("s1") == report("s1", 2)
+        await outbox.stop(drain_timeout=0.01)
+
+    asyncio.run(run())
+
+
+def test_rejected_report_becomes_a_dead_letter(tmp_path):
+    async def run():
+        journal = ReportJournal(str(tmp_path / "reports.jsonl"))
+        outbox = make_outbox(FakeGuvi(statuses=[422]), journal=journal, replay_interval=60)
+        outbox.submit(report("s1", 1))
+        await outbox.stop()
+        assert outbox.counters["rejected"] == 1
+        assert journal.unacked() == []  # Not replayed forever
+        with open(journal.dead_letter_path) as f:
+            dead = [json.loads(line) for line in f]
+        assert [d["payload"] for d in dead] == [report("s1", 1)]
+        assert dead[0]["reason"] == "nope"
+
+    asyncio.run(run())
+
+
+def test_journal_opens_on_start(tmp_path):
+    async def run():
+        path = str(tmp_path / "reports.jsonl")
+        outbox = make_outbox(FakeGuvi(), journal_factory=lambda: ReportJournal(path), replay_interval=60)
+        assert outbox.journal is None and not os.path.exists(path)
+        outbox.start()
+        assert outbox.journal is not None and os.path.exists(path)
+        await outbox.stop()
+
+    asyncio.run(run())
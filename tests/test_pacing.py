@@ -0,0 +1,22 @@
+# tests/test_pacing.py
+from app.core.pacing import DEFAULT_POLICIES, Pacer, load_policies
+
+
+def test_default_delays_are_capped_at_one_second():
+    pacer = Pacer(policies=load_policies())
+    for channel, policy in DEFAULT_POLICIES.items():
+        assert policy["min"] <= policy["max"] <= 1.0, channel
+        assert pacer.delay_for(channel, "x" * 5000, elapsed=0.0) <= 1.0
+
+
+def test_real_work_counts_toward_the_delay():
+    pacer = Pacer(policies=load_policies())
+    assert pacer.delay_for("sms", "hello", elapsed=5.0) == 0.0
+    assert Pacer(policies=load_policies(), enabled=False).delay_for("sms", "hello", elapsed=0.0) == 0.0
+
+
+def test_overrides_merge_into_defaults():
+    policies = load_policies('{"sms": {"max": 1.5}, "telegram": {"min": 0.1}}')
+    assert policies["sms"]["max"] == 1.5
+    assert policies["sms"]["min"] == DEFAULT_POLICIES["sms"]["min"]
+    assert policies["telegram"]["max"] == DEFAULT_POLICIES["default"]["max"]
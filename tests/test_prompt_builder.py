@@ -0,0 +1,93 @@
+# tests/test_prompt_builder.py
+from app.agent import prompt_builder
+from app.agent.prompt_builder import HistoryWindow, build_user_prompt
+from app.core.session import new_session
+from app.core.stall_bank import DIRECTIVE_NO_DETAILS
+from app.core.tokens import _piece_tokens, estimate_tokens, truncate_to_tokens
+
+
+def conversation(turns, words=20):
+    session = new_session("s1")
+    for n in range(turns):
+        sender = "scammer" if n % 2 == 0 else "user"
+        session["messages"].append({"sender": sender, "text": f"turn{n} " + "blah " * words})
+    session["last_user_message"] = session["messages"][-1]["text"]
+    return session
+
+
+def test_estimate_follows_the_piece_rules():
+    assert estimate_tokens("hello world") == 2
+    assert estimate_tokens("1234567") == 3  # Digit runs in groups of 3
+    assert estimate_tokens("!!") == 2
+    assert estimate_tokens("internationalization") == 3  # 1 + one per full 8 letters
+    text = "Send Rs 45000 to arthur_99@okaxis NOW!!! Verification pending..."
+    assert estimate_tokens(text) == sum(tokens for _, tokens in _piece_tokens(text))
+
+
+def test_truncate_keeps_short_text_and_cuts_long_text():
+    assert truncate_to_tokens("pay now", 10) == "pay now"
+    cut = truncate_to_tokens("word " * 100, 10)
+    assert cut.endswith("...")
+    assert estimate_tokens(cut[:-3]) <= 10
+
+
+def test_prompt_fits_the_budget_and_keeps_the_newest_history():
+    session = conversation(40)
+    prompt = build_user_prompt(session, DIRECTIVE_NO_DETAILS, "None", budget=300)
+    assert estimate_tokens(prompt) <= 300
+    assert "turn38 " in prompt  # Newest history line
+    assert "turn0 " not in prompt  # Oldest ones dropped first
+    assert "NEW MSG:\nturn39 " in prompt
+
+
+def test_fixed_parts_survive_a_tiny_budget():
+    session = conversation(10)
+    prompt = build_user_prompt(session, DIRECTIVE_NO_DETAILS, "UPI: a@upi", budget=10)
+    assert "HISTORY:\n\n" in prompt
+    assert "UPI: a@upi" in prompt and DIRECTIVE_NO_DETAILS in prompt and "turn9 " in prompt
+
+
+def test_long_messages_are_capped_per_line():
+    session = conversation(3, words=2000)
+    window = HistoryWindow(session, max_tokens=10_000)
+    window.sync()
+    tokens = [entry[0] for entry in session["promptWindow"]["lines"]]
+    assert tokens[0] <= prompt_builder.PROMPT_SCAMMER_MESSAGE_MAX_TOKENS + 5
+    assert tokens[1] <= prompt_builder.PROMPT_USER_MESSAGE_MAX_TOKENS + 5
+
+
+def test_window_only_formats_new_messages(monkeypatch):
+    formatted = []
+    original = prompt_builder.format_history_line
+    monkeypatch.setattr(prompt_builder, "format_history_line", lambda msg: (formatted.append(msg), original(msg))[1])
+
+    session = conversation(5)
+    build_user_prompt(session, DIRECTIVE_NO_DETAILS, "None")
+    assert len(formatted) == 4  # Everything but the new message
+
+    session["messages"].append({"sender": "user", "text": "ok"})
+    session["messages"].append({"sender": "scammer", "text": "pay"})
+    session["last_user_message"] = "pay"
+    build_user_prompt(session, DIRECTIVE_NO_DETAILS, "None")
+    assert len(formatted) == 6
+    assert session["promptWindow"]["upTo"] == 6
+
+
+def test_window_drops_oldest_lines_over_its_budget():
+    session = conversation(30)
+    window = HistoryWindow(session, max_tokens=100)
+    window.sync()
+    state = session["promptWindow"]
+    assert state["tokens"] <= 100
+    assert state["tokens"] == sum(entry[0] for entry in state["lines"])
+    assert state["lines"][-1][1].startswith("SCAMMER: turn28 ")
+
+
+def test_window_resets_when_history_shrinks():
+    session = conversation(10)
+    HistoryWindow(session).sync()
+    session["messages"] = session["messages"][:3]
+    window = HistoryWindow(session)
+    window.sync()
+    assert session["promptWindow"]["upTo"] == 2
+    assert len(session["promptWindow"]["lines"]) == 2
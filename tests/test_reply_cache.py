@@ -0,0 +1,103 @@
+# tests/test_reply_cache.py
+import asyncio
+
+import pytest
+
+from app.agent import agent
+from app.agent.reply_cache import ReplyCache
+from app.core import cache as cache_module
+from app.core.admission import AdmissionController
+from app.core.llm import FALLBACK_REPLY
+from app.core.session import new_session
+from app.core.stall_bank import DIRECTIVE_CAPTURED, DIRECTIVE_NO_DETAILS
+
+
+def session_with(last, history=()):
+    session = new_session("s1")
+    for sender, text in history:
+        session["messages"].append({"sender": sender, "text": text})
+    session["messages"].append({"sender": "scammer", "text": last})
+    session["last_user_message"] = last
+    return session
+
+
+def test_key_ignores_case_and_punctuation():
+    cache = ReplyCache()
+    a = cache.make_key(session_with("Your account is BLOCKED!!"), DIRECTIVE_NO_DETAILS, "None")
+    b = cache.make_key(session_with("your account is blocked"), DIRECTIVE_NO_DETAILS, "None")
+    assert a == b
+
+
+def test_key_separates_directive_history_and_intel():
+    cache = ReplyCache()
+    base = cache.make_key(session_with("pay now"), DIRECTIVE_NO_DETAILS, "None")
+    assert cache.make_key(session_with("pay now"), DIRECTIVE_CAPTURED, "None") != base
+    assert cache.make_key(session_with("pay now", [("scammer", "hello")]), DIRECTIVE_NO_DETAILS, "None") != base
+    # One session's recalled UPI must never leak into another's reply
+    assert cache.make_key(session_with("pay now"), DIRECTIVE_NO_DETAILS, "UPI: a@upi") != base
+
+
+def test_pool_is_sampled_before_it_is_served():
+    cache = ReplyCache(pool_size=3)
+    key = ("pay now", DIRECTIVE_NO_DETAILS, "digest")
+    for reply in ("one", "two", "one"):
+        assert cache.lookup(key) is None
+        cache.store(key, reply)
+    # Three samples (two distinct replies) fill the pool
+    assert {cache.lookup(key) for _ in range(50)} == {"one", "two"}
+    cache.store(key, "three")  # Pool is full: ignored
+    assert "three" not in {cache.lookup(key) for _ in range(50)}
+    assert cache.misses == 3
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = ReplyCache(pool_size=1, ttl=60)
+    key = ("pay now", DIRECTIVE_NO_DETAILS, "digest")
+    cache.store(key, "one")
+    assert cache.lookup(key) == "one"
+    now[0] += 61
+    assert cache.lookup(key) is None
+
+
+def test_disabled_cache_never_serves():
+    cache = ReplyCache(enabled=False, pool_size=1)
+    key = ("pay now", DIRECTIVE_NO_DETAILS, "digest")
+    cache.store(key, "one")
+    assert cache.lookup(key) is None
+
+
+@pytest.fixture
+def agent_llm(monkeypatch):
+    """Fresh reply cache and gate; the LLM answers with `replies[0]`."""
+    replies = ["Arthur: Which button do I press?"]
+
+    async def generate(system_prompt, user_prompt, provider=None, deadline=None, purpose="reply", directive=None):
+        return replies[0]
+
+    async def system_prompt(session_context=None, deadline=None):
+        return "sys"
+
+    monkeypatch.setattr(agent.llm, "generate", generate)
+    monkeypatch.setattr(agent, "get_active_system_prompt", system_prompt)
+    monkeypatch.setattr(agent, "reply_cache", ReplyCache(pool_size=1))
+    monkeypatch.setattr(agent, "llm_admission", AdmissionController())
+    return replies
+
+
+def test_agent_caches_real_replies(agent_llm):
+    session = session_with("Your account is blocked")
+    assert asyncio.run(agent.generate_agent_reply(session)) == "Which button do I press?"
+    agent_llm[0] = "something else"
+    assert asyncio.run(agent.generate_agent_reply(session)) == "Which button do I press?"
+    assert agent.reply_cache.hits == 1
+
+
+def test_agent_never_caches_the_fallback(agent_llm):
+    session = session_with("Your account is blocked")
+    agent_llm[0] = FALLBACK_REPLY
+    asyncio.run(agent.generate_agent_reply(session))
+    agent_llm[0] = "Arthur: Oh dear."
+    assert asyncio.run(agent.generate_agent_reply(session)) == "Oh dear."
+    assert agent.reply_cache.hits == 0
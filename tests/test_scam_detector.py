@@ -0,0 +1,79 @@
+# tests/test_scam_detector.py
+import asyncio
+import time
+
+import pytest
+
+from app.core.admission import AdmissionController
+from app.detection import scam_detector
+
+CLEAN_TEXT = "Are we still meeting for lunch on Sunday?"
+
+
+@pytest.fixture
+def detector(monkeypatch):
+    """Fresh cache/gate; the LLM answers after `delay` seconds, counting calls."""
+    state = type("State", (), {"calls": 0, "delay": 0.0, "peak": 0, "running": 0, "reply": "FALSE"})()
+
+    async def generate(system_prompt, user_prompt, provider=None, deadline=None, purpose="reply"):
+        state.calls += 1
+        state.running += 1
+        state.peak = max(state.peak, state.running)
+        try:
+            await asyncio.sleep(state.delay)
+        finally:
+            state.running -= 1
+        return state.reply
+
+    monkeypatch.setattr(scam_detector.llm, "generate", generate)
+    monkeypatch.setattr(scam_detector, "verdict_cache", scam_detector.TTLCache(max_entries=100, ttl=60))
+    monkeypatch.setattr(scam_detector, "_inflight", scam_detector.SingleFlight())
+    gate = AdmissionController(max_in_flight=2, max_queue=0, max_wait=1.0)
+    monkeypatch.setattr(scam_detector, "llm_admission", gate)
+    state.gate = gate
+    return state
+
+
+def test_llm_fallback_goes_through_admission(detector):
+    async def run():
+        detector.delay = 0.02
+        texts = [f"{CLEAN_TEXT} #{n}" for n in range(6)]
+        results = await asyncio.gather(*(scam_detector.detect_scam(t) for t in texts))
+        assert detector.peak <= 2  # Never more LLM calls than slots
+        assert detector.calls == 2
+        assert detector.gate.shed["queue_full"] == 4
+        assert all(result == (False, []) for result in results)
+        assert detector.gate.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_shed_verdict_is_not_cached(detector):
+    async def run():
+        detector.gate.max_in_flight = 0  # Everything shed
+        assert await scam_detector.detect_scam(CLEAN_TEXT) == (False, [])
+        assert detector.calls == 0
+        detector.gate.max_in_flight = 2
+        await scam_detector.detect_scam(CLEAN_TEXT)
+        assert detector.calls == 1  # Asked again: "unknown" wasn't remembered
+        await scam_detector.detect_scam(CLEAN_TEXT)
+        assert detector.calls == 1  # A real verdict is
+
+    asyncio.run(run())
+
+
+def test_follower_with_more_time_gets_the_shared_verdict(detector):
+    async def run():
+        detector.delay = 0.05
+        detector.reply = "TRUE"
+        # Leader's deadline runs out before the LLM answers; the follower's doesn't
+        leader = asyncio.create_task(scam_detector.detect_scam(CLEAN_TEXT, deadline=time.monotonic() + 0.01))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(scam_detector.detect_scam(CLEAN_TEXT, deadline=time.monotonic() + 1.0))
+        assert await leader == (False, [])  # "unknown" for the leader
+        assert await follower == (True, ["AI_Context_Analysis"])
+        assert detector.calls == 1
+        # Cached by the shared call itself
+        assert scam_detector.verdict_cache.get(scam_detector._verdict_key(CLEAN_TEXT)) is True
+
+    asyncio.run(run())
@@ -0,0 +1,271 @@
+# tests/test_session_backends.py
+import asyncio
+import threading
+
+import fakeredis
+import pytest
+
+from app.core.session import SessionStore, new_session
+from app.core.session_backends import RedisSessionBackend, SessionBackendError, SQLiteSessionBackend
+
+
+def add_message(session, text, sender="scammer"):
+    session["messages"].append({"sender": sender, "text": text, "timestamp": 0})
+    session["messageCount"] = len(session["messages"])
+
+
+def add_intel(session, key, value):
+    if value not in session["intelFirstSeen"][key]:
+        session["intelligence"][key].append(value)
+        session["intelFirstSeen"][key][value] = len(session["messages"]) - 1
+
+
+class FlakyMerge:
+    """Stands in for the merge script: fails while `down` is set."""
+
+    def __init__(self, merge):
+        self.merge = merge
+        self.down = True
+
+    async def __call__(self, **kwargs):
+        if self.down:
+            raise ConnectionError("redis down")
+        return await self.merge(**kwargs)
+
+
+# --- SQLITE ---
+def test_sqlite_persists_across_restarts(tmp_path):
+    path = str(tmp_path / "sessions.db")
+
+    async def first_run():
+        backend = SQLiteSessionBackend(path)
+        session = new_session("s1")
+        add_message(session, "one")
+        add_intel(session, "upiIds", "abc@upi")
+        await backend.save("s1", session)
+        add_message(session, "two")
+        await backend.save("s1", session)
+        await backend.close()
+
+    async def second_run():
+        backend = SQLiteSessionBackend(path)
+        loaded = await backend.load("s1")
+        await backend.close()
+        return loaded
+
+    asyncio.run(first_run())
+    loaded = asyncio.run(second_run())
+    assert [m["text"] for m in loaded["messages"]] == ["one", "two"]
+    assert loaded["intelligence"]["upiIds"] == ["abc@upi"]
+    assert loaded["intelFirstSeen"]["upiIds"] == {"abc@upi": 0}
+
+
+def test_sqlite_load_sees_queued_writes(tmp_path):
+    async def run():
+        # Long flush window: the writes are still queued when load() runs
+        backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"), flush_interval=10.0)
+        session = new_session("s1")
+        for i in range(5):
+            add_message(session, f"msg {i}")
+            await backend.save("s1", session)
+        loaded = await backend.load("s1")
+        assert [m["text"] for m in loaded["messages"]] == [f"msg {i}" for i in range(5)]
+        assert await backend.load("missing") is None
+        await backend.close()
+
+    asyncio.run(run())
+
+
+def test_sqlite_load_does_not_block_the_loop(tmp_path):
+    async def run():
+        backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+        # Writer stuck (slow disk) until released
+        release = threading.Event()
+        apply = backend._apply
+        backend._apply = lambda conn, ops: (release.wait(5), apply(conn, ops))
+        session = new_session("s1")
+        add_message(session, "hi")
+        await backend.save("s1", session)
+
+        load = asyncio.create_task(backend.load("s1"))
+        await asyncio.sleep(0.05)  # The loop keeps running while load() waits
+        assert not load.done()
+        release.set()
+        loaded = await load
+        assert loaded["messages"][0]["text"] == "hi"
+        await backend.close()
+
+    asyncio.run(run())
+
+
+def test_store_restores_evicted_session(tmp_path):
+    async def run():
+        store = SessionStore(max_sessions=1, backend=SQLiteSessionBackend(str(tmp_path / "sessions.db")))
+        session = await store.get_or_create("s1")
+        add_message(session, "hi")
+        await store.save("s1", session)
+        await store.save("s2", await store.get_or_create("s2"))  # Evicts s1 from RAM
+        assert "s1" not in store
+
+        restored = await store.get_or_create("s1")
+        assert [m["text"] for m in restored["messages"]] == ["hi"]
+        assert store.restored == 1
+        await store.close()
+
+    asyncio.run(run())
+
+
+# --- REDIS ---
+def redis_backend(server=None):
+    server = server or fakeredis.FakeServer()
+    return RedisSessionBackend(client=fakeredis.FakeAsyncRedis(server=server), prefix="test"), server
+
+
+def test_redis_round_trip():
+    async def run():
+        backend, _ = redis_backend()
+        assert await backend.load("s1") is None
+
+        session = new_session("s1")
+        add_message(session, "Your account is blocked, pay to abc@upi")
+        add_intel(session, "upiIds", "abc@upi")
+        session["scamDetected"] = True
+        await backend.save("s1", session)
+
+        loaded = await backend.load("s1")
+        assert [m["text"] for m in loaded["messages"]] == ["Your account is blocked, pay to abc@upi"]
+        assert loaded["intelligence"]["upiIds"] == ["abc@upi"]
+        assert loaded["intelFirstSeen"]["upiIds"] == {"abc@upi": 0}
+        assert loaded["scamDetected"] is True
+        assert loaded["startTime"] == session["startTime"]
+        await backend.close()
+
+    asyncio.run(run())
+
+
+def test_redis_saves_only_new_messages():
+    async def run():
+        backend, _ = redis_backend()
+        session = new_session("s1")
+        add_message(session, "one")
+        await backend.save("s1", session)
+        add_message(session, "two")
+        await backend.save("s1", session)
+        await backend.save("s1", session)  # Nothing new: no duplicates
+
+        loaded = await backend.load("s1")
+        assert [m["text"] for m in loaded["messages"]] == ["one", "two"]
+        await backend.close()
+
+    asyncio.run(run())
+
+
+def test_redis_merges_concurrent_workers():
+    async def run():
+        server = fakeredis.FakeServer()
+        worker_a, _ = redis_backend(server)
+        worker_b, _ = redis_backend(server)
+
+        session = new_session("s1")
+        add_message(session, "hello")
+        await worker_a.save("s1", session)
+
+        # Both workers picked up the same turn
+        copy_a = await worker_a.load("s1")
+        copy_b = await worker_b.load("s1")
+        add_message(copy_a, "call 9876543210")
+        add_intel(copy_a, "phoneNumbers", "9876543210")
+        add_message(copy_b, "or 9876543210 / xyz@upi")
+        add_intel(copy_b, "phoneNumbers", "9876543210")
+        add_intel(copy_b, "upiIds", "xyz@upi")
+        await worker_a.save("s1", copy_a)
+        await worker_b.save("s1", copy_b)
+
+        merged = await worker_a.load("s1")
+        assert [m["text"] for m in merged["messages"]] == ["hello", "call 9876543210", "or 9876543210 / xyz@upi"]
+        assert merged["intelligence"]["phoneNumbers"] == ["9876543210"]
+        assert merged["intelligence"]["upiIds"] == ["xyz@upi"]
+        # First sighting wins
+        assert merged["intelFirstSeen"]["phoneNumbers"] == {"9876543210": 1}
+        await worker_a.close()
+        await worker_b.close()
+
+    asyncio.run(run())
+
+
+def test_redis_load_error_raises():
+    async def run():
+        backend, server = redis_backend()
+        server.connected = False
+        with pytest.raises(SessionBackendError):
+            await backend.load("s1")
+        assert backend.errors == 1
+
+    asyncio.run(run())
+
+
+def test_redis_failed_save_is_retried_before_next_load():
+    async def run():
+        backend, _ = redis_backend()
+        flaky = FlakyMerge(backend._merge)
+        backend._merge = flaky
+
+        session = new_session("s1")
+        add_message(session, "first")
+        add_intel(session, "upiIds", "abc@upi")
+        await backend.save("s1", session)
+        assert backend.stats()["pendingRetries"] == 1
+
+        # Still down: the next turn must not start from a stale (empty) copy
+        with pytest.raises(SessionBackendError):
+            await backend.load("s1")
+
+        flaky.down = False
+        loaded = await backend.load("s1")
+        assert [m["text"] for m in loaded["messages"]] == ["first"]
+        assert loaded["intelligence"]["upiIds"] == ["abc@upi"]
+        assert backend.stats()["pendingRetries"] == 0
+        await backend.close()
+
+    asyncio.run(run())
+
+
+def test_redis_failed_save_is_retried_on_sweep():
+    async def run():
+        backend, _ = redis_backend()
+        flaky = FlakyMerge(backend._merge)
+        backend._merge = flaky
+
+        session = new_session("s1")
+        add_message(session, "first")
+        await backend.save("s1", session)
+        add_message(session, "second")
+        await backend.save("s1", session)  # Both turns still unsaved
+
+        flaky.down = False
+        await backend.purge_idle()
+        assert backend.retried == 1
+        loaded = await backend.load("s1")
+        assert [m["text"] for m in loaded["messages"]] == ["first", "second"]
+        await backend.close()
+
+    asyncio.run(run())
+
+
+def test_store_with_shared_backend_reads_through():
+    async def run():
+        server = fakeredis.FakeServer()
+        store_a = SessionStore(backend=redis_backend(server)[0])
+        store_b = SessionStore(backend=redis_backend(server)[0])
+
+        session = await store_a.get_or_create("s1")
+        add_message(session, "hi")
+        await store_a.save("s1", session)
+
+        other = await store_b.get_or_create("s1")
+        assert [m["text"] for m in other["messages"]] == ["hi"]
+        assert len(store_a) == 0  # Shared: nothing cached locally
+        await store_a.close()
+        await store_b.close()
+
+    asyncio.run(run())
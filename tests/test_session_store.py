@@ -0,0 +1,121 @@
+# tests/test_session_store.py
+import asyncio
+
+import pytest
+
+from app.api import routes
+from app.core import session as session_module
+from app.core.session import SessionStore
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(session_module.time, "monotonic", clock)
+    return clock
+
+
+def open_sessions(store, *session_ids):
+    async def run():
+        return [await store.get_or_create(session_id) for session_id in session_ids]
+    return asyncio.run(run())
+
+
+def test_idle_session_expires_on_access(clock):
+    store = SessionStore(idle_ttl=60)
+    first, = open_sessions(store, "a")
+    first["messageCount"] = 3
+
+    clock.advance(59)
+    assert open_sessions(store, "a")[0] is first  # Touching it resets the clock
+    clock.advance(61)
+    fresh, = open_sessions(store, "a")
+    assert fresh is not first and fresh["messageCount"] == 0
+    assert store.evictions["idle"] == 1
+
+
+def test_sweep_drops_only_idle_sessions(clock):
+    store = SessionStore(idle_ttl=60)
+    open_sessions(store, "a", "b")
+    clock.advance(30)
+    open_sessions(store, "c")
+    clock.advance(31)
+
+    assert store.sweep_expired() == 2
+    assert "c" in store and "a" not in store and "b" not in store
+    assert store.evictions["idle"] == 2
+
+
+def test_sweep_respects_the_batch_size(clock):
+    store = SessionStore(idle_ttl=60)
+    open_sessions(store, *[f"s{n}" for n in range(5)])
+    clock.advance(61)
+    assert store.sweep_expired(max_batch=2) == 2
+    assert len(store) == 3
+
+
+def test_count_cap_evicts_the_least_recently_used(clock):
+    store = SessionStore(max_sessions=2)
+    open_sessions(store, "a", "b")
+    clock.advance(1)
+    open_sessions(store, "a")  # "b" is now the oldest
+    open_sessions(store, "c")
+
+    assert "b" not in store and "a" in store and "c" in store
+    assert store.evictions["count"] == 1
+
+
+def test_byte_cap_evicts_until_under_budget(clock):
+    store = SessionStore(max_bytes=20_000)
+    sessions = open_sessions(store, "a", "b", "c")
+    big = sessions[2]
+    big["messages"] = [{"sender": "scammer", "text": "x" * 4000} for _ in range(4)]
+
+    asyncio.run(store.save("c", big))
+    assert store.bytes <= 20_000
+    assert "c" in store  # The session being saved is never the one dropped
+    assert "a" not in store and "b" not in store
+    assert store.evictions["bytes"] == 2
+
+
+def test_eviction_hook_flushes_a_pending_report(clock, monkeypatch):
+    sent = []
+    monkeypatch.setattr(routes, "send_report", lambda session: sent.append(session["sessionId"]))
+    store = SessionStore(max_sessions=1)
+    store.add_eviction_hook(routes.flush_evicted_session)
+
+    reported, = open_sessions(store, "reported")
+    reported.update(scamDetected=True, messageCount=2, reportedMessageCount=2)
+    open_sessions(store, "pending")
+    assert sent == []  # Guvi already had everything
+
+    pending = open_sessions(store, "pending")[0]
+    pending.update(scamDetected=True, messageCount=3, reportedMessageCount=1)
+    open_sessions(store, "harmless")
+    assert sent == ["pending"]
+
+    clock.advance(store.idle_ttl + 1)
+    store.sweep_expired()
+    assert sent == ["pending"]  # Not a scam: nothing to report
+
+
+def test_failing_hook_does_not_block_eviction(clock):
+    store = SessionStore(max_sessions=1)
+
+    def broken(session_id, session, reason):
+        raise RuntimeError("boom")
+
+    store.add_eviction_hook(broken)
+    open_sessions(store, "a", "b")
+    assert "a" not in store and "b" in store
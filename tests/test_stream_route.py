@@ -0,0 +1,130 @@
+# tests/test_stream_route.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.api import routes
+
+
+@pytest.fixture
+def turn(monkeypatch):
+    """Stubs the turn steps around the stream; records finish_turn calls."""
+    state = SimpleNamespace(finished=[], gate=None)
+
+    async def prepare_turn(payload, deadline=None):
+        return {"sessionId": payload.sessionId}
+
+    async def stream_agent_reply(session, deadline=None):
+        for chunk in ("Hello ", "dear"):
+            yield chunk
+
+    async def finish_turn(payload, session):
+        if state.gate is not None:
+            await state.gate.wait()
+        state.finished.append(session["sessionId"])
+
+    monkeypatch.setattr(routes, "prepare_turn", prepare_turn)
+    monkeypatch.setattr(routes, "stream_agent_reply", stream_agent_reply)
+    monkeypatch.setattr(routes, "finish_turn", finish_turn)
+    return state
+
+
+async def open_stream():
+    response = await routes.honeypot_stream_endpoint(SimpleNamespace(sessionId="s1"))
+    return response.body_iterator
+
+
+async def drain_background():
+    while routes._background_tasks:
+        await asyncio.gather(*routes._background_tasks)
+
+
+def test_full_stream_finishes_once(turn):
+    async def run():
+        events = [event async for event in await open_stream()]
+        await drain_background()
+        assert events[-1].startswith("event: done")
+        assert turn.finished == ["s1"]
+
+    asyncio.run(run())
+
+
+def test_disconnect_mid_stream_still_finishes(turn):
+    async def run():
+        stream = await open_stream()
+        await stream.__anext__()
+        await stream.aclose()  # Client went away after the first token
+        await drain_background()
+        assert turn.finished == ["s1"]
+
+    asyncio.run(run())
+
+
+def test_disconnect_during_finish_does_not_finish_twice(turn):
+    async def run():
+        turn.gate = asyncio.Event()
+        stream = await open_stream()
+
+        async def consume():
+            async for _ in stream:
+                pass
+
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)  # Tokens sent, finish_turn waiting on the gate
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
+        assert len(routes._background_tasks) == 1  # Kept alive, not re-run
+        turn.gate.set()
+        await drain_background()
+        assert turn.finished == ["s1"]
+
+    asyncio.run(run())
+
+
+def test_disconnect_frees_the_llm_slot_at_once(monkeypatch):
+    from app.agent import agent
+    from app.core.admission import AdmissionController
+    from app.core.session import new_session
+
+    gate = AdmissionController(max_in_flight=1, max_queue=1, max_wait=1.0)
+    upstream = SimpleNamespace(closed=False)
+
+    async def llm_stream(system_prompt, user_prompt, provider=None, deadline=None, purpose="reply", directive=None):
+        try:
+            for n in range(100):
+                yield f"word{n} " * 10
+                await asyncio.sleep(0)
+        finally:
+            upstream.closed = True
+
+    async def system_prompt(session_context=None, deadline=None):
+        return "sys"
+
+    session = new_session("slot-test")
+    session["messages"].append({"sender": "scammer", "text": "unique slot test message", "timestamp": 0})
+    session["messageCount"] = 1
+
+    async def prepare_turn(payload, deadline=None):
+        return session
+
+    async def finish_turn(payload, session):
+        pass
+
+    monkeypatch.setattr(agent, "llm_admission", gate)
+    monkeypatch.setattr(agent.llm, "stream", llm_stream)
+    monkeypatch.setattr(agent, "get_active_system_prompt", system_prompt)
+    monkeypatch.setattr(agent.reply_cache, "lookup", lambda key: None)
+    monkeypatch.setattr(routes, "prepare_turn", prepare_turn)
+    monkeypatch.setattr(routes, "finish_turn", finish_turn)
+
+    async def run():
+        stream = await open_stream()
+        await stream.__anext__()
+        assert gate.in_flight == 1
+        await stream.aclose()  # Client went away
+        assert gate.in_flight == 0
+        assert upstream.closed
+        await drain_background()
+
+    asyncio.run(run())
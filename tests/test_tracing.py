@@ -0,0 +1,75 @@
+# tests/test_tracing.py
+import asyncio
+
+from app.core import tracing
+from app.core.tracing import Tracer, TraceStore, annotate, span
+
+
+def current_trace():
+    return tracing._current_trace.get()
+
+
+def test_trace_context_is_restored_when_the_request_ends():
+    tracer = Tracer(store=TraceStore(size=10))
+    outer = tracer.start("outer")
+    with span("work"):
+        inner = tracer.start("inner")
+        assert current_trace() is inner
+        tracer.finish(inner)
+        # Back to the enclosing trace and span
+        assert current_trace() is outer
+        assert tracing._current_span.get() == 0
+    tracer.finish(outer)
+    assert current_trace() is None
+    assert tracing._current_span.get() is None
+
+
+def test_finish_from_another_context_does_not_raise():
+    tracer = Tracer(store=TraceStore(size=10))
+
+    async def run():
+        trace = tracer.start("stream")
+
+        async def body():
+            tracer.finish(trace)  # Like a streaming body finishing in its own task
+
+        await asyncio.create_task(body())
+        assert trace.finished
+        with span("late") as entry:
+            assert entry is None  # Finished trace: no-op
+
+    asyncio.run(run())
+
+
+def test_report_summary_keeps_counts_only():
+    from app.callback.guvi_client import report_summary
+
+    payload = {
+        "sessionId": "s1",
+        "scamDetected": True,
+        "totalMessagesExchanged": 4,
+        "engagementDurationSeconds": 30,
+        "extractedIntelligence": {"upiIds": ["abc@upi"], "phoneNumbers": []},
+        "agentNotes": "Asked for UPI.",
+    }
+    summary = report_summary(payload)
+    assert summary["sessionId"] == "s1"
+    assert summary["intelCounts"] == {"upiIds": 1, "phoneNumbers": 0}
+    assert "abc@upi" not in str(summary)
+
+
+def test_guvi_log_without_session_lists_latest_reports(monkeypatch):
+    from app.api import routes
+
+    tracer = Tracer(store=TraceStore(size=10))
+    monkeypatch.setattr(routes, "tracer", tracer)
+    for session_id in ("s1", "s2"):
+        trace = tracer.start("honeypot", session_id)
+        with span("finish"):
+            annotate(report={"sessionId": session_id}, queued=True)
+        tracer.finish(trace)
+
+    latest = asyncio.run(routes.get_last_guvi_data(sessionId=None, limit=10))
+    assert [r["sessionId"] for r in latest] == ["s2", "s1"]
+    only = asyncio.run(routes.get_last_guvi_data(sessionId="s1", limit=10))
+    assert [r["report"] for r in only] == [{"sessionId": "s1"}]